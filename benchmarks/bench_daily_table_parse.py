@@ -0,0 +1,43 @@
+"""
+日用电量表格解析吞吐量基准
+
+把 tests/fixtures 中展开后的表格复制成 N 行，测量 DailyTableParser 的行/秒和 MB/秒。
+
+    python benchmarks/bench_daily_table_parse.py [--rows 1000]
+"""
+import argparse
+import re
+import timeit
+from pathlib import Path
+
+from sgcc_electricity_feishu.daily_table import parse_daily_table
+
+FIXTURE = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "daily_table_expanded.html"
+
+
+def build_table(row_count):
+    html = FIXTURE.read_text(encoding="utf-8")
+    head, body, tail = re.match(r"(?s)(.*<tbody>)(.*)(</tbody>.*)", html).groups()
+    # 每个数据行及其展开行为一组
+    groups = re.findall(r'(?s)<tr class="el-table__row.*?</tr>\s*<tr>.*?</tr>', body)
+    repeated = [groups[i % len(groups)] for i in range(row_count)]
+    return head + "\n".join(repeated) + tail
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    html = build_table(args.rows)
+    assert len(parse_daily_table(html)) == args.rows
+    seconds = min(timeit.repeat(lambda: parse_daily_table(html), number=1, repeat=args.repeat))
+    print(
+        f"{args.rows} 行 ({len(html) / 1024:.0f} KB): {seconds * 1000:.1f} ms，"
+        f"{args.rows / seconds:,.0f} 行/秒，{len(html) / seconds / 1024 / 1024:.1f} MB/秒"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+批量验证码推理基准
+
+对比 N=1, 4, 16 时 ONNX.get_distances 的单张平均耗时（CPU）。
+
+    python benchmarks/bench_onnx_batch.py --model captcha.onnx [--images assets/]
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from sgcc_electricity_feishu.onnx import ONNX
+
+
+def load_images(images_dir, count):
+    if images_dir:
+        paths = sorted(glob.glob(os.path.join(images_dir, "*.png")))
+        if not paths:
+            raise SystemExit(f"{images_dir} 下没有 png 图片")
+        images = [Image.open(path).convert("RGB") for path in paths]
+    else:
+        rng = np.random.default_rng(0)
+        images = [Image.fromarray(rng.integers(0, 255, (160, 260, 3), dtype=np.uint8)) for _ in range(4)]
+    return [images[i % len(images)] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=os.getenv("ONNX_MODEL_PATH", "captcha.onnx"))
+    parser.add_argument("--images", default=None, help="验证码背景图目录，不指定时使用随机图片")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    onnx = ONNX(args.model)
+    onnx.get_distances(load_images(args.images, 1))  # 预热
+
+    print(f"{'N':>4} {'batch(ms)':>10} {'per-image(ms)':>14}")
+    for n in (1, 4, 16):
+        images = load_images(args.images, n)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            onnx.get_distances(images)
+        elapsed = (time.perf_counter() - start) / args.rounds
+        print(f"{n:>4} {elapsed * 1e3:>10.2f} {elapsed / n * 1e3:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+ONNX.get_boxes 后处理微基准
+
+使用 416x416 YOLO 输出形状 (1, 10647, 6) 的合成预测，对比原先逐框循环的实现
+与向量化实现的耗时。
+
+    python benchmarks/bench_onnx_postprocess.py
+"""
+import timeit
+
+import numpy as np
+
+from sgcc_electricity_feishu.onnx import ONNX
+
+# 416x416 输入下三个检测头的框数: (13*13 + 26*26 + 52*52) * 3
+NUM_BOXES = 10647
+
+
+def legacy_get_boxes(onnx, prediction, confidence_threshold=0.7, nms_threshold=0.6):
+    feature_map = np.squeeze(prediction)
+    conf = feature_map[..., 4] > confidence_threshold
+    box = feature_map[conf == True]
+    cls_cinf = box[..., 5:]
+    cls = []
+    for i in range(len(cls_cinf)):
+        cls.append(int(np.argmax(cls_cinf[i])))
+    all_cls = list(set(cls))
+    output = []
+    for curr_cls in all_cls:
+        curr_cls_box = []
+        for j in range(len(cls)):
+            if cls[j] == curr_cls:
+                box[j][5] = curr_cls
+                curr_cls_box.append(box[j][:6])
+        curr_cls_box = onnx.xywh2xyxy(np.array(curr_cls_box))
+        for k in onnx.nms(curr_cls_box, nms_threshold):
+            output.append(curr_cls_box[k])
+    return np.array(output)
+
+
+def make_prediction(positives, seed=0):
+    rng = np.random.default_rng(seed)
+    prediction = np.zeros((1, NUM_BOXES, 6), dtype=np.float32)
+    prediction[0, :, 0:2] = rng.uniform(0, 416, size=(NUM_BOXES, 2))
+    prediction[0, :, 2:4] = rng.uniform(30, 60, size=(NUM_BOXES, 2))
+    prediction[0, :, 4] = rng.uniform(0, 0.5, size=NUM_BOXES)
+    prediction[0, :, 5] = 1.0
+    hits = rng.choice(NUM_BOXES, size=positives, replace=False)
+    prediction[0, hits, 4] = rng.uniform(0.7, 1.0, size=positives)
+    prediction[0, hits, 0:2] = rng.normal(200, 8, size=(positives, 2))
+    return prediction
+
+
+def main(number=200):
+    onnx = ONNX.__new__(ONNX)
+    print(f"{'positives':>10} {'legacy(ms)':>12} {'vectorized(ms)':>15} {'top_k=1(ms)':>12}")
+    for positives in (10, 50, 200):
+        prediction = make_prediction(positives)
+        legacy = timeit.timeit(lambda: legacy_get_boxes(onnx, prediction.copy()), number=number)
+        vectorized = timeit.timeit(lambda: onnx.get_boxes(prediction), number=number)
+        top1 = timeit.timeit(lambda: onnx.get_boxes(prediction, top_k=1), number=number)
+        print(f"{positives:>10} {legacy / number * 1e3:>12.3f} "
+              f"{vectorized / number * 1e3:>15.3f} {top1 / number * 1e3:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+滑块手势往返次数基准
+
+对比逐步 ActionChains.perform 与一次性 W3C actions 序列在滑动 200px 时
+向 chromedriver 发送的请求数，以及按每次往返固定延迟估算的耗时。
+
+    python benchmarks/bench_slider_gesture.py [--distance 200] [--rtt-ms 5]
+"""
+import argparse
+import logging
+import random
+import time
+
+from selenium.webdriver import ActionChains
+from selenium.webdriver.remote.webelement import WebElement
+
+from sgcc_electricity_feishu.login import LoginHelper
+
+
+class CountingDriver:
+    """每条命令模拟一次到 chromedriver 的往返"""
+
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.round_trips = 0
+
+    def find_element(self, by, value):
+        return WebElement(self, "slider")
+
+    def execute(self, command, params=None):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+        return {"value": None}
+
+
+def legacy_sliding_track(driver, distance):
+    """改动前的实现：每一步单独 perform 并 sleep"""
+    slider = driver.find_element(None, None)
+    ActionChains(driver).click_and_hold(slider).perform()
+    moved = 0
+    while moved < distance:
+        if moved < distance * 0.4:
+            step, delay = random.randint(8, 16), random.uniform(0.005, 0.02)
+        elif moved < distance * 0.8:
+            step, delay = random.randint(4, 10), random.uniform(0.01, 0.03)
+        else:
+            step, delay = random.randint(1, 4), random.uniform(0.02, 0.06)
+        step = min(step, distance - moved)
+        ActionChains(driver).move_by_offset(xoffset=step, yoffset=random.uniform(-1, 1)).perform()
+        moved += step
+        time.sleep(delay)
+    ActionChains(driver).move_by_offset(xoffset=-random.randint(1, 3), yoffset=0).perform()
+    time.sleep(random.uniform(0.05, 0.15))
+    ActionChains(driver).release().perform()
+
+
+def batched_sliding_track(driver, distance):
+    helper = LoginHelper.__new__(LoginHelper)
+    helper.retry_wait_time = 1
+    helper.driver = driver
+    helper._sliding_track(distance)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--distance", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="模拟的单次往返延迟")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for name, track in (("逐步 perform", legacy_sliding_track), ("单次 actions", batched_sliding_track)):
+        trips, elapsed = [], []
+        for seed in range(args.runs):
+            random.seed(seed)
+            driver = CountingDriver(args.rtt_ms / 1000)
+            start = time.perf_counter()
+            track(driver, args.distance)
+            elapsed.append(time.perf_counter() - start)
+            trips.append(driver.round_trips)
+        # 单次 actions 的停顿由浏览器执行，这里的耗时只包含客户端往返
+        print(f"{name:<10} 往返次数 {sum(trips) / len(trips):5.1f}  客户端耗时 {sum(elapsed) / len(elapsed) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
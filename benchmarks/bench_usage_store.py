@@ -0,0 +1,72 @@
+"""
+本地用电库范围查询基准
+
+生成 N 天的旧式按天 JSON 缓存（每个文件包含当天抓取的最近 60 天数据），
+比较逐个解析 JSON 文件合并出某个日期范围与 UsageStore 范围查询的耗时。
+
+    python benchmarks/bench_usage_store.py [--days 365] [--meters 2]
+"""
+import argparse
+import json
+import os
+import tempfile
+import timeit
+from datetime import date, timedelta
+
+from sgcc_electricity_feishu.usage_store import UsageStore
+
+
+def write_cache(cache_dir, days, meters, window=60):
+    start = date(2024, 1, 1)
+    for day in range(days):
+        today = start + timedelta(days=day)
+        rows = [
+            {"date": (today - timedelta(days=i)).isoformat(), "reading": str(10 + i % 7),
+             "highNum": str(6 + i % 3), "lowNum": str(4 + i % 2)}
+            for i in range(1, window + 1)
+        ]
+        data = {f"meter{m}": rows for m in range(meters)}
+        with open(os.path.join(cache_dir, f"{today.isoformat()}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    return start
+
+
+def scan_json(cache_dir, meter_id, first, last):
+    merged = {}
+    for name in sorted(os.listdir(cache_dir)):
+        with open(os.path.join(cache_dir, name), "r", encoding="utf-8") as f:
+            for row in json.load(f).get(meter_id, []):
+                if first <= row["date"] <= last:
+                    merged[row["date"]] = row
+    return [merged[key] for key in sorted(merged, reverse=True)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--meters", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "sgcc_cache")
+        os.makedirs(cache_dir)
+        start = write_cache(cache_dir, args.days, args.meters)
+        first = (start + timedelta(days=args.days // 2)).isoformat()
+        last = (start + timedelta(days=args.days // 2 + 30)).isoformat()
+
+        store = UsageStore(os.path.join(tmp, "usage.db"))
+        migrate = timeit.timeit(lambda: store.migrate_json_cache(cache_dir), number=1)
+        assert len(store.rows("meter0", first, last)) == len(scan_json(cache_dir, "meter0", first, last))
+
+        json_seconds = min(timeit.repeat(lambda: scan_json(cache_dir, "meter0", first, last), number=1, repeat=args.repeat))
+        store_seconds = min(timeit.repeat(lambda: store.rows("meter0", first, last), number=1, repeat=args.repeat))
+        store.close()
+
+    print(f"{args.days} 个缓存文件，{args.meters} 个户号，导入耗时 {migrate * 1000:.0f} ms")
+    print(f"31 天范围查询: 解析 JSON {json_seconds * 1000:.1f} ms，UsageStore {store_seconds * 1000:.2f} ms，"
+          f"快 {json_seconds / store_seconds:.0f} 倍")
+
+
+if __name__ == "__main__":
+    main()
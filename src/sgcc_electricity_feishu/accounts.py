@@ -0,0 +1,155 @@
+import os
+import re
+import json
+import time
+import queue
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from .const import ACCOUNTS_FILE, LOGIN_INFO_FILE
+
+
+def login_info_file_for(username):
+    """多账号时每个账号独立的登录信息文件"""
+    safe_name = re.sub(r"[^\w.-]", "_", username)
+    root, ext = os.path.splitext(LOGIN_INFO_FILE)
+    return f"{root}.{safe_name}{ext}"
+
+
+def load_accounts(path=None):
+    """读取账号配置
+
+    ACCOUNTS_FILE（默认 accounts.json）存在时从中读取多个账号：
+        [{"username": "...", "password": "...", "user_id": "户号1,户号2"}, ...]
+    每个账号都必须指定 user_id。文件不存在时使用 .env 中的 USERNAME / PASSWORD / USER_ID 作为单个账号。
+
+    Returns:
+        账号字典列表，包含 username、password、user_id（仅 .env 单账号时为 None，表示读取 USER_ID 环境变量）、login_info_file
+    """
+    load_dotenv()
+    path = path or os.getenv("ACCOUNTS_FILE", ACCOUNTS_FILE)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            raw_accounts = json.load(f)
+        accounts = []
+        for item in raw_accounts:
+            if not item.get("username") or not item.get("password"):
+                raise ValueError(f"{path} 中的账号缺少 username 或 password")
+            # 多账号时必须指定户号，否则会误用 .env 中 USER_ID 的户号
+            if not item.get("user_id"):
+                raise ValueError(f"{path} 中的账号 {item['username']} 缺少 user_id")
+            user_id = item.get("user_id")
+            if isinstance(user_id, str):
+                user_id = [u for u in user_id.split(",") if u]
+            accounts.append({
+                "username": item["username"],
+                "password": item["password"],
+                "user_id": user_id,
+                "login_info_file": item.get("login_info_file") or login_info_file_for(item["username"]),
+            })
+        return accounts
+
+    username = os.getenv("USERNAME")
+    password = os.getenv("PASSWORD")
+    if not username or not password:
+        raise ValueError("未设置用户名或密码")
+    return [{"username": username, "password": password, "user_id": None, "login_info_file": LOGIN_INFO_FILE}]
+
+
+def account_user_ids(account):
+    """账号下配置的户号，.env 单账号（user_id 为 None）时读取 USER_ID 环境变量"""
+    user_ids = account.get("user_id")
+    if user_ids is None:
+        user_ids = [u for u in os.getenv("USER_ID", "").split(",") if u]
+    return list(user_ids)
+
+
+def fetch_account(account, watermarks=None):
+    """使用独立的浏览器和会话文件抓取单个账号的数据"""
+    from .login import LoginHelper
+
+    helper = None
+    try:
+        helper = LoginHelper(account)
+        return helper.fetch_data(watermarks)
+    finally:
+        if helper:
+            helper.close()
+
+
+def iter_account(account, watermarks=None):
+    """逐个户号产出单个账号的数据，结束或中断时关闭浏览器"""
+    from .login import LoginHelper
+
+    helper = None
+    try:
+        helper = LoginHelper(account)
+        yield from helper.iter_data(watermarks)
+    finally:
+        if helper:
+            helper.close()
+
+
+def iter_all_accounts(accounts, max_workers=None, iterate=iter_account):
+    """并发抓取多个账号，每个户号完成后立即产出 (户号, 数据列表)
+
+    抓取在线程池中进行，调用方处理当前户号时其余户号继续抓取。
+
+    Args:
+        accounts: load_accounts() 返回的账号列表
+        max_workers: 同时运行的账号数上限，默认读取 ACCOUNTS_CONCURRENCY（默认 2）
+        iterate: 逐个产出单个账号 (户号, 数据列表) 的函数
+    """
+    if not accounts:
+        return
+    max_workers = max_workers or int(os.getenv("ACCOUNTS_CONCURRENCY", 2))
+    start = time.perf_counter()
+    results = queue.Queue()
+    finished = object()
+
+    def run(account):
+        username = account["username"]
+        count = 0
+        try:
+            for item in iterate(account):
+                results.put(item)
+                count += 1
+            logging.info(f"账号 {username} 完成，获取 {count} 个户号")
+        except Exception as e:
+            logging.error(f"账号 {username} 数据获取失败: {e}")
+        finally:
+            results.put(finished)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(accounts))) as executor:
+        for account in accounts:
+            executor.submit(run, account)
+        remaining = len(accounts)
+        while remaining:
+            item = results.get()
+            if item is finished:
+                remaining -= 1
+                continue
+            yield item
+    logging.info(f"{len(accounts)} 个账号抓取完成，总耗时 {time.perf_counter() - start:.1f}s")
+
+
+def fetch_all_accounts(accounts, max_workers=None, fetch=fetch_account):
+    """并发抓取多个账号，结果按户号合并为一个字典
+
+    Args:
+        accounts: load_accounts() 返回的账号列表
+        max_workers: 同时运行的账号数上限，默认读取 ACCOUNTS_CONCURRENCY（默认 2）
+        fetch: 抓取单个账号的函数
+
+    Returns:
+        {户号: 用电数据列表}，失败的账号会记录日志并跳过
+    """
+    result = {}
+    items = iter_all_accounts(accounts, max_workers, iterate=lambda account: (fetch(account) or {}).items())
+    for meter_id, rows in items:
+        if meter_id in result:
+            logging.warning(f"户号 {meter_id} 在多个账号中出现，使用后获取的数据")
+        result[meter_id] = rows
+    return result
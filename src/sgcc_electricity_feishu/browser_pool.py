@@ -0,0 +1,307 @@
+import os
+import time
+import atexit
+import shutil
+import logging
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+# 归还时清空存储的站点；Storage.clearDataForOrigin 只接受具体的 origin，不支持通配符
+DEFAULT_RESET_ORIGINS = "https://www.95598.cn,https://95598.cn"
+# 浏览器最长存活时间，需长于 schedule-daily 的执行间隔（24 小时），否则每次执行时空闲实例都已过期
+DEFAULT_MAX_AGE = 26 * 3600
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _process_tree_rss_mb(pid):
+    """读取 /proc 统计进程及其子进程的 RSS（MB），非 Linux 环境返回 None"""
+    if not os.path.exists(f"/proc/{pid}/status"):
+        return None
+    total_kb = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                stack.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+class _PooledBrowser:
+    def __init__(self, driver, profile_dir, launch_time):
+        self.driver = driver
+        self.profile_dir = profile_dir
+        self.created_at = time.monotonic()
+        self.launch_time = launch_time
+        self.uses = 0
+
+
+class BrowserPool:
+    """固定大小的 Chrome 预热池
+
+    每个实例使用独立的用户数据目录。归还时清空 cookie 和存储，
+    下一个账号不会继承上一个账号的登录状态。借出前做健康检查，
+    超过 max_age 秒或 RSS 超过 max_rss_mb 的实例会被回收并重新启动。
+    常驻进程可在任务开始前调用 warm 提前启动实例。
+    """
+
+    def __init__(self, factory=None, size=1, max_age=DEFAULT_MAX_AGE, max_rss_mb=None, profile_root=None,
+                 reset_origins=None):
+        """
+        Args:
+            factory: 接收用户数据目录、返回 WebDriver 的函数，可在 acquire 时按调用方单独指定
+            size: 池中最多同时存在的浏览器数量
+            max_age: 浏览器最长存活时间（秒）
+            max_rss_mb: 浏览器进程树 RSS 上限，None 表示不检查
+            profile_root: 用户数据目录的父目录，默认使用临时目录
+            reset_origins: 归还时清空存储的站点 origin 列表
+        """
+        self.factory = factory
+        self.size = size
+        self.max_age = max_age
+        self.max_rss_mb = max_rss_mb
+        self.profile_root = profile_root or tempfile.mkdtemp(prefix="sgcc_chrome_pool_")
+        self.reset_origins = list(reset_origins if reset_origins is not None else DEFAULT_RESET_ORIGINS.split(","))
+        self._idle = []
+        self._in_use = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._next_slot = 0
+        self.acquires = 0
+        self.hits = 0
+        self.launches = 0
+        self.launch_seconds = 0.0
+        self.recycled = 0
+
+    def _launch(self, factory):
+        with self._condition:
+            profile_dir = os.path.join(self.profile_root, f"profile-{self._next_slot}")
+            self._next_slot += 1
+        start = time.perf_counter()
+        driver = factory(profile_dir)
+        launch_time = time.perf_counter() - start
+        with self._condition:
+            self.launches += 1
+            self.launch_seconds += launch_time
+        logging.info(f"浏览器池启动新的Chrome实例，耗时 {launch_time:.2f}s")
+        return _PooledBrowser(driver, profile_dir, launch_time)
+
+    def _is_healthy(self, browser):
+        if time.monotonic() - browser.created_at > self.max_age:
+            logging.info("浏览器实例超过最长存活时间，回收")
+            return False
+        try:
+            browser.driver.execute_script("return 1;")
+        except Exception as e:
+            logging.info(f"浏览器实例健康检查失败，回收: {e}")
+            return False
+        if self.max_rss_mb:
+            process = getattr(getattr(browser.driver, "service", None), "process", None)
+            rss = _process_tree_rss_mb(process.pid) if process else None
+            if rss is not None and rss > self.max_rss_mb:
+                logging.info(f"浏览器实例内存 {rss:.0f}MB 超过上限 {self.max_rss_mb}MB，回收")
+                return False
+        return True
+
+    def _destroy(self, browser):
+        """关闭浏览器，可能较慢，调用时不要持有锁"""
+        with self._condition:
+            self.recycled += 1
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logging.warning(f"关闭浏览器实例失败: {e}")
+        shutil.rmtree(browser.profile_dir, ignore_errors=True)
+
+    def _reset(self, driver):
+        """清空 cookie、缓存和访问过的站点存储，回到空白页"""
+        origins = list(self.reset_origins)
+        try:
+            current = urlparse(driver.current_url)
+            if current.scheme in ("http", "https"):
+                origins.append(f"{current.scheme}://{current.netloc}")
+        except Exception:
+            pass
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        for origin in dict.fromkeys(origins):
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        driver.get("about:blank")
+
+    def acquire(self, timeout=None, factory=None):
+        """借出一个浏览器，池满且没有空闲实例时等待归还
+
+        Args:
+            factory: 需要启动新浏览器时使用的函数，默认使用创建池时指定的 factory
+        """
+        factory = factory or self.factory
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("浏览器池已关闭")
+                    # 先占用名额，健康检查和启动浏览器都在锁外进行
+                    if self._idle:
+                        browser = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._in_use < self.size:
+                        browser = None
+                        self._in_use += 1
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("等待空闲浏览器超时")
+                    self._condition.wait(remaining)
+            if browser is None:
+                break
+            if self._is_healthy(browser):
+                with self._condition:
+                    self.acquires += 1
+                    self.hits += 1
+                browser.uses += 1
+                return browser.driver, browser
+            self._destroy(browser)
+            with self._condition:
+                self._in_use -= 1
+
+        # 启动浏览器较慢，在锁外进行
+        try:
+            browser = self._launch(factory)
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.acquires += 1
+        browser.uses += 1
+        return browser.driver, browser
+
+    def warm(self, n=None, factory=None):
+        """提前启动浏览器，使池中至少有 n 个（默认 size，不超过 size）空闲实例
+
+        空闲实例会先做健康检查，过期或不健康的实例回收后重新启动。
+
+        Returns:
+            新启动的实例数
+        """
+        factory = factory or self.factory
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("浏览器池已关闭")
+            idle, self._idle = self._idle, []
+            # 检查期间占用名额，避免 acquire 同时启动新实例超出 size
+            self._in_use += len(idle)
+        healthy = []
+        for browser in idle:
+            if self._is_healthy(browser):
+                healthy.append(browser)
+            else:
+                self._destroy(browser)
+        with self._condition:
+            self._in_use -= len(idle)
+            self._idle.extend(healthy)
+            target = min(self.size if n is None else n, self.size)
+            missing = max(0, min(target - len(self._idle), self.size - self._in_use - len(self._idle)))
+            self._in_use += missing
+            self._condition.notify_all()
+
+        launched = 0
+        try:
+            for _ in range(missing):
+                browser = self._launch(factory)
+                with self._condition:
+                    self._in_use -= 1
+                    self._idle.append(browser)
+                    self._condition.notify()
+                launched += 1
+        finally:
+            with self._condition:
+                self._in_use -= missing - launched
+                self._condition.notify_all()
+        logging.info(f"浏览器池预热完成，新启动 {launched} 个实例，空闲 {len(self._idle)} 个")
+        return launched
+
+    def release(self, browser, healthy=True):
+        """归还浏览器，healthy=False 或重置失败时直接回收"""
+        if healthy:
+            try:
+                self._reset(browser.driver)
+            except Exception as e:
+                logging.warning(f"重置浏览器实例失败，回收: {e}")
+                healthy = False
+        with self._condition:
+            self._in_use -= 1
+            keep = healthy and not self._closed
+            if keep:
+                self._idle.append(browser)
+            self._condition.notify()
+        if not keep:
+            self._destroy(browser)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for browser in idle:
+            self._destroy(browser)
+        shutil.rmtree(self.profile_root, ignore_errors=True)
+
+    def metrics(self):
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "acquires": self.acquires,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.acquires if self.acquires else 0.0,
+            "launches": self.launches,
+            "avg_launch_seconds": self.launch_seconds / self.launches if self.launches else 0.0,
+            "recycled": self.recycled,
+        }
+
+
+def get_browser_pool():
+    """进程内共享的浏览器池，BROWSER_POOL_SIZE 为 0（默认）时不启用，返回 None
+
+    池本身不绑定启动函数，由借出浏览器的调用方在 acquire 时传入。
+    """
+    global _pool
+    size = int(os.getenv("BROWSER_POOL_SIZE", 0))
+    if size <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            max_rss = os.getenv("BROWSER_POOL_MAX_RSS_MB")
+            reset_origins = os.getenv("BROWSER_POOL_RESET_ORIGINS", DEFAULT_RESET_ORIGINS)
+            _pool = BrowserPool(
+                size=size,
+                max_age=int(os.getenv("BROWSER_POOL_MAX_AGE_SECONDS", DEFAULT_MAX_AGE)),
+                max_rss_mb=int(max_rss) if max_rss else None,
+                profile_root=os.getenv("BROWSER_POOL_PROFILE_DIR") or None,
+                reset_origins=[origin.strip() for origin in reset_origins.split(",") if origin.strip()],
+            )
+            atexit.register(close_browser_pool)
+        return _pool
+
+
+def close_browser_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            logging.info(f"浏览器池统计: {_pool.metrics()}")
+            _pool.close()
+            _pool = None
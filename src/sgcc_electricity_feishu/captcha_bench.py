@@ -0,0 +1,140 @@
+import os
+import re
+import sys
+import json
+import time
+import logging
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+LABELS_FILE = "labels.json"
+# ONNX 模型把验证码缩放到 416x416 检测，get_distance 返回的是该空间下的 x 坐标
+MODEL_INPUT_WIDTH = 416
+
+
+def load_labelled_images(images_dir):
+    """读取带标注的验证码背景图
+
+    标注是缺口左边缘在原始背景图中的 x 像素坐标（与图片文件同一坐标系，不是模型的 416 空间），
+    优先取目录下的 labels.json（{"文件名.png": 缺口x坐标}），
+    否则从文件名末尾解析，如 bg_0001_x132.png 的标注为 132。
+    没有标注的图片仍参与测速，但不计入误差。
+
+    Returns:
+        [(文件名, 标注或None), ...]，按文件名排序
+    """
+    images_dir = Path(images_dir)
+    labels = {}
+    labels_path = images_dir / LABELS_FILE
+    if labels_path.exists():
+        with open(labels_path, "r", encoding="utf-8") as f:
+            labels = {name: int(value) for name, value in json.load(f).items()}
+
+    samples = []
+    for path in sorted(images_dir.glob("*.png")):
+        label = labels.get(path.name)
+        if label is None:
+            match = re.search(r"_x(\d+)$", path.stem)
+            label = int(match.group(1)) if match else None
+        samples.append((path.name, label))
+    return samples
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss 在 macOS 下单位为字节，Linux 等其他平台为 KB
+    if sys.platform == "darwin":
+        return max_rss / (1024 * 1024)
+    return max_rss / 1024
+
+
+def to_image_px(distance, image_width):
+    """把模型 416 空间的 x 坐标换算为原始背景图的像素坐标"""
+    return distance * image_width / MODEL_INPUT_WIDTH
+
+
+def run_captcha_bench(images_dir, onnx, tolerance=5, warmup=1):
+    """逐张运行验证码识别，统计延迟、吞吐、内存峰值和距离误差
+
+    识别结果先换算到原始图片像素再与标注比较，误差单位为图片像素。
+    内存统计 max_rss_mb 是进程峰值（包含模型加载），
+    loop_rss_delta_mb 是测量循环期间峰值的增长，反映识别本身额外占用的内存。
+
+    Args:
+        images_dir: 验证码背景图目录
+        onnx: ONNX 实例
+        tolerance: 误差在该图片像素范围内视为识别正确
+        warmup: 预热次数，不计入统计
+
+    Returns:
+        可直接序列化为 JSON 的结果字典
+    """
+    samples = load_labelled_images(images_dir)
+    if not samples:
+        raise ValueError(f"{images_dir} 下没有 png 图片")
+
+    images = [Image.open(Path(images_dir) / name).convert("RGB") for name, _ in samples]
+    for i in range(min(warmup, len(images))):
+        onnx.get_distance(images[i])
+
+    latencies = []
+    errors = []
+    details = []
+    rss_before = _max_rss_mb()
+    start = time.perf_counter()
+    for (name, label), image in zip(samples, images):
+        t0 = time.perf_counter()
+        distance = onnx.get_distance(image)
+        latencies.append(time.perf_counter() - t0)
+        distance_px = to_image_px(distance, image.width)
+        error = None if label is None else abs(distance_px - label)
+        if error is not None:
+            errors.append(error)
+        details.append({
+            "file": name, "label": label, "distance": distance,
+            "distance_px": round(distance_px, 1), "error": None if error is None else round(error, 1),
+        })
+    total = time.perf_counter() - start
+    rss_after = _max_rss_mb()
+
+    latencies_ms = np.array(latencies) * 1e3
+    result = {
+        "images": len(samples),
+        "labelled": len(errors),
+        "latency_ms": {
+            "mean": float(latencies_ms.mean()),
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p95": float(np.percentile(latencies_ms, 95)),
+            "p99": float(np.percentile(latencies_ms, 99)),
+        },
+        "throughput_per_s": len(samples) / total if total > 0 else None,
+        "max_rss_mb": rss_after,
+        "loop_rss_delta_mb": None if rss_after is None else rss_after - rss_before,
+        "tolerance": tolerance,
+        "details": details,
+    }
+    if errors:
+        errors = np.array(errors)
+        result["error_px"] = {
+            "mean": float(errors.mean()),
+            "p95": float(np.percentile(errors, 95)),
+            "max": float(errors.max()),
+        }
+        result["accuracy"] = float((errors <= tolerance).mean())
+    logging.info(f"验证码基准完成: {len(samples)} 张图片")
+    return result
+
+
+def save_bench_result(result, output):
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
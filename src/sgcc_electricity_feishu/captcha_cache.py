@@ -0,0 +1,127 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from .const import CAPTCHA_CACHE_FILE
+
+
+def image_fingerprint(image):
+    """验证码背景图的内容指纹（像素级 sha1，与 PNG 编码细节无关）"""
+    digest = hashlib.sha1()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class CaptchaCache:
+    """验证码识别结果的持久化 LRU 缓存
+
+    以背景图指纹为键，记录被接受的滑动距离和被拒绝过的距离：
+    已接受的答案直接复用，跳过模型推理；被拒绝的候选排到最后再尝试。
+    超过 max_size 时淘汰最久未使用的条目。
+    多账号并发登录时通过 shared() 共用同一个实例，各线程的记录不会在保存时互相覆盖。
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=CAPTCHA_CACHE_FILE, max_size=512):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._load()
+
+    @classmethod
+    def shared(cls, path=CAPTCHA_CACHE_FILE, max_size=512):
+        """进程内同一文件只对应一个实例"""
+        if not path:
+            return cls(path, max_size=max_size)
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(path, max_size=max_size)
+            return cls._shared[key]
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            for key, entry in data.get("entries", []):
+                self._entries[key] = entry
+            self._evict()
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
+            logging.warning(f"验证码缓存文件损坏，将重新建立: {e}")
+            self._entries.clear()
+
+    def save(self):
+        """保存到文件，按最近使用顺序存储以便下次加载后保持 LRU 顺序"""
+        if not self.path:
+            return
+        try:
+            # 持锁写入，保存的总是最新的完整内容
+            with self._lock:
+                tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"entries": list(self._entries.items())}, f)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.error(f"保存验证码缓存失败: {e}")
+
+    def _evict(self):
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, key):
+        """返回已被接受的滑动距离，没有时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.get("accepted") is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["accepted"]
+
+    def rank(self, key, distances):
+        """把曾经被拒绝的距离移到候选列表末尾"""
+        with self._lock:
+            rejected = set(self._entries.get(key, {}).get("rejected", []))
+        if not rejected:
+            return list(distances)
+        return [d for d in distances if d not in rejected] + [d for d in distances if d in rejected]
+
+    def record(self, key, distance, accepted):
+        """记录一次滑动结果并写回文件"""
+        with self._lock:
+            entry = self._entries.pop(key, None) or {"accepted": None, "rejected": []}
+            if accepted:
+                entry["accepted"] = distance
+            else:
+                if entry["accepted"] == distance:
+                    entry["accepted"] = None
+                if distance not in entry["rejected"]:
+                    entry["rejected"].append(distance)
+            self._entries[key] = entry
+            self._evict()
+            self.save()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
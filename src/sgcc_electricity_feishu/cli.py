@@ -1,15 +1,39 @@
 import typer
 from typing import Optional
 from rich.console import Console
-from .login import LoginHelper
+import os
 import time
 from datetime import datetime, timedelta
-from .feishu_bitable import FeishuBitableHelper
-from .utils import fill_missing_data, get_sgcc_data_with_cache, update_filled_records_to_feishu, save_to_json
+
+# selenium / onnxruntime / numpy / lark_oapi 等依赖较重，只在需要它们的命令中导入，
+# 保证 sef hello 等轻量命令的启动速度
 
 app = typer.Typer()
 console = Console()
 
+
+def _import_profile_callback(value: bool):
+    if not value:
+        return
+    from .import_profile import profile_import, PROFILE_MODULES
+
+    for module in PROFILE_MODULES:
+        total_us, slowest = profile_import(module)
+        console.print(f"[bold]{module}[/bold]: {total_us / 1000:.1f} ms")
+        for cumulative_us, self_us, name in slowest:
+            console.print(f"  {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {name}")
+    raise typer.Exit()
+
+
+@app.callback()
+def main(
+    import_profile: bool = typer.Option(
+        False, "--import-profile", is_eager=True, callback=_import_profile_callback,
+        help="在新的解释器中统计各模块的导入耗时后退出",
+    ),
+):
+    """国家电网用电数据同步到飞书多维表格"""
+
 @app.command()
 def hello(name: Optional[str] = typer.Argument(None)):
     """Simple greeting command"""
@@ -21,6 +45,8 @@ def hello(name: Optional[str] = typer.Argument(None)):
 @app.command()
 def sgcc_login():
     """执行国家电网账号登录"""
+    from .login import LoginHelper
+
     helper = None
     console.print("开始执行登录...")
     try:
@@ -40,9 +66,34 @@ def sgcc_login():
             helper.close()
         console.print("登录流程结束。")
 
+@app.command()
+def session_check():
+    """不启动浏览器，检查已保存的登录会话是否仍然有效"""
+    from .login import LoginHelper
+
+    try:
+        helper = LoginHelper()
+    except ValueError as ve:
+        console.print(f"[bold red]配置错误: {ve}[/bold red]")
+        raise typer.Exit(1)
+    if not helper.is_login_info_valid():
+        console.print("[bold yellow]登录信息不存在或已过期[/bold yellow]")
+        raise typer.Exit(1)
+    valid = helper.probe_session()
+    if valid is None:
+        console.print("[bold yellow]无法判断会话状态（网络错误或探测接口响应无法识别，见日志）[/bold yellow]")
+        raise typer.Exit(2)
+    if not valid:
+        console.print("[bold red]会话已失效，需要重新登录[/bold red]")
+        raise typer.Exit(1)
+    console.print("[bold green]会话有效[/bold green]")
+
+
 @app.command()
 def bitable_list():
     """列出飞书多维表格应用"""
+    from .feishu_bitable import FeishuBitableHelper
+
     console.print("初始化 FeishuBitableHelper ...")
     try:
         helper = FeishuBitableHelper()
@@ -55,6 +106,8 @@ def bitable_list():
 @app.command()
 def bitable_update():
     """列出飞书多维表格应用"""
+    from .feishu_bitable import FeishuBitableHelper
+
     console.print("初始化 FeishuBitableHelper ...")
     try:
         helper = FeishuBitableHelper()
@@ -68,7 +121,14 @@ def bitable_update():
         console.print(f"[bold red]获取多维表格应用失败: {e}[/bold red]")
 
 @app.command()
-def run_sync_job():
+def run_sync_job(
+    full_refresh: bool = typer.Option(False, "--full-refresh", help="忽略水位线，重新抓取表格中的全部数据"),
+):
+    from .const import WATERMARK_FILE
+    from .feishu_bitable import FeishuBitableHelper
+    from .utils import index_feishu_records, iter_sgcc_data_with_cache, sync_meter_to_feishu, save_to_json
+    from .watermark import WatermarkStore
+
     # 初始化飞书助手
     feishu_helper = FeishuBitableHelper()
     
@@ -77,37 +137,196 @@ def run_sync_job():
         sort=[{"field_name": "日期", "desc": True}]
     )
     
-    # 获取国家电网数据(带缓存)
-    sgcc_data = get_sgcc_data_with_cache()
-    
-    # 填补缺失数据
-    filled_records, filled_count = fill_missing_data(feishu_response.items, sgcc_data)
-    
+    feishu_records = feishu_response.items or []
+    # 飞书记录只读取一次，按日期索引后供各户号共用
+    records_by_date = index_feishu_records(feishu_records)
+
+    # 获取国家电网数据(带缓存)，每个户号抓取完成后立即填补并批量写回飞书，同时继续抓取下一个户号
+    sgcc_data = {}
+    filled_count = 0
+    for meter_id, rows in iter_sgcc_data_with_cache(full_refresh=full_refresh):
+        sgcc_data[meter_id] = rows
+        filled_count += sync_meter_to_feishu(records_by_date, meter_id, rows, feishu_helper)
+    console.print(f"共填补 {filled_count} 个字段")
+
     # 保存填补后的数据用于调试
-    save_to_json(filled_records, "filled_records")
-    # 将填补后的数据更新回飞书
-    if filled_count > 0:
-        update_filled_records_to_feishu(filled_records, feishu_helper)
+    save_to_json([record.__dict__ for record in feishu_records], "filled_records")
+
+    # 同步完成后推进水位线，下次只抓取更新的日期；不超过飞书中已有记录的日期
+    if records_by_date:
+        WatermarkStore(os.getenv("WATERMARK_FILE", WATERMARK_FILE)).advance(sgcc_data, until=max(records_by_date))
+
+
+@app.command()
+def captcha_bench(
+    images_dir: str = typer.Argument(..., help="带标注的验证码背景图目录"),
+    model: str = typer.Option("captcha.onnx", help="ONNX 模型路径"),
+    output: str = typer.Option("output/captcha_bench.json", help="结果 JSON 输出路径"),
+    tolerance: int = typer.Option(5, help="距离误差容忍范围（原始图片像素）"),
+):
+    """离线评测验证码识别的速度与准确率"""
+    from .onnx import ONNX
+    from .captcha_bench import run_captcha_bench, save_bench_result
+
+    try:
+        result = run_captcha_bench(images_dir, ONNX(model), tolerance=tolerance)
+    except Exception as e:
+        console.print(f"[bold red]验证码基准执行失败: {e}[/bold red]")
+        raise typer.Exit(1)
+
+    latency = result["latency_ms"]
+    console.print(f"图片数: {result['images']} (已标注 {result['labelled']})")
+    console.print(f"延迟 p50/p95/p99: {latency['p50']:.2f} / {latency['p95']:.2f} / {latency['p99']:.2f} ms")
+    console.print(f"吞吐: {result['throughput_per_s']:.1f} 张/秒")
+    if result["max_rss_mb"] is not None:
+        console.print(f"内存峰值: {result['max_rss_mb']:.1f} MB (含模型加载), "
+                      f"识别期间增长: {result['loop_rss_delta_mb']:.1f} MB")
+    if "error_px" in result:
+        console.print(f"平均误差: {result['error_px']['mean']:.2f} px, "
+                      f"准确率(±{tolerance}px): {result['accuracy']:.1%}")
+    save_bench_result(result, output)
+    console.print(f"结果已保存到: {output}")
+
+
+@app.command()
+def captcha_quantize(
+    corpus_dir: str = typer.Argument(..., help="用于精度校验的验证码背景图目录"),
+    model: str = typer.Option("captcha.onnx", help="FP32 模型路径"),
+    output: Optional[str] = typer.Option(None, help="INT8 模型输出路径，默认 captcha.int8.onnx"),
+    mode: str = typer.Option("dynamic", help="量化方式: dynamic / static"),
+    calibration_dir: Optional[str] = typer.Option(None, help="static 量化的校准图片目录，默认使用校验目录"),
+    tolerance: float = typer.Option(3.0, help="允许的平均距离误差（像素）"),
+):
+    """生成 INT8 验证码模型并校验精度"""
+    from .quantize import quantize_model, evaluate_quantized
+
+    try:
+        quantized = quantize_model(model, output, mode=mode, calibration_dir=calibration_dir or corpus_dir)
+        record = evaluate_quantized(model, quantized, corpus_dir, tolerance)
+    except Exception as e:
+        console.print(f"[bold red]模型量化失败: {e}[/bold red]")
+        raise typer.Exit(1)
+
+    console.print(f"INT8模型: {quantized}")
+    console.print(f"平均误差: {record['mean_error']:.2f} px, 最大误差: {record['max_error']:.1f} px, "
+                  f"与FP32结果不一致: {record['disagreements']}/{record['images']}")
+    if record["passed"]:
+        console.print("[bold green]精度校验通过，设置 ONNX_MODEL_PRECISION=int8 即可启用[/bold green]")
+    else:
+        console.print(f"[bold red]精度校验未通过（容忍 {tolerance} px），INT8模型不会被加载[/bold red]")
+        raise typer.Exit(1)
+
+
+@app.command()
+def usage_history(
+    meter_id: Optional[str] = typer.Option(None, "--meter", help="户号，默认全部户号"),
+    start: Optional[str] = typer.Option(None, help="开始日期 YYYY-MM-DD"),
+    end: Optional[str] = typer.Option(None, help="结束日期 YYYY-MM-DD"),
+    cache_dir: str = typer.Option("sgcc_cache", help="旧的按天 JSON 缓存目录，未导入的文件会先导入"),
+):
+    """查询本地用电库中的历史日用电量"""
+    from rich.table import Table
+    from .usage_store import UsageStore
+
+    store = UsageStore.from_env()
+    try:
+        store.migrate_json_cache(cache_dir)
+        history = store.query([meter_id] if meter_id else None, start, end)
+    finally:
+        store.close()
+    if not history:
+        console.print("没有符合条件的用电数据")
+        return
+
+    for meter, rows in history.items():
+        table = Table(title=f"户号 {meter}")
+        for column in ("日期", "读数", "峰电量", "谷电量"):
+            table.add_column(column, justify="right")
+        for row in rows:
+            table.add_row(row["date"], *(
+                "" if row[key] is None else f"{row[key]:g}" for key in ("reading", "highNum", "lowNum")
+            ))
+        console.print(table)
+        high = sum(row["highNum"] or 0 for row in rows)
+        low = sum(row["lowNum"] or 0 for row in rows)
+        console.print(f"共 {len(rows)} 天，峰电量合计 {high:g}，谷电量合计 {low:g}")
 
 
 @app.command()
 def schedule_daily(hour: int = typer.Option(18, help="每天执行的小时（24小时制）"), minute: int = typer.Option(0, help="每天执行的分钟")):
     """
     每天定时执行一次数据同步，默认每天 18:00 执行
+    会话会在下次执行前过期时，提前刷新会话，避免同步时再做验证码登录
     """
+    from .accounts import load_accounts
+    from .session_expiry import load_saved_expiration, refresh_time
+
+    refresh_lead = timedelta(minutes=int(os.getenv("SESSION_REFRESH_LEAD_MINUTES", 60)))
+    warm_lead = int(os.getenv("BROWSER_POOL_WARM_LEAD_SECONDS", 120))
     console.print(f"[bold green]定时任务启动，每天{hour:02d}:{minute:02d}执行一次...[/bold green]")
     while True:
-        now = datetime.now()
+        now = datetime.now().astimezone()
         next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
         if now >= next_run:
             # 已过今天执行时间，则定到明天
             next_run += timedelta(days=1)
-        sleep_seconds = (next_run - now).total_seconds()
+
+        # 多账号时按最早过期的会话安排刷新，刷新时每个账号各自判断是否需要续期
+        accounts = load_accounts()
+        refresh_times = [
+            refresh_time(load_saved_expiration(account["login_info_file"]), next_run, refresh_lead, now=now)
+            for account in accounts
+        ]
+        refresh_times = [t for t in refresh_times if t is not None and t < next_run]
+        if refresh_times:
+            refresh_at = min(refresh_times)
+            console.print(f"会话将在下次执行前过期，预计 {refresh_at} 提前刷新")
+            time.sleep(max(0.0, (refresh_at - datetime.now().astimezone()).total_seconds()))
+            for account in accounts:
+                try:
+                    _refresh_session(next_run, account)
+                except Exception as e:
+                    console.print(f"[bold red]账号 {account['username']} 刷新会话失败: {e}[/bold red]")
+
+        sleep_seconds = max(0.0, (next_run - datetime.now().astimezone()).total_seconds())
         console.print(f"距离下次执行还有 {int(sleep_seconds)} 秒，预计下次执行时间: {next_run}")
-        time.sleep(sleep_seconds)
+        warm_at = next_run - timedelta(seconds=warm_lead)
+        time.sleep(max(0.0, (warm_at - datetime.now().astimezone()).total_seconds()))
+        try:
+            _warm_browser_pool(accounts)
+        except Exception as e:
+            console.print(f"[bold yellow]预热浏览器池失败，将在同步时启动浏览器: {e}[/bold yellow]")
+        time.sleep(max(0.0, (next_run - datetime.now().astimezone()).total_seconds()))
         try:
-            run_sync_job()
+            run_sync_job(full_refresh=False)
         except Exception as e:
             console.print(f"[bold red]定时任务执行失败: {e}[/bold red]")
+
+
+def _warm_browser_pool(accounts):
+    """启用浏览器池时，在同步前启动与并发账号数相同的浏览器"""
+    from .login import LoginHelper
+
+    if not accounts or int(os.getenv("BROWSER_POOL_SIZE", 0)) <= 0:
+        return
+    concurrency = min(len(accounts), int(os.getenv("ACCOUNTS_CONCURRENCY", 2)))
+    # 浏览器启动参数与账号无关，用第一个账号的配置启动
+    launched = LoginHelper(accounts[0]).warm_browser_pool(concurrency)
+    console.print(f"浏览器池已预热，新启动 {launched} 个实例")
+
+
+def _refresh_session(valid_until, account=None):
+    from .login import LoginHelper
+
+    helper = LoginHelper(account)
+    try:
+        if helper.refresh_session(valid_until):
+            console.print("[bold green]会话刷新完成[/bold green]")
+        else:
+            console.print("[bold red]会话刷新失败，将在同步时重新登录[/bold red]")
+    finally:
+        helper.close()
+
+
 if __name__ == "__main__":
     app()
@@ -3,5 +3,15 @@
 LOGIN_URL = "https://www.95598.cn/osgweb/login"
 ELECTRIC_USAGE_URL = "https://www.95598.cn/osgweb/electricityCharge"
 BALANCE_URL = "https://www.95598.cn/osgweb/userAcc"
+# 电费页面“日用电量”标签请求的接口，返回 data.sevenEleList
+DAILY_USAGE_API_URL = "https://www.95598.cn/api/osg-web0004/member/c24/f01"
+# 需要登录的接口，用于不启动浏览器探测会话；页面地址是单页应用外壳，未登录也返回 200，不能用于探测
+SESSION_PROBE_URL = DAILY_USAGE_API_URL
 
 LOGIN_INFO_FILE = "login_info.json"
+CAPTCHA_CACHE_FILE = "captcha_cache.json"
+ACCOUNTS_FILE = "accounts.json"
+REQUEST_BLOCKING_STATS_FILE = "request_blocking_stats.json"
+WAIT_TIMINGS_FILE = "wait_timings.json"
+WATERMARK_FILE = "watermarks.json"
+USAGE_DB_FILE = "sgcc_usage.db"
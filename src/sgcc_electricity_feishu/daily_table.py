@@ -0,0 +1,138 @@
+import re
+from html import unescape
+
+# 没有结束标签的元素，不入栈
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# 按 HTML 规则，这些开始标签会隐式结束尚未闭合的同类元素
+IMPLIED_END = {"p": ("p",), "td": ("td",), "tr": ("tr", "td")}
+SCOPE_TAGS = ("table", "tbody", "td", "div")
+
+# 单遍正则切分：注释 | script/style 整体 | 结束标签 | 开始标签 | 文本
+_TOKEN = re.compile(
+    r"<!--.*?-->|<(script|style)\b.*?</\1\s*>|</\s*([a-zA-Z][\w-]*)\s*>|<([a-zA-Z][\w-]*)([^>]*)>|([^<]+)|<",
+    re.S | re.I,
+)
+_CLASS_ATTR = re.compile(r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.I)
+
+
+class DailyTableParser:
+    """解析日用电量表格（el-table）的 HTML
+
+    数据行 tr.el-table__row 的第 1、2 列为日期和读数；展开后紧随其后的行中
+    div.drop-box-left 的第 1 个 p 为谷电量、第 3 个 p 为峰电量（取 span.num）。
+    结果与逐行点击的 JS 一致：[{date, reading, highNum, lowNum}]，
+    未展开的行峰谷电量为 '0'，日期记录在 missing_detail 中。
+
+    只关心表格结构，用单个正则切分标签和文本，比 html.parser 快数倍；
+    用法与 HTMLParser 相同：feed() 后 close()，但 feed() 需要传入完整的 HTML。
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.missing_detail = set()
+        self._stack = []
+        self._row = None
+        self._in_data_row = False
+        self._td_index = 0
+        self._cell_text = None
+        self._detail_depth = None
+        self._p_index = 0
+        self._num_text = None
+
+    def feed(self, html):
+        for match in _TOKEN.finditer(html):
+            end_tag, start_tag, text = match.group(2, 3, 5)
+            if start_tag:
+                self.handle_starttag(start_tag.lower(), match.group(4))
+            elif end_tag:
+                self.handle_endtag(end_tag.lower())
+            elif text and (self._cell_text is not None or self._num_text is not None):
+                self.handle_data(unescape(text) if "&" in text else text)
+
+    def handle_starttag(self, tag, attr_text):
+        if tag in VOID_TAGS:
+            return
+        classes = ()
+        if tag in ("tr", "div", "span") and attr_text:
+            match = _CLASS_ATTR.search(attr_text)
+            if match:
+                classes = (match.group(1) or match.group(2) or match.group(3) or "").split()
+        if tag in IMPLIED_END:
+            self._close_implied(tag)
+        self._stack.append(tag)
+        depth = len(self._stack)
+        if tag == "tr":
+            if "el-table__row" in classes:
+                self._row = {"date": "", "reading": "", "highNum": None, "lowNum": None}
+                self.rows.append(self._row)
+                self._in_data_row = True
+                self._td_index = 0
+            else:
+                # 展开行，属于上一个数据行
+                self._in_data_row = False
+        elif tag == "td" and self._in_data_row:
+            self._td_index += 1
+            if self._td_index in (1, 2):
+                self._cell_text = []
+        elif tag == "div" and "drop-box-left" in classes and self._row is not None and not self._in_data_row:
+            self._detail_depth = depth
+            self._p_index = 0
+        elif tag == "p" and self._detail_depth is not None and depth == self._detail_depth + 1:
+            self._p_index += 1
+        elif tag == "span" and "num" in classes and self._detail_depth is not None and self._p_index in (1, 3):
+            self._num_text = []
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS or tag not in self._stack:
+            return
+        # 容忍未闭合的标签：弹出到匹配的开始标签为止
+        while self._stack:
+            depth = len(self._stack)
+            current = self._stack.pop()
+            self._close(current, depth)
+            if current == tag:
+                break
+
+    def _close_implied(self, tag):
+        for current in reversed(self._stack):
+            if current in IMPLIED_END[tag]:
+                self.handle_endtag(current)
+                return
+            if current in SCOPE_TAGS:
+                return
+
+    def _close(self, tag, depth):
+        if tag == "td" and self._cell_text is not None:
+            text = "".join(self._cell_text).strip()
+            self._row["date" if self._td_index == 1 else "reading"] = text
+            self._cell_text = None
+        elif tag == "span" and self._num_text is not None:
+            text = "".join(self._num_text).strip() or "0"
+            self._row["lowNum" if self._p_index == 1 else "highNum"] = text
+            self._num_text = None
+        elif tag == "div" and depth == self._detail_depth:
+            self._detail_depth = None
+            # 找到展开内容，缺失的一项按 JS 的约定记为 '0'
+            self._row["lowNum"] = self._row["lowNum"] or "0"
+            self._row["highNum"] = self._row["highNum"] or "0"
+
+    def handle_data(self, data):
+        if self._cell_text is not None:
+            self._cell_text.append(data)
+        elif self._num_text is not None:
+            self._num_text.append(data)
+
+    def close(self):
+        for row in self.rows:
+            if row["highNum"] is None and row["lowNum"] is None:
+                self.missing_detail.add(row["date"])
+            row["highNum"] = row["highNum"] or "0"
+            row["lowNum"] = row["lowNum"] or "0"
+
+
+def parse_daily_table(html):
+    """解析日用电量表格 HTML，返回 [{date, reading, highNum, lowNum}]"""
+    parser = DailyTableParser()
+    parser.feed(html)
+    parser.close()
+    return parser.rows
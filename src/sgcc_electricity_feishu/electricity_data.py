@@ -2,13 +2,97 @@ import time
 import logging
 import os
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from dotenv import load_dotenv
 
+from .network_capture import NetworkCapture, capture_enabled
+from .latency_model import LatencyModel
+from .waits import PageWaiter, script_timeout
+from .watermark import rows_after
+from .daily_table import DailyTableParser
+
+USER_SELECT_XPATH = '//*[@id="main"]/div/div[1]/div/ul/li/div[2]/div/input'
+DAILY_TABLE_ROWS_CSS = "#pane-second div.el-table__body-wrapper table tbody tr"
+USER_MENU_ITEM_XPATH = "/html/body/div[2]/div[1]/div[1]/ul/li[{index}]"
+
+# 以下为 PageWaiter.wait_dom 的判断函数体，参数通过 args 传入
+USER_MENU_ITEM_VISIBLE_JS = """
+const item = document.evaluate(args.xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+return !!item && item.offsetParent !== null;
+"""
+USER_SELECTED_JS = """
+const input = document.evaluate(args.xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+return !!input && input.value.includes(args.userId);
+"""
+# 表格有数据且内容与切换用户前不同
+TABLE_FILLED_JS = """
+const rows = document.querySelectorAll(args.css);
+if (!rows.length || !rows[0].innerText.trim()) return false;
+return rows.length + ":" + rows[0].innerText !== args.previous;
+"""
+DAILY_TBODY_CSS = (
+    "#pane-second > div:nth-child(2) > div.about > div.el-table.about-table.trcen.el-table--fit"
+    ".el-table--enable-row-hover.el-table--enable-row-transition > div.el-table__body-wrapper.is-scrolling-none"
+    " > table > tbody"
+)
+# 一次性展开所有（晚于水位线的）行，全部展开或超时后返回 tbody 的 HTML。
+# 先展开前两行：第二行展开后第一行被收起，说明表格一次只能展开一行，立即返回 'accordion'，
+# 不必等到超时
+EXPAND_ALL_ROWS_JS = """
+const done = arguments[arguments.length - 1];
+const [css, watermark, timeoutMs] = arguments;
+const tbody = document.querySelector(css);
+if (!tbody) { done(null); return; }
+const rowDate = (tr) => tr.querySelector('td:nth-child(1) div')?.innerText.trim() || '';
+const rows = [...tbody.querySelectorAll('tr.el-table__row')]
+    .filter(tr => !(watermark && rowDate(tr) && rowDate(tr) <= watermark));
+const expanded = (tr) => tr.classList.contains('expanded') && !!tr.nextElementSibling?.querySelector('div.drop-box-left');
+const expand = (tr) => { if (!tr.classList.contains('expanded')) tr.querySelector('td:nth-child(3) div div')?.click(); };
+const deadline = Date.now() + timeoutMs;
+const waitFor = (predicate, next) => (function poll() {
+    if (predicate() || Date.now() > deadline) { next(predicate()); return; }
+    setTimeout(poll, 50);
+})();
+const expandAll = () => {
+    rows.forEach(expand);
+    waitFor(() => rows.every(expanded), () => done(tbody.outerHTML));
+};
+// 只有一行时无法判断是否为手风琴表格，直接展开
+if (rows.length < 2) { expandAll(); return; }
+expand(rows[0]);
+waitFor(() => expanded(rows[0]), () => {
+    expand(rows[1]);
+    waitFor(() => expanded(rows[1]), (ok) => {
+        if (ok && !expanded(rows[0])) { done('accordion'); return; }
+        expandAll();
+    });
+});
+"""
+TABLE_SIGNATURE_JS = """
+const rows = document.querySelectorAll(arguments[0]);
+return rows.length ? rows.length + ":" + rows[0].innerText : null;
+"""
+
+
+def user_selected(user_id):
+    """用户选择框中显示的是指定户号"""
+    def _predicate(driver):
+        try:
+            value = driver.find_element(By.XPATH, USER_SELECT_XPATH).get_attribute("value") or ""
+        except Exception:
+            return False
+        return user_id in value
+    return _predicate
+
 
 class ElectricityDataFetcher:
-    def __init__(self, driver):
+    def __init__(self, driver, user_ids=None, latency_model=None, watermarks=None, pending_user_ids=None):
+        """
+        Args:
+            latency_model: 记录各步骤耗时的 LatencyModel，为空时按 ADAPTIVE_WAITS 环境变量创建
+            watermarks: {户号: 已同步的最新日期}，只抓取晚于该日期的行；为空时全量抓取
+            pending_user_ids: 只抓取其中的户号（如之前失败的户号），为空时抓取全部
+        """
         self.driver = driver
         load_dotenv(verbose=True)
         self.IGNORE_USER_ID = os.getenv("IGNORE_USER_ID", "").split(",")
@@ -17,11 +101,53 @@ class ElectricityDataFetcher:
         # 获取USER_ID字符串，并分割为列表
         user_id_str = os.getenv("USER_ID", "")
         self.user_id_list = user_id_str.split(",") if user_id_str else []
+        # 多账号时由账号配置指定户号
+        if user_ids is not None:
+            self.user_id_list = list(user_ids)
+        # 日用电量接口响应的等待时间，超时后回退到页面抓取
+        self.capture_timeout = float(os.getenv("DAILY_USAGE_CAPTURE_TIMEOUT", 10))
+        self._capture = None
+        self._capture_checked = False
+        # 各步骤按条件等待，等待上限由历史耗时自动调整
+        self.latency_model = latency_model if latency_model is not None else LatencyModel.from_env()
+        self.waiter = PageWaiter(driver, model=self.latency_model)
+        self.watermarks = watermarks or {}
+        self.pending_user_ids = pending_user_ids
+        # 同一浏览器会话内对失败户号的重试次数，最后仍失败的户号及原因记录在 failed 中
+        self.session_retries = int(os.getenv("METER_SESSION_RETRIES", 1))
+        self.failed = {}
+        # bulk：一次展开全部行并离线解析表格 HTML；rows：逐行点击读取
+        self.dom_mode = os.getenv("DAILY_USAGE_DOM_MODE", "bulk").lower()
+
+    def _wait_for_daily_usage_response(self, capture):
+        """等待日用电量接口响应，上限同样按历史耗时调整"""
+        step = "日用电量接口响应"
+        timeout = self.latency_model.timeout(step, self.capture_timeout) if self.latency_model else self.capture_timeout
+        start = time.perf_counter()
+        data = capture.wait_for_json(timeout)
+        elapsed = time.perf_counter() - start
+        if self.latency_model:
+            self.latency_model.observe(step, elapsed)
+        logging.info(f"等待{step}: {elapsed:.2f}s (上限 {timeout:.1f}s)")
+        return data
+
+    def _network_capture(self):
+        """返回可用的 NetworkCapture，浏览器未开启 performance 日志时返回 None"""
+        if not self._capture_checked:
+            self._capture_checked = True
+            if capture_enabled():
+                capture = NetworkCapture(self.driver)
+                try:
+                    capture.drain()
+                    self._capture = capture
+                except Exception as e:
+                    logging.info(f"无法读取浏览器网络日志，使用页面抓取: {e}")
+        return self._capture
         
     def _click_button(self, driver, button_search_type, button_search_key):
         '''wrapped click function, click only when the element is clickable'''
         click_element = driver.find_element(button_search_type, button_search_key)
-        WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.element_to_be_clickable(click_element))
+        self.waiter.until("元素可点击", self.DRIVER_IMPLICITY_WAIT_TIME, EC.element_to_be_clickable(click_element))
         driver.execute_script("arguments[0].click();", click_element)
         
     def _choose_current_userid(self, driver, userid_index):
@@ -37,23 +163,122 @@ class ElectricityDataFetcher:
         current_userid = driver.find_element(By.XPATH, '//*[@id="app"]/div/div/article/div/div/div[2]/div/div/div[1]/div[2]/div/div/div/div[2]/div/div[1]/div/ul/div/li[1]/span[2]').text
         return current_userid
     
+    def _scrape_table_bulk(self, watermark):
+        """一次异步脚本展开全部行并取回表格 HTML 离线解析，有行没能展开时返回 None"""
+        step = "展开表格"
+        limit = self.waiter.limit(step, self.DRIVER_IMPLICITY_WAIT_TIME)
+        start = time.perf_counter()
+        try:
+            with script_timeout(self.driver, limit + 5):
+                html = self.driver.execute_async_script(
+                    EXPAND_ALL_ROWS_JS, DAILY_TBODY_CSS, watermark or "", int(limit * 1000)
+                )
+        except Exception as e:
+            logging.info(f"批量展开表格失败，改为逐行抓取: {e}")
+            return None
+        finally:
+            if self.latency_model:
+                self.latency_model.observe(step, time.perf_counter() - start)
+        if html == "accordion":
+            # 后续户号的表格相同，直接逐行抓取
+            logging.info("表格一次只能展开一行，改为逐行抓取")
+            self.dom_mode = "rows"
+            return None
+        if not html:
+            return None
+        parser = DailyTableParser()
+        parser.feed(html)
+        parser.close()
+        rows = rows_after(parser.rows, watermark)
+        missing = [row["date"] for row in rows if row["date"] in parser.missing_detail]
+        if missing:
+            # 表格只允许同时展开一行时会出现这种情况
+            logging.info(f"{len(missing)} 行未能同时展开，改为逐行抓取")
+            return None
+        return rows
+
+    def _table_signature(self):
+        try:
+            return self.driver.execute_script(TABLE_SIGNATURE_JS, DAILY_TABLE_ROWS_CSS)
+        except Exception:
+            return None
+
+    def _log_user_waits(self, user_id, first_timing):
+        timings = self.waiter.timings[first_timing:]
+        if timings:
+            detail = "，".join(f"{description} {elapsed:.2f}s" for description, elapsed, _ in timings)
+            total = sum(elapsed for _, elapsed, _ in timings)
+            logging.info(f"用户{user_id}等待共 {total:.2f}s: {detail}")
+
     def get_daily_electricity_data(self):
         """获取日用电量数据"""
+        return dict(self.iter_daily_electricity_data())
+
+    def iter_daily_electricity_data(self):
+        """逐个户号获取日用电量数据，每个户号完成后立即产出 (户号, 数据列表)
+
+        调用方可以在处理当前户号（如写入飞书）时再继续抓取下一个户号。
+        """
         logging.info("Try to get the userid list")
         
         # Get all user IDs
         user_id_list = self.user_id_list
         if not user_id_list:
             logging.error("Failed to get user IDs")
-            return {}
+            return
             
         logging.info(f"Here are a total of {len(user_id_list)} userids: {user_id_list}. Ignoring: {self.IGNORE_USER_ID}")
-        time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+        self.waiter.wait(
+            "电费页面用户选择框", self.RETRY_WAIT_TIME_OFFSET_UNIT + self.DRIVER_IMPLICITY_WAIT_TIME,
+            EC.presence_of_element_located((By.XPATH, USER_SELECT_XPATH)),
+        )
+
+        # 保留户号在下拉菜单中的位置，只抓取部分户号时也能按位置选择
+        indexed_ids = [
+            (index, user_id) for index, user_id in enumerate(user_id_list)
+            if self.pending_user_ids is None or user_id in self.pending_user_ids
+        ]
+        try:
+            self.failed = {}
+            yield from self._iter_users(indexed_ids)
+            for attempt in range(self.session_retries):
+                if not self.failed:
+                    break
+                retry_ids = [(index, user_id) for index, user_id in indexed_ids if user_id in self.failed]
+                logging.info(f"第 {attempt + 1} 次重试失败的户号: {[user_id for _, user_id in retry_ids]}")
+                self.failed = {}
+                self._reload_page()
+                yield from self._iter_users(retry_ids)
+            if self.failed:
+                logging.warning(f"以下户号获取失败: {self.failed}")
+        finally:
+            if self.latency_model:
+                self.latency_model.save()
 
-        result_data = {}
-        for userid_index, user_id in enumerate(user_id_list):           
+    def _reload_page(self):
+        """重试前刷新页面，避免停留在出错时的状态"""
+        try:
+            self.driver.refresh()
+        except Exception as e:
+            logging.info(f"刷新页面失败: {e}")
+        self.waiter.wait(
+            "电费页面用户选择框", self.RETRY_WAIT_TIME_OFFSET_UNIT + self.DRIVER_IMPLICITY_WAIT_TIME,
+            EC.presence_of_element_located((By.XPATH, USER_SELECT_XPATH)),
+        )
+
+    def _iter_users(self, indexed_ids):
+        for position, (userid_index, user_id) in enumerate(indexed_ids):
+            first_timing = len(self.waiter.timings)
+            if self.watermarks.get(user_id):
+                logging.info(f"用户{user_id}增量抓取，跳过 {self.watermarks[user_id]} 及之前的数据")
             try: 
                 try:
+                    previous_table = self._table_signature()
+                    # 切换用户前清空网络日志，只解析本次切换和点击触发的接口响应
+                    capture = self._network_capture()
+                    if capture:
+                        capture.drain()
+
                     # 首先用JS模拟点击展开详情
                     js_click_expand = """
                     const element = document.evaluate(
@@ -75,7 +300,13 @@ class ElectricityDataFetcher:
                     }
                     """
                     self.driver.execute_script(js_click_expand)
-                    time.sleep(1)  # 等待详情展开
+                    # 等待用户下拉菜单展开
+                    menu_item_xpath = USER_MENU_ITEM_XPATH.format(index=userid_index + 1)
+                    self.waiter.wait_dom(
+                        "用户下拉菜单", self.DRIVER_IMPLICITY_WAIT_TIME,
+                        USER_MENU_ITEM_VISIBLE_JS, {"xpath": menu_item_xpath},
+                        fallback=EC.visibility_of_element_located((By.XPATH, menu_item_xpath)),
+                    )
 
 
                     # 然后模拟点击用户选择菜单
@@ -85,18 +316,44 @@ class ElectricityDataFetcher:
                         return document.evaluate(path, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
                     }}
 
-                    const userMenuItem = getElementByXpath('/html/body/div[2]/div[1]/div[1]/ul/li[{userid_index + 1}]');
+                    // 优先按户号文本匹配，找不到时按位置选择
+                    const itemByIndex = getElementByXpath('/html/body/div[2]/div[1]/div[1]/ul/li[{userid_index + 1}]');
+                    const items = [...(getElementByXpath('/html/body/div[2]/div[1]/div[1]/ul')?.children || [])];
+                    const userMenuItem = items.find(li => li.innerText.includes(arguments[0])) || itemByIndex;
                     if (userMenuItem) {{
                         userMenuItem.click();
                         return true;
                     }}
                     return false;
                     """
-                    self.driver.execute_script(js_click_user_menu)
-                    time.sleep(5)  # 等待用户切换
+                    self.driver.execute_script(js_click_user_menu, user_id)
+                    # 未切换成功时页面上仍是上一个户号的数据，不能继续抓取
+                    if not self.waiter.wait_dom(
+                        "切换用户", 5, USER_SELECTED_JS, {"xpath": USER_SELECT_XPATH, "userId": user_id},
+                        fallback=user_selected(user_id),
+                    ):
+                        raise TimeoutError(f"切换到用户{user_id}超时")
                     # 点击"日用电量"按钮
                     self._click_button(self.driver, By.XPATH, '//*[@id="tab-second"]')
-                    time.sleep(5)  # 等待数据加载
+
+                    # 优先直接解析页面请求的接口 JSON，省去逐行点击展开
+                    watermark = self.watermarks.get(user_id)
+                    data = self._wait_for_daily_usage_response(capture) if capture else None
+                    if data is not None:
+                        yield user_id, rows_after(data, watermark)
+                        continue
+                    if capture:
+                        logging.info(f"未捕获到用户{user_id}的日用电量接口响应，改用页面抓取")
+                    if not self.waiter.wait_dom(
+                        "日用电量表格", 5, TABLE_FILLED_JS, {"css": DAILY_TABLE_ROWS_CSS, "previous": previous_table},
+                        fallback=EC.presence_of_element_located((By.CSS_SELECTOR, DAILY_TABLE_ROWS_CSS)),
+                    ):
+                        raise TimeoutError(f"用户{user_id}的日用电量表格未刷新")
+
+                    bulk_rows = self._scrape_table_bulk(watermark) if self.dom_mode == "bulk" else None
+                    if bulk_rows is not None:
+                        yield user_id, bulk_rows
+                        continue
 
                     # 执行JS脚本获取数据
                     js_script = """
@@ -106,6 +363,10 @@ class ElectricityDataFetcher:
                     
                     const trList = tbody.querySelectorAll('tr');
                     const result = [];
+                    // 增量抓取：不晚于水位线的日期已同步过，不再展开
+                    const watermark = arguments[0];
+                    const rowDate = (tr) => tr.querySelector('td:nth-child(1) div')?.innerText.trim() || '';
+                    const descending = trList.length > 1 && rowDate(trList[0]) > rowDate(trList[trList.length - 1]);
                     
                     async function getData(tr, index) {
                         const date = tr.querySelector('td:nth-child(1) div')?.innerText.trim() || '';
@@ -135,6 +396,12 @@ class ElectricityDataFetcher:
                     
                     // 逐个处理每行数据
                     for (let i = 0; i < trList.length; i++) {
+                        const date = rowDate(trList[i]);
+                        if (watermark && date && date <= watermark) {
+                            // 按日期倒序时之后的行都更早，直接结束
+                            if (descending) break;
+                            continue;
+                        }
                         const data = await getData(trList[i], i);
                         result.push(data);
                     }
@@ -143,19 +410,21 @@ class ElectricityDataFetcher:
                     """
                     
                     # 执行JS并获取结果
-                    data = self.driver.execute_script(js_script)
-                    result_data[user_id] = data
+                    data = self.driver.execute_script(js_script, watermark)
+                    yield user_id, rows_after(data or [], watermark)
                     # logging.info(f"成功获取用户{user_id}的用电数据: {json.dumps(data, indent=2, ensure_ascii=False)}")
 
                 except Exception as e:
-                    if userid_index != len(user_id_list) - 1:
+                    self.failed[user_id] = str(e)
+                    if position != len(indexed_ids) - 1:
                         logging.info(f"用户{user_id}数据获取失败{e}, 将继续处理下一个用户")
                     else:
                         logging.info(f"用户{user_id}数据获取失败{e}")
                     continue
+                finally:
+                    self._log_user_waits(user_id, first_timing)
 
             except Exception as e:
+                self.failed[user_id] = str(e)
                 logging.error(f"处理用户{user_id}时发生错误: {e}")
-                continue
-        
-        return result_data
\ No newline at end of file
+                continue
\ No newline at end of file
@@ -86,6 +86,36 @@ class FeishuBitableHelper:
             console.print(f"[red]Failed to list fields, code: {response.code}, msg: {response.msg}[/red]")
             return None
 
+    def batch_update_records(self, updates, batch_size=500):
+        """批量更新记录，updates 为 [(record_id, fields_dict)]，每批最多 batch_size 条"""
+        from lark_oapi.api.bitable.v1 import (
+            BatchUpdateAppTableRecordRequest, BatchUpdateAppTableRecordRequestBody, AppTableRecord,
+        )
+
+        updated = []
+        for start in range(0, len(updates), batch_size):
+            records = [
+                AppTableRecord.builder().record_id(record_id).fields(fields_dict).build()
+                for record_id, fields_dict in updates[start:start + batch_size]
+            ]
+            request = BatchUpdateAppTableRecordRequest.builder() \
+                .app_token(self.app_token) \
+                .table_id(self.table_id) \
+                .request_body(
+                    BatchUpdateAppTableRecordRequestBody.builder()
+                    .records(records)
+                    .build()
+                ) \
+                .build()
+
+            response = self.client.bitable.v1.app_table_record.batch_update(request)
+
+            if response.success():
+                updated.extend(response.data.records or [])
+            else:
+                console.print(f"[red]Failed to batch update records, code: {response.code}, msg: {response.msg}[/red]")
+        return updated
+
     def update_record(self, record_id=None, fields_dict=None):
         from lark_oapi.api.bitable.v1 import UpdateAppTableRecordRequest, AppTableRecord
 
@@ -0,0 +1,56 @@
+import re
+import subprocess
+import sys
+
+# sef --import-profile 默认统计的模块：CLI 入口以及各命令按需导入的模块
+PROFILE_MODULES = [
+    "sgcc_electricity_feishu.main",
+    "sgcc_electricity_feishu.feishu_bitable",
+    "sgcc_electricity_feishu.login",
+    "sgcc_electricity_feishu.utils",
+]
+
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_import_time(stderr):
+    """解析 python -X importtime 的输出，返回 [(cumulative_us, self_us, 模块名, 层级), ...]"""
+    records = []
+    for line in stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append((int(cumulative_us), int(self_us), name, (len(indent) - 1) // 2))
+    return records
+
+
+def profile_import(module, top=10):
+    """在新的解释器中导入 module，返回 (总耗时us, 按累计耗时排序的前 top 个子模块)
+
+    子模块只统计直接导入的那一层，便于看出是哪个依赖拖慢了启动。
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败: {result.stderr.strip().splitlines()[-1:]}")
+    records = parse_import_time(result.stderr)
+    # 解释器启动阶段（site、encodings 等）的导入排在本项目包之前，不计入统计
+    package = module.split(".")[0]
+    start = next(
+        (i for i, (_, _, name, level) in enumerate(records)
+         if level == 0 and (name == package or name.startswith(package + "."))),
+        len(records),
+    )
+    # 子模块先于父模块输出，向前把包的子模块也包含进来
+    while start > 0 and records[start - 1][3] > 0:
+        start -= 1
+    records = records[start:]
+    total_us = sum(cumulative for cumulative, _, _, level in records if level == 0)
+    slowest = sorted(
+        ((cumulative, self_us, name) for cumulative, self_us, name, level in records if level == 1),
+        reverse=True,
+    )[:top]
+    return total_us, slowest
@@ -0,0 +1,106 @@
+import os
+import json
+import logging
+import threading
+from collections import deque
+
+from .const import WAIT_TIMINGS_FILE
+
+
+def percentile(samples, q):
+    """线性插值的百分位数，q 取 0-100"""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class LatencyModel:
+    """按步骤记录页面实际耗时，用滚动百分位数推导等待上限
+
+    每个步骤保留最近 window 个样本，样本不足 min_samples 时使用调用方给出的默认值；
+    之后等待上限为 百分位数 × headroom，并限制在默认值的 [min_scale, max_scale] 倍之间，
+    网络快时等待缩短，网络慢（包括超时）时自动放宽。
+    from_env() 返回进程内按文件共享的实例，多个账号线程的样本合并保存。
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=WAIT_TIMINGS_FILE, window=50, percentile=95, headroom=1.5,
+                 min_samples=5, min_scale=0.2, max_scale=2.0):
+        self.path = path
+        self.window = window
+        self.percentile_q = percentile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._samples = {}
+        self._load()
+
+    @classmethod
+    def from_env(cls):
+        """ADAPTIVE_WAITS=false 时返回 None，沿用固定等待时间"""
+        if os.getenv("ADAPTIVE_WAITS", "true").lower() != "true":
+            return None
+        path = os.getenv("WAIT_TIMINGS_FILE", WAIT_TIMINGS_FILE)
+        percentile = float(os.getenv("ADAPTIVE_WAIT_PERCENTILE", 95))
+        headroom = float(os.getenv("ADAPTIVE_WAIT_HEADROOM", 1.5))
+        if not path:
+            return cls(path, percentile=percentile, headroom=headroom)
+        key = (os.path.abspath(path), percentile, headroom)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(path, percentile=percentile, headroom=headroom)
+            return cls._shared[key]
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            for step, samples in data.items():
+                self._samples[step] = deque((float(s) for s in samples), maxlen=self.window)
+        except (json.JSONDecodeError, ValueError, TypeError, AttributeError) as e:
+            logging.warning(f"等待耗时记录文件损坏，将重新建立: {e}")
+            self._samples.clear()
+
+    def observe(self, step, seconds):
+        with self._lock:
+            self._samples.setdefault(step, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, step, q=None):
+        with self._lock:
+            samples = list(self._samples.get(step, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, self.percentile_q if q is None else q)
+
+    def timeout(self, step, default):
+        """步骤的等待上限，样本不足时返回 default"""
+        observed = self.percentile(step)
+        if observed is None:
+            return default
+        return min(max(observed * self.headroom, default * self.min_scale), default * self.max_scale)
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            # 串行保存，后保存的总是更新的快照
+            with self._save_lock:
+                with self._lock:
+                    data = {step: list(samples) for step, samples in self._samples.items()}
+                tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.error(f"保存等待耗时记录失败: {e}")
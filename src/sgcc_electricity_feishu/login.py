@@ -10,17 +10,32 @@ from PIL import Image
 from datetime import datetime, timedelta, timezone
 
 from selenium import webdriver
-from selenium.webdriver import ActionChains
+from selenium.webdriver.common.actions import interaction
+from selenium.webdriver.common.actions.action_builder import ActionBuilder
+from selenium.webdriver.common.actions.mouse_button import MouseButton
+from selenium.webdriver.common.actions.pointer_input import PointerInput
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.chrome.service import Service
 from dotenv import load_dotenv
 
 # 假设 const.py 和 onnx.py 在同一目录下或已正确配置路径
-from .electricity_data import ElectricityDataFetcher
-from .const import LOGIN_URL, LOGIN_INFO_FILE
+from .electricity_data import ElectricityDataFetcher, USER_SELECT_XPATH
+from .const import LOGIN_URL, LOGIN_INFO_FILE, CAPTCHA_CACHE_FILE, REQUEST_BLOCKING_STATS_FILE, SESSION_PROBE_URL
 from .onnx import ONNX # 导入ONNX类
+from .captcha_cache import CaptchaCache, image_fingerprint
+from .session_probe import probe_session, DEFAULT_INVALID_PATTERN, DEFAULT_SUCCESS_CODES
+from .session_expiry import compute_expiration, parse_expiration
+from .browser_pool import get_browser_pool
+from .latency_model import LatencyModel
+from .network_capture import capture_enabled, enable_performance_logging
+from .request_blocking import (
+    BlockingStats, PROTECTED_PATTERN, apply_request_blocking, blocked_url_patterns, navigation_metrics,
+)
+from .waits import (
+    PageWaiter, loading_mask_gone, elements_visible, xpath_present, url_changed, error_tip_visible,
+    error_tip_text, error_tip_changed, captcha_signature, captcha_rendered, slider_reset,
+)
 # 配置日志格式
 logging.basicConfig(
     level=logging.INFO,
@@ -44,15 +59,56 @@ def base64_to_PLI(base64_str: str):
         return None
 # --- End Helper function ---
 
+def slide_trajectory(distance, rng=random):
+    """预先计算滑动轨迹：加速 → 匀速 → 减速 → 微回弹
+
+    Returns:
+        [(x偏移, y偏移, 持续毫秒)]，最后一段为回弹
+    """
+    track = []
+    moved = 0
+    accel_end = distance * 0.4
+    cruise_end = distance * 0.8
+
+    while moved < distance:
+        remaining = distance - moved
+        if moved < accel_end:
+            step = rng.randint(8, 16)
+            delay = rng.uniform(0.005, 0.02)
+        elif moved < cruise_end:
+            step = rng.randint(4, 10)
+            delay = rng.uniform(0.01, 0.03)
+        else:
+            step = rng.randint(1, 4)
+            delay = rng.uniform(0.02, 0.06)
+
+        step = min(step, remaining)
+        track.append((step, rng.randint(-1, 1), int(delay * 1000)))
+        moved += step
+
+    # 微回弹，模拟真实滑动后的松手
+    track.append((-rng.randint(1, 3), 0, 0))
+    return track
+
+
 class LoginHelper:
-    def __init__(self):
+    def __init__(self, account=None):
+        """
+        Args:
+            account: accounts.load_accounts() 返回的账号，为空时读取 .env 中的 USERNAME / PASSWORD
+        """
         load_dotenv(verbose=True)
         self.chromedriver_path = os.getenv("CHROMEDRIVER_PATH")
         if not self.chromedriver_path:
             self.chromedriver_path = "/usr/bin/chromedriver"
             logging.warning("使用默认位置，如开发，请在 .env 文件中设置 CHROMEDRIVER_PATH")
-        self.username = os.getenv("USERNAME")
-        self.password = os.getenv("PASSWORD")
+        account = account or {}
+        self.username = account.get("username") or os.getenv("USERNAME")
+        self.password = account.get("password") or os.getenv("PASSWORD")
+        self.user_ids = account.get("user_id")
+        # 只需重新抓取的户号，为空时抓取全部
+        self.pending_user_ids = account.get("pending")
+        self.login_info_file = account.get("login_info_file") or LOGIN_INFO_FILE
         if not self.username or not self.password:
             logging.error("请在 .env 文件中设置 USERNAME 和 PASSWORD")
             raise ValueError("未设置用户名或密码")
@@ -60,6 +116,18 @@ class LoginHelper:
         self.driver_wait_time = int(os.getenv("DRIVER_IMPLICITY_WAIT_TIME", 60))
         self.retry_wait_time = int(os.getenv("RETRY_WAIT_TIME_OFFSET_UNIT", 10))
         self.retry_limit = int(os.getenv("RETRY_TIMES_LIMIT", 5))
+        # 同一张验证码上最多尝试的候选缺口数量及其最低置信度
+        self.captcha_max_candidates = int(os.getenv("CAPTCHA_MAX_CANDIDATES", 3))
+        self.captcha_min_confidence = float(os.getenv("CAPTCHA_MIN_CONFIDENCE", 0.3))
+        # 当前验证码的指纹、尚未尝试的候选距离和最近一次滑动的距离
+        self._captcha_key = None
+        self._captcha_candidates = []
+        self._captcha_last_distance = None
+        # 验证码识别结果缓存，CAPTCHA_CACHE_SIZE=0 时关闭
+        cache_size = int(os.getenv("CAPTCHA_CACHE_SIZE", 512))
+        self.captcha_cache = CaptchaCache.shared(
+            os.getenv("CAPTCHA_CACHE_FILE", CAPTCHA_CACHE_FILE), max_size=cache_size
+        ) if cache_size > 0 else None
 
         # 初始化 ONNX 模型
         onnx_model_path = os.getenv("ONNX_MODEL_PATH", "captcha.onnx") # 允许通过环境变量配置路径
@@ -74,16 +142,82 @@ class LoginHelper:
                 logging.error(f"加载ONNX模型失败: {e}")
                 self.onnx = None
 
-        # 初始化浏览器驱动
-        self.driver = self._init_driver()
+        # 记录各步骤的页面耗时，用于自动调整等待上限，ADAPTIVE_WAITS=false 时关闭
+        self.latency_model = LatencyModel.from_env()
+
+        # 浏览器驱动在第一次使用时才启动，会话探测等不需要浏览器的操作不会启动 Chrome
+        self._driver = None
+        self._waiter = None
+        self._pool = None
+        self._pooled_browser = None
+        self.session_probe_url = os.getenv("SESSION_PROBE_URL", SESSION_PROBE_URL)
+        self.session_probe_method = os.getenv("SESSION_PROBE_METHOD", "POST")
+        self.session_probe_invalid_pattern = os.getenv("SESSION_PROBE_INVALID_PATTERN", DEFAULT_INVALID_PATTERN)
+        self.session_probe_invalid_body = os.getenv("SESSION_PROBE_INVALID_BODY") or None
+        self.session_probe_valid_body = os.getenv("SESSION_PROBE_VALID_BODY") or None
+        success_codes = os.getenv("SESSION_PROBE_SUCCESS_CODES", ",".join(DEFAULT_SUCCESS_CODES))
+        self.session_probe_success_codes = tuple(code.strip() for code in success_codes.split(",") if code.strip())
+        auth_error_codes = os.getenv("SESSION_PROBE_AUTH_ERROR_CODES", "")
+        self.session_probe_auth_error_codes = tuple(code.strip() for code in auth_error_codes.split(",") if code.strip())
+        # 会话过期时间取认证 cookie 中最早的过期时间减去安全余量
+        auth_cookies = os.getenv("SESSION_AUTH_COOKIES", "")
+        self.session_auth_cookies = [name for name in auth_cookies.split(",") if name]
+        self.session_expiry_margin = timedelta(minutes=int(os.getenv("SESSION_EXPIRY_MARGIN_MINUTES", 30)))
+        # 屏蔽图片、字体、统计脚本等用不到的请求，并统计每次打开页面的流量和耗时
+        self.blocked_url_patterns = blocked_url_patterns()
+        self.blocking_stats = BlockingStats.shared(
+            os.getenv("REQUEST_BLOCKING_STATS_FILE", REQUEST_BLOCKING_STATS_FILE)
+        ) if os.getenv("NAVIGATION_METRICS", "true").lower() == "true" else None
         # 定义存储登录信息的文件路径（项目根目录下）
         self.login_info = self.load_login_info()
 
+    @property
+    def driver(self):
+        """浏览器驱动，第一次访问时启动 Chrome，启用浏览器池时从池中借出"""
+        if self._driver is None:
+            self._pool = get_browser_pool()
+            if self._pool:
+                self._driver, self._pooled_browser = self._pool.acquire(factory=self._init_driver)
+            else:
+                self._driver = self._init_driver()
+        return self._driver
+
+    @driver.setter
+    def driver(self, driver):
+        self._driver = driver
+        self._waiter = None
+
+    @property
+    def waiter(self):
+        if self._waiter is None:
+            self._waiter = PageWaiter(self.driver, model=getattr(self, "latency_model", None))
+        return self._waiter
+
+    def probe_session(self):
+        """不启动浏览器检查已保存的会话是否仍然有效，无法判断时返回 None"""
+        if not self.login_info or not self.login_info.get("cookies"):
+            return False
+        return probe_session(
+            self.login_info["cookies"],
+            url=self.session_probe_url,
+            invalid_pattern=self.session_probe_invalid_pattern,
+            invalid_body_pattern=self.session_probe_invalid_body,
+            valid_body_pattern=self.session_probe_valid_body,
+            success_codes=self.session_probe_success_codes,
+            auth_error_codes=self.session_probe_auth_error_codes,
+            method=self.session_probe_method,
+        )
+
+    def warm_browser_pool(self, n):
+        """启用浏览器池时提前启动 n 个浏览器，返回新启动的数量"""
+        pool = get_browser_pool()
+        return pool.warm(n, factory=self._init_driver) if pool else 0
+
     def load_login_info(self):
         """从文件加载登录信息"""
         try:
             logging.info("正在加载登录信息...")
-            with open(LOGIN_INFO_FILE, "r") as f:
+            with open(self.login_info_file, "r") as f:
                 return json.load(f)
         except FileNotFoundError:
             logging.info("未找到登录信息文件，将重新登录")
@@ -112,27 +246,93 @@ class LoginHelper:
                 logging.warning(f"获取sessionStorage失败: {e}")
                 login_info["sessionStorage"] = {}
             
-            with open(LOGIN_INFO_FILE, "w") as f:
+            with open(self.login_info_file, "w") as f:
                 json.dump(login_info, f, indent=4)
         except Exception as e:
             logging.error(f"保存登录信息失败: {e}")
             # 不再抛出异常，仅记录错误
 
+    def session_expiration(self):
+        """已保存会话的过期时间（带时区），没有登录信息时返回 None"""
+        if not self.login_info:
+            return None
+        return parse_expiration(self.login_info.get("expiration_time"))
+
     def is_login_info_valid(self):
         """检查登录信息是否有效（例如，检查过期时间）"""
-        if self.login_info and "expiration_time" in self.login_info:
+        logging.info("正在检查登录信息是否有效...")
+        expiration_time = self.session_expiration()
+        if expiration_time is None:
+            return False
+        now = datetime.now(timezone.utc)
+        logging.info(f"登录信息过期时间: {expiration_time.isoformat()}，当前时间: {now.isoformat()}")
+        return expiration_time > now
+
+    @staticmethod
+    def _to_cdp_cookie(cookie):
+        """把 Selenium 格式的 cookie 转成 CDP Network.CookieParam"""
+        cdp_cookie = {
+            'name': cookie['name'],
+            'value': cookie['value'],
+            'domain': cookie.get('domain', 'www.95598.cn'),
+            'path': cookie.get('path', '/'),
+            'secure': cookie.get('secure', False),
+            'httpOnly': cookie.get('httpOnly', False),
+        }
+        if 'expiry' in cookie:
+            cdp_cookie['expires'] = int(cookie['expiry'])
+        if cookie.get('sameSite') in ('Strict', 'Lax', 'None'):
+            cdp_cookie['sameSite'] = cookie['sameSite']
+        return cdp_cookie
+
+    def _restore_cookies(self, cookies):
+        """通过一次 CDP Network.setCookies 恢复全部 cookie，不支持 CDP 时逐个添加"""
+        try:
+            self.driver.execute_cdp_cmd("Network.setCookies", {
+                "cookies": [self._to_cdp_cookie(cookie) for cookie in cookies]
+            })
+            return
+        except Exception as e:
+            logging.warning(f"批量恢复cookie失败，改为逐个添加: {e}")
+
+        for cookie in cookies:
             try:
-                logging.info("正在检查登录信息是否有效...")
-                expiration_time = datetime.fromisoformat(self.login_info["expiration_time"].replace("Z", "+00:00"))
-                expiration_ts = expiration_time.timestamp()  # 转为时间戳
-                now_ts = datetime.now(timezone.utc).timestamp()  # 当前时间戳
-                logging.info(f"登录信息过期时间: {expiration_ts}")
-                logging.info(f"当前时间: {now_ts}")
-                return expiration_ts > now_ts  # 直接比较即可
-            except ValueError:
-                logging.warning("登录信息过期时间格式错误")
-                return False
-        return False
+                cookie_dict = {
+                    'name': cookie['name'],
+                    'value': cookie['value'],
+                    'domain': cookie.get('domain', 'www.95598.cn'),
+                    'path': cookie.get('path', '/'),
+                    'secure': cookie.get('secure', False),
+                    'httpOnly': cookie.get('httpOnly', False)
+                }
+                if 'expiry' in cookie:
+                    cookie_dict['expiry'] = int(cookie['expiry'])
+                if 'sameSite' in cookie:
+                    cookie_dict['sameSite'] = cookie['sameSite']
+                self.driver.add_cookie(cookie_dict)
+            except Exception as e:
+                logging.warning(f"添加cookie {cookie.get('name')} 失败: {e}")
+
+    def _restore_storage(self, local_storage, session_storage):
+        """一次脚本调用恢复 localStorage 和 sessionStorage，键值作为参数传入，不做字符串拼接"""
+        if not local_storage and not session_storage:
+            return
+        try:
+            self.driver.execute_script(
+                """
+                const [local, session] = arguments;
+                for (const [key, value] of Object.entries(local)) {
+                    window.localStorage.setItem(key, value);
+                }
+                for (const [key, value] of Object.entries(session)) {
+                    window.sessionStorage.setItem(key, value);
+                }
+                """,
+                local_storage or {},
+                session_storage or {},
+            )
+        except Exception as e:
+            logging.warning(f"恢复localStorage/sessionStorage失败: {e}")
 
     def resume_session(self):
         """尝试使用已保存的Cookie和Storage恢复会话"""
@@ -140,49 +340,29 @@ class LoginHelper:
             return False
             
         try:
+            start = time.perf_counter()
             # 先访问目标域名以设置cookie和storage
-            self.driver.get("https://www.95598.cn")
-            
-            # 恢复cookies
-            if "cookies" in self.login_info:
-                for cookie in self.login_info["cookies"]:
-                    try:
-                        cookie_dict = {
-                            'name': cookie['name'],
-                            'value': cookie['value'],
-                            'domain': cookie.get('domain', 'www.95598.cn'),
-                            'path': cookie.get('path', '/'),
-                            'secure': cookie.get('secure', False),
-                            'httpOnly': cookie.get('httpOnly', False)
-                        }
-                        if 'expiry' in cookie:
-                            cookie_dict['expiry'] = int(cookie['expiry'])
-                        if 'sameSite' in cookie:
-                            cookie_dict['sameSite'] = cookie['sameSite']
-                        self.driver.add_cookie(cookie_dict)
-                    except Exception as e:
-                        logging.warning(f"添加cookie {cookie.get('name')} 失败: {e}")
-
-            # 恢复localStorage
-            if "localStorage" in self.login_info:
-                for key, value in self.login_info["localStorage"].items():
-                    try:
-                        self.driver.execute_script(f"window.localStorage.setItem('{key}', '{value}');")
-                    except Exception as e:
-                        logging.warning(f"恢复localStorage {key} 失败: {e}")
+            self._navigate("https://www.95598.cn")
+            navigated = time.perf_counter()
+
+            cookies = self.login_info.get("cookies", [])
+            local_storage = self.login_info.get("localStorage", {})
+            session_storage = self.login_info.get("sessionStorage", {})
+            self._restore_cookies(cookies)
+            self._restore_storage(local_storage, session_storage)
+            logging.info(
+                f"恢复 {len(cookies)} 个cookie、{len(local_storage)} 个localStorage、"
+                f"{len(session_storage)} 个sessionStorage 耗时 {time.perf_counter() - navigated:.3f}s "
+                f"(打开首页 {navigated - start:.3f}s)"
+            )
 
-            # 恢复sessionStorage
-            if "sessionStorage" in self.login_info:
-                for key, value in self.login_info["sessionStorage"].items():
-                    try:
-                        self.driver.execute_script(f"window.sessionStorage.setItem('{key}', '{value}');")
-                    except Exception as e:
-                        logging.warning(f"恢复sessionStorage {key} 失败: {e}")
+            # 跳转到目标页面验证登录状态：会话失效时页面会跳回登录页
+            self._navigate("https://www.95598.cn/osgweb/electricityCharge")
+            self.waiter.wait(
+                "恢复会话后电费页加载", self.retry_wait_time,
+                xpath_present(USER_SELECT_XPATH), url_changed("electricityCharge"),
+            )
 
-            # 跳转到目标页面验证登录状态
-            self.driver.get("https://www.95598.cn/osgweb/electricityCharge")
-            time.sleep(2)  # 等待页面加载
-            
             # 检查是否在目标页面
             if "electricityCharge" in self.driver.current_url:
                 logging.info("成功恢复会话并跳转到目标页面")
@@ -194,9 +374,41 @@ class LoginHelper:
             logging.error(f"恢复会话失败: {e}")
             return False
 
-    def _init_driver(self):
-        """初始化浏览器驱动"""
+    def _navigate(self, url):
+        """打开页面，并记录传输字节数、加载耗时和请求屏蔽节省的流量"""
+        self.driver.get(url)
+        if not self.blocking_stats:
+            return
+        try:
+            metrics = navigation_metrics(self.driver)
+        except Exception as e:
+            logging.debug(f"读取页面加载统计失败: {e}")
+            return
+        protected = [u for u in metrics["blocked"] if PROTECTED_PATTERN.search(u)]
+        if protected:
+            logging.warning(f"请求屏蔽拦截了可能必要的请求: {protected[:3]}")
+        saved = self.blocking_stats.record(url, bool(self.blocked_url_patterns), metrics)
+        message = (
+            f"打开 {url}: 传输 {metrics['bytes'] / 1024:.0f} KB，{metrics['requests']} 个请求，"
+            f"拦截 {len(metrics['blocked'])} 个"
+        )
+        if metrics["load_ms"] is not None:
+            message += f"，加载 {metrics['load_ms']:.0f} ms"
+        if saved:
+            message += f"，相比不屏蔽节省 {saved[0] / 1024:.0f} KB / {saved[1]:.0f} ms"
+        logging.info(message)
+
+    def _implicit_wait_time(self):
+        """隐式等待时间：由元素出现的历史耗时推导，未启用自适应等待时为 DRIVER_IMPLICITY_WAIT_TIME"""
+        if self.latency_model:
+            return self.latency_model.timeout("元素出现", self.driver_wait_time)
+        return self.driver_wait_time
+
+    def _init_driver(self, user_data_dir=None):
+        """初始化浏览器驱动，user_data_dir 用于浏览器池中各实例的独立配置目录"""
         chrome_options = webdriver.ChromeOptions()
+        if user_data_dir:
+            chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
         # chrome_options.add_argument("--headless=new")
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-gpu")
@@ -210,13 +422,20 @@ class LoginHelper:
         chrome_options.add_argument(
             'user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
             '(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36')
+        if capture_enabled() or self.blocking_stats:
+            # 用于直接读取日用电量接口响应和统计页面流量
+            enable_performance_logging(chrome_options)
 
         chromedriver_path = self.chromedriver_path
         service = Service(executable_path=chromedriver_path)
 
         try:
             driver = webdriver.Chrome(service=service, options=chrome_options)
-            driver.implicitly_wait(self.driver_wait_time)
+            driver.implicitly_wait(self._implicit_wait_time())
+            try:
+                apply_request_blocking(driver, self.blocked_url_patterns)
+            except Exception as e:
+                logging.warning(f"启用请求屏蔽失败: {e}")
             logging.info("Chrome驱动初始化成功")
             return driver
         except Exception as e:
@@ -227,14 +446,12 @@ class LoginHelper:
         """封装点击操作，增加等待和日志"""
         wait_time = timeout if timeout is not None else self.driver_wait_time
         try:
-            logging.debug(f"等待点击元素: {by}={value} (超时: {wait_time}s)")
-            element = WebDriverWait(self.driver, wait_time).until(
-                EC.element_to_be_clickable((by, value))
-            )
+            logging.debug(f"等待点击元素: {by}={value}")
+            element = self.waiter.until("元素出现", wait_time, EC.element_to_be_clickable((by, value)))
             logging.debug(f"尝试点击元素: {by}={value}")
             self.driver.execute_script("arguments[0].click();", element)
             logging.debug(f"成功点击元素: {by}={value}")
-            time.sleep(0.5 + self.retry_wait_time / 20)
+            self.waiter.wait("点击后加载完成", 0.5 + self.retry_wait_time / 20, loading_mask_gone())
         except Exception as e:
             logging.error(f"点击元素失败: {by}={value}, 错误: {str(e)}")
             raise
@@ -243,10 +460,8 @@ class LoginHelper:
         """封装输入操作，增加等待和日志"""
         wait_time = timeout if timeout is not None else self.driver_wait_time
         try:
-            logging.debug(f"等待输入框元素: {by}={value} (超时: {wait_time}s)")
-            element = WebDriverWait(self.driver, wait_time).until(
-                EC.presence_of_element_located((by, value))
-            )
+            logging.debug(f"等待输入框元素: {by}={value}")
+            element = self.waiter.until("元素出现", wait_time, EC.presence_of_element_located((by, value)))
             logging.debug(f"清空并输入文本到: {by}={value}")
             element.clear()
             element.send_keys(text)
@@ -258,45 +473,87 @@ class LoginHelper:
     def _sliding_track(self, distance):
         """模拟人类滑动轨迹：加速 → 匀速 → 减速 → 微回弹"""
         try:
-            slider = WebDriverWait(self.driver, self.retry_wait_time).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "slide-verify-slider-mask-item"))
+            slider = self.waiter.until(
+                "滑块出现", self.retry_wait_time,
+                EC.presence_of_element_located((By.CLASS_NAME, "slide-verify-slider-mask-item")),
             )
             logging.info(f"找到滑块元素，准备滑动距离: {distance}")
-            ActionChains(self.driver).click_and_hold(slider).perform()
-
-            moved = 0
-            accel_end = distance * 0.4
-            cruise_end = distance * 0.8
-
-            while moved < distance:
-                remaining = distance - moved
-                if moved < accel_end:
-                    step = random.randint(8, 16)
-                    delay = random.uniform(0.005, 0.02)
-                elif moved < cruise_end:
-                    step = random.randint(4, 10)
-                    delay = random.uniform(0.01, 0.03)
-                else:
-                    step = random.randint(1, 4)
-                    delay = random.uniform(0.02, 0.06)
-
-                step = min(step, remaining)
-                y_jitter = random.uniform(-1, 1)
-                ActionChains(self.driver).move_by_offset(xoffset=step, yoffset=y_jitter).perform()
-                moved += step
-                time.sleep(delay)
-
-            # 微回弹，模拟真实滑动后的松手
-            rebound = random.randint(1, 3)
-            ActionChains(self.driver).move_by_offset(xoffset=-rebound, yoffset=0).perform()
-            time.sleep(random.uniform(0.05, 0.15))
-            ActionChains(self.driver).release().perform()
+
+            # 整条轨迹作为一个 W3C actions 序列发送，每段的停顿由浏览器按 duration 执行，只需一次往返
+            mouse = PointerInput(interaction.POINTER_MOUSE, "mouse")
+            builder = ActionBuilder(self.driver, mouse=mouse)
+            mouse.create_pointer_move(duration=0, origin=slider)
+            mouse.create_pointer_down(button=MouseButton.LEFT)
+            for x_offset, y_offset, duration in slide_trajectory(distance):
+                mouse.create_pointer_move(duration=duration, x=x_offset, y=y_offset, origin=interaction.POINTER)
+            mouse.create_pause(random.uniform(0.05, 0.15))
+            mouse.create_pointer_up(button=MouseButton.LEFT)
+            builder.perform()
             logging.info("滑块释放")
             return True
         except Exception as e:
             logging.error(f"滑动验证码失败: {e}")
             return False
 
+    def _get_captcha_background(self):
+        """获取验证码背景图，返回 (指纹, PIL图像)，失败时返回 (None, None)"""
+        background_JS = 'return document.getElementById("slideVerify").childNodes[0].toDataURL("image/png");'
+        im_info = self.driver.execute_script(background_JS)
+        if not im_info or 'base64' not in im_info:
+            logging.error("获取验证码背景图Base64失败")
+            return None, None
+
+        background = im_info.split(',')[1]
+        background_image = base64_to_PLI(background)
+        if background_image is None:
+            logging.error("转换验证码背景图失败")
+            return None, None
+        return image_fingerprint(background_image), background_image
+
+    def _next_captcha_distance(self, key, background_image):
+        """取出当前验证码的下一个候选距离，验证码换图后重新识别"""
+        if key != self._captcha_key:
+            self._captcha_key = key
+            accepted = self.captcha_cache.lookup(key) if self.captcha_cache else None
+            if accepted is not None:
+                logging.info(f"验证码命中缓存，直接使用距离: {accepted}")
+                self._captcha_candidates = [accepted]
+            else:
+                candidates = self.onnx.get_candidates(
+                    background_image,
+                    confidence_threshold=self.captcha_min_confidence,
+                    max_candidates=self.captcha_max_candidates,
+                )
+                logging.info(f"验证码候选缺口: {candidates}")
+                distances = [distance for distance, _ in candidates]
+                if self.captcha_cache:
+                    distances = self.captcha_cache.rank(key, distances)
+                self._captcha_candidates = distances
+        elif self._captcha_candidates:
+            logging.info("验证码未刷新，尝试下一个候选缺口")
+        if not self._captcha_candidates:
+            return 0
+        self._captcha_last_distance = self._captcha_candidates.pop(0)
+        return self._captcha_last_distance
+
+    def _record_captcha_result(self, accepted):
+        """把本次滑动的结果写入验证码缓存"""
+        if self.captcha_cache and self._captcha_key and self._captcha_last_distance is not None:
+            self.captcha_cache.record(self._captcha_key, self._captcha_last_distance, accepted)
+        self._captcha_last_distance = None
+
+    def _has_pending_candidates(self):
+        """当前验证码仍在页面上且还有未尝试的候选缺口"""
+        if not self._captcha_candidates:
+            return False
+        self.driver.implicitly_wait(0)
+        try:
+            return bool(self.driver.find_elements(By.ID, "slideVerify"))
+        except Exception:
+            return False
+        finally:
+            self.driver.implicitly_wait(self._implicit_wait_time())
+
     def _handle_captcha(self):
         """处理滑块验证码，使用 ONNX 模型识别缺口并计算正确的滑动距离"""
         if not self.onnx:
@@ -304,28 +561,18 @@ class LoginHelper:
             return False
 
         try:
-            WebDriverWait(self.driver, self.retry_wait_time).until(
-                EC.presence_of_element_located((By.ID, "slideVerify"))
-            )
+            self.waiter.until("验证码容器出现", self.retry_wait_time, EC.presence_of_element_located((By.ID, "slideVerify")))
             logging.info("检测到滑块验证码容器")
-            time.sleep(1)
+            self.waiter.wait("验证码画布绘制", 1, captcha_rendered())
 
             # 获取背景图片
-            background_JS = 'return document.getElementById("slideVerify").childNodes[0].toDataURL("image/png");'
-            im_info = self.driver.execute_script(background_JS)
-            if not im_info or 'base64' not in im_info:
-                logging.error("获取验证码背景图Base64失败")
-                return False
-
-            background = im_info.split(',')[1]
-            background_image = base64_to_PLI(background)
+            key, background_image = self._get_captcha_background()
             if background_image is None:
-                logging.error("转换验证码背景图失败")
                 return False
             logging.info("成功获取验证码背景图")
 
-            # 使用 ONNX 模型计算距离
-            distance = self.onnx.get_distance(background_image)
+            # 使用 ONNX 模型计算距离，同一张验证码依次尝试置信度更低的候选
+            distance = self._next_captcha_distance(key, background_image)
             if distance == 0:
                 logging.warning("ONNX模型未能检测到缺口")
                 return False
@@ -351,8 +598,6 @@ class LoginHelper:
 
             if not self._sliding_track(scaled_distance):
                 return False
-
-            time.sleep(self.retry_wait_time / 2)
             return True
 
         except Exception as e:
@@ -368,7 +613,16 @@ class LoginHelper:
         except Exception:
             return None
         finally:
-            self.driver.implicitly_wait(self.driver_wait_time)
+            self.driver.implicitly_wait(self._implicit_wait_time())
+
+    def _click_login_button(self):
+        """点击登录按钮，等待新验证码绘制、跳转或错误提示出现"""
+        previous = captcha_signature(self.driver)
+        self._click_element(By.CLASS_NAME, "el-button.el-button--primary")
+        self.waiter.wait(
+            "验证码或登录结果", self.retry_wait_time * 2,
+            captcha_rendered(previous), url_changed(LOGIN_URL), error_tip_visible(),
+        )
 
     def login(self):
         """执行登录操作，包含验证码处理"""
@@ -377,39 +631,30 @@ class LoginHelper:
             return False
 
         try:
-            self.driver.get(LOGIN_URL)
+            self._navigate(LOGIN_URL)
             logging.info(f"访问登录页面: {LOGIN_URL}")
 
             # 等待页面加载
-            try:
-                WebDriverWait(self.driver, self.driver_wait_time * 3).until(
-                    EC.visibility_of_element_located((By.CLASS_NAME, "user")))
-            except Exception:
+            if not self.waiter.wait(
+                "登录页加载", self.driver_wait_time * 3, EC.visibility_of_element_located((By.CLASS_NAME, "user"))
+            ):
                 logging.debug("登录页面加载超时")
 
-            time.sleep(self.retry_wait_time)
-
             # 等待加载遮罩消失
-            self.driver.implicitly_wait(0)
-            try:
-                WebDriverWait(self.driver, 10).until(
-                    EC.invisibility_of_element_located((By.CLASS_NAME, 'el-loading-mask')))
-            finally:
-                self.driver.implicitly_wait(self.driver_wait_time)
+            self.waiter.wait("登录页加载遮罩消失", self.retry_wait_time + 10, loading_mask_gone())
 
             # 切换到用户名密码登录
-            element = WebDriverWait(self.driver, self.driver_wait_time).until(
-                EC.presence_of_element_located((By.CLASS_NAME, 'user')))
+            element = self.waiter.until("元素出现", self.driver_wait_time, EC.presence_of_element_located((By.CLASS_NAME, 'user')))
             self.driver.execute_script("arguments[0].click();", element)
             logging.info("切换到用户名密码登录")
 
             self._click_element(By.XPATH, '//*[@id="login_box"]/div[1]/div[1]/div[2]/span')
-            time.sleep(self.retry_wait_time)
+            self.waiter.wait("账号密码表单显示", self.retry_wait_time, elements_visible("#login_box form"))
 
             # 点击同意按钮
             self._click_element(By.XPATH, '//*[@id="login_box"]/div[2]/div[1]/form/div[1]/div[3]/div/span[2]')
             logging.info("点击同意按钮")
-            time.sleep(self.retry_wait_time)
+            self.waiter.wait("用户名密码输入框显示", self.retry_wait_time, elements_visible(".el-input__inner", 2))
 
             # 输入用户名和密码
             input_elements = self.driver.find_elements(By.CLASS_NAME, "el-input__inner")
@@ -419,8 +664,7 @@ class LoginHelper:
             logging.info("输入密码")
 
             # 点击登录按钮
-            self._click_element(By.CLASS_NAME, "el-button.el-button--primary")
-            time.sleep(self.retry_wait_time * 2)
+            self._click_login_button()
             logging.info("点击登录按钮")
 
             # 验证码处理循环
@@ -432,22 +676,38 @@ class LoginHelper:
                     logging.info("登录成功")
                     return True
 
+                # 记下滑动前的错误提示，避免把上一次的提示当成本次结果
+                previous_tip = error_tip_text(self.driver)
+
                 # 处理验证码
                 if not self._handle_captcha():
                     logging.warning("验证码处理失败")
+                    self._captcha_key = None
                     try:
-                        self._click_element(By.CLASS_NAME, "el-button.el-button--primary")
-                        time.sleep(self.retry_wait_time * 2)
+                        self._click_login_button()
                     except Exception:
                         pass
                     continue
 
-                time.sleep(self.retry_wait_time)
+                # 等待跳转、新的错误提示或滑块复位，上限为原先滑动后的两段固定等待
+                failed = error_tip_changed(previous_tip)
+                reset = slider_reset()
+                self.waiter.wait(
+                    "滑块验证结果", self.retry_wait_time * 1.5,
+                    url_changed(LOGIN_URL), failed, reset,
+                )
 
                 # 检查是否登录成功
                 if LOGIN_URL not in self.driver.current_url:
                     logging.info("验证码验证成功，登录完成")
+                    self._record_captcha_result(True)
                     return True
+                if failed(self.driver) or reset(self.driver):
+                    self._record_captcha_result(False)
+                else:
+                    # 结果未知时不记入验证码缓存，以免把可能正确的距离标记为错误
+                    logging.info("未等到滑块验证结果")
+                    self._captcha_last_distance = None
 
                 # 获取错误信息
                 error_msg = self._get_error_message()
@@ -456,10 +716,15 @@ class LoginHelper:
                 else:
                     logging.info("滑块验证失败，重新尝试")
 
+                # 同一张验证码还有候选缺口时直接再滑一次，省去刷新验证码的等待
+                if self._has_pending_candidates():
+                    self.waiter.wait("滑块复位", self.retry_wait_time, slider_reset())
+                    continue
+
                 # 重新点击登录按钮触发新验证码
+                self._captcha_key = None
                 try:
-                    self._click_element(By.CLASS_NAME, "el-button.el-button--primary")
-                    time.sleep(self.retry_wait_time * 2)
+                    self._click_login_button()
                 except Exception:
                     pass
 
@@ -469,31 +734,78 @@ class LoginHelper:
         except Exception as e:
             logging.error(f"登录过程中发生严重错误: {str(e)}")
             return False
+        finally:
+            if self.captcha_cache:
+                logging.info(f"验证码缓存统计: {self.captcha_cache.stats()}")
+            waited = sum(elapsed for _, elapsed, _ in self.waiter.timings)
+            logging.info(f"登录过程条件等待共 {len(self.waiter.timings)} 次，耗时 {waited:.2f}s")
+            if self.latency_model:
+                self.latency_model.save()
     
+    def save_session(self):
+        """保存当前浏览器中的 cookie，过期时间根据认证 cookie 的实际有效期计算"""
+        cookies = self.driver.get_cookies()
+        expiration = compute_expiration(
+            cookies, self.session_auth_cookies, margin=self.session_expiry_margin
+        )
+        login_data = {
+            "cookies": cookies,
+            "expiration_time": expiration.isoformat(),
+        }
+        self.save_login_info(login_data)
+        self.login_info = login_data
+        logging.info(f"会话已保存，有效期至 {expiration.astimezone().isoformat()}")
+
     def wrapped_login(self):
         """包裹 login 方法，实现登录成功后保存 Cookies"""
         if self.login():
-            login_data = {
-                "cookies": self.driver.get_cookies(),
-                "expiration_time": str(datetime.now() + timedelta(days=1))
-            }
-            self.save_login_info(login_data)
+            self.save_session()
             return True
         else:
             return False
 
-    def fetch_data(self):
-        """获取用电量数据"""
+    def refresh_session(self, valid_until):
+        """保证会话在 valid_until 之前不会过期
+
+        会话仍可恢复时先恢复并重新保存 cookie（服务端续期后可直接延长有效期），
+        仍不足时才执行需要验证码的完整登录。
+        """
+        expiration = self.session_expiration()
+        if expiration is not None and expiration > valid_until:
+            logging.info("会话有效期充足，无需刷新")
+            return True
+        if self.is_login_info_valid() and self.probe_session() is not False and self.resume_session():
+            self.save_session()
+            expiration = self.session_expiration()
+            if expiration is not None and expiration > valid_until:
+                logging.info("会话已续期")
+                return True
+        logging.info("会话即将过期，提前重新登录")
+        return self.wrapped_login()
+
+    def fetch_data(self, watermarks=None):
+        """获取用电量数据
+
+        Args:
+            watermarks: {户号: 已同步的最新日期}，传入时只抓取更新的数据
+        """
+        data = dict(self.iter_data(watermarks))
+        logging.info(data)
+        return data
+
+    def iter_data(self, watermarks=None):
+        """登录后逐个户号产出 (户号, 用电数据列表)，参数同 fetch_data"""
         try:
-            # 尝试使用已保存的登录信息
-            if self.login_info and self.is_login_info_valid():
+            # 尝试使用已保存的登录信息，先用 HTTP 探测确认会话有效，避免在失效会话上白白恢复
+            if self.login_info and self.is_login_info_valid() and self.probe_session() is not False:
                 logging.info("使用已保存的登录信息")
-                self.resume_session()
+                if not self.resume_session():
+                    self.wrapped_login()
             else:
                 self.wrapped_login()
             # 跳转到电费查询页面
-            self.driver.get("https://www.95598.cn/osgweb/electricityCharge")
-            time.sleep(3)  # 等待页面加载
+            self._navigate("https://www.95598.cn/osgweb/electricityCharge")
+            self.waiter.wait("电费页加载", self.retry_wait_time, xpath_present(USER_SELECT_XPATH))
             # 检查并点击指定按钮
             # try:
             #     button = self.driver.find_element(
@@ -504,17 +816,27 @@ class LoginHelper:
             #     logging.warning("未找到指定按钮，可能已自动展开")
             
             # 使用ElectricityDataFetcher获取用电数据
-            data_fetcher = ElectricityDataFetcher(self.driver)
-            data = data_fetcher.get_daily_electricity_data()
-            logging.info(data)
-            return data
+            data_fetcher = ElectricityDataFetcher(
+                self.driver, user_ids=self.user_ids, latency_model=self.latency_model,
+                watermarks=watermarks, pending_user_ids=self.pending_user_ids,
+            )
+            yield from data_fetcher.iter_daily_electricity_data()
             
         except Exception as e:
             logging.error(f"获取用电数据失败: {e}")
             raise
 
     def close(self):
-        """关闭浏览器"""
-        if self.driver:
-            self.driver.quit()
+        """关闭浏览器，来自浏览器池的实例归还到池中"""
+        if self._pooled_browser:
+            self._pool.release(self._pooled_browser)
+            logging.info(f"浏览器已归还到浏览器池: {self._pool.metrics()}")
+            self._pooled_browser = None
+            self._driver = None
+        elif self._driver:
+            self._driver.quit()
+            self._driver = None
             logging.info("浏览器已关闭")
+        self._waiter = None
+        if getattr(self, "latency_model", None):
+            self.latency_model.save()
@@ -0,0 +1,127 @@
+import os
+import re
+import json
+import base64
+import time
+import logging
+from urllib.parse import urlparse
+
+from .const import DAILY_USAGE_API_URL
+
+# 只匹配日用电量接口的路径，可通过 DAILY_USAGE_API_PATTERN 覆盖
+DEFAULT_DAILY_USAGE_API_PATTERN = re.escape(urlparse(DAILY_USAGE_API_URL).path) + r"(?:[?#]|$)"
+
+# 接口 data.sevenEleList 中每天一条记录：day 为 20240101 格式的日期，dayElePq 为总电量，
+# thisPPq/thisVPq 为峰/谷电量（thisNPq、thisTPq 为平/尖电量，页面表格不展示，这里也不取）
+ROWS_KEY = "sevenEleList"
+DATE_KEY = "day"
+READING_KEY = "dayElePq"
+HIGH_KEY = "thisPPq"
+LOW_KEY = "thisVPq"
+
+
+def capture_enabled():
+    """DAILY_USAGE_CAPTURE=network（默认）时通过 DevTools 日志读取接口数据，dom 时沿用页面抓取"""
+    return os.getenv("DAILY_USAGE_CAPTURE", "network").lower() == "network"
+
+
+def enable_performance_logging(chrome_options):
+    """开启 Chrome performance 日志，用于读取页面发出的 XHR 响应"""
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def _value(item, key):
+    value = item.get(key)
+    if value in (None, ""):
+        return None
+    return str(value).strip()
+
+
+def parse_daily_usage(payload):
+    """把日用电量接口的 JSON 转成与 DOM 抓取一致的 [{date, reading, highNum, lowNum}]
+
+    Returns:
+        解析出的数据列表，响应中没有 data.sevenEleList 时返回 None
+    """
+    data = payload.get("data") if isinstance(payload, dict) else None
+    rows = data.get(ROWS_KEY) if isinstance(data, dict) else None
+    if not isinstance(rows, list):
+        return None
+    result = []
+    for item in rows:
+        date = _value(item, DATE_KEY) if isinstance(item, dict) else None
+        if not date:
+            continue
+        # 接口日期是 20240101，统一为页面上显示的 2024-01-01
+        if re.fullmatch(r"\d{8}", date):
+            date = f"{date[:4]}-{date[4:6]}-{date[6:]}"
+        result.append({
+            "date": date,
+            "reading": _value(item, READING_KEY) or "",
+            "highNum": _value(item, HIGH_KEY) or "0",
+            "lowNum": _value(item, LOW_KEY) or "0",
+        })
+    return result or None
+
+
+class NetworkCapture:
+    """从 Chrome performance 日志中找到匹配的接口响应，并通过 CDP 读取响应体"""
+
+    def __init__(self, driver, url_pattern=None):
+        self.driver = driver
+        self.url_pattern = re.compile(
+            url_pattern or os.getenv("DAILY_USAGE_API_PATTERN", DEFAULT_DAILY_USAGE_API_PATTERN)
+        )
+        self._responses = {}
+        self._finished = set()
+
+    def drain(self):
+        """丢弃已有的日志，之后只关注新发出的请求"""
+        self._poll()
+        self._responses.clear()
+        self._finished.clear()
+
+    def _poll(self):
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Network.responseReceived":
+                url = params.get("response", {}).get("url", "")
+                if self.url_pattern.search(url):
+                    self._responses[params["requestId"]] = url
+            elif method == "Network.loadingFinished":
+                self._finished.add(params.get("requestId"))
+
+    def _read_body(self, request_id):
+        body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        text = body.get("body", "")
+        try:
+            # 按二进制保存的响应（如未声明文本类型的 JSON）以 base64 返回
+            if body.get("base64Encoded"):
+                text = base64.b64decode(text)
+            return json.loads(text)
+        except ValueError:
+            return None
+
+    def wait_for_json(self, timeout=10, poll_interval=0.2, parse=parse_daily_usage):
+        """等待匹配的接口响应完成并解析，超时或响应无法解析时返回 None"""
+        deadline = time.monotonic() + timeout
+        while True:
+            self._poll()
+            for request_id in [r for r in self._responses if r in self._finished]:
+                url = self._responses.pop(request_id)
+                try:
+                    data = parse(self._read_body(request_id))
+                except Exception as e:
+                    logging.debug(f"读取接口响应失败 {url}: {e}")
+                    continue
+                if data:
+                    logging.info(f"从接口 {url} 获取到 {len(data)} 条数据")
+                    return data
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
@@ -1,4 +1,8 @@
 # import cv2
+import json
+import logging
+import os
+import threading
 from PIL import ImageDraw,Image,ImageOps
 import numpy as np
 import onnxruntime
@@ -7,11 +11,159 @@ anchors = [[(116,90),(156,198),(373,326)],[(30,61),(62,45),(59,119)],[(10,13),(1
 anchors_yolo_tiny = [[(81, 82), (135, 169), (344, 319)], [(10, 14), (23, 27), (37, 58)]]
 CLASSES=["target"]
 
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+# 进程内共享的推理会话，按模型绝对路径缓存
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def session_options_from_env():
+    """根据环境变量构造 SessionOptions
+
+    ONNX_INTRA_OP_THREADS / ONNX_INTER_OP_THREADS: 线程数，0 表示由 onnxruntime 决定
+    ONNX_GRAPH_OPTIMIZATION_LEVEL: disable / basic / extended / all
+    ONNX_EXECUTION_MODE: sequential / parallel
+    """
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", 0))
+    options.inter_op_num_threads = int(os.getenv("ONNX_INTER_OP_THREADS", 0))
+
+    level = os.getenv("ONNX_GRAPH_OPTIMIZATION_LEVEL", "all").lower()
+    if level not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"未知的 ONNX_GRAPH_OPTIMIZATION_LEVEL: {level}")
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[level]
+
+    mode = os.getenv("ONNX_EXECUTION_MODE", "sequential").lower()
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"未知的 ONNX_EXECUTION_MODE: {mode}")
+    options.execution_mode = EXECUTION_MODES[mode]
+    return options
+
+
+def optimized_model_path(model_path):
+    """优化后模型的保存路径，ONNX_OPTIMIZED_MODEL_PATH=none 时不保存
+
+    每个模型使用独立的路径，避免 FP32 和 INT8 模型互相复用对方的优化结果：
+    ONNX_OPTIMIZED_MODEL_PATH 为目录时保存为 <目录>/<模型名>.opt.onnx，
+    为文件路径时在文件名中插入模型名，如 /data/opt.onnx -> /data/opt.captcha.int8.onnx。
+    """
+    path = os.getenv("ONNX_OPTIMIZED_MODEL_PATH", "")
+    if path.lower() == "none":
+        return None
+    model_root, model_ext = os.path.splitext(model_path)
+    model_ext = model_ext or ".onnx"
+    if not path:
+        return f"{model_root}.opt{model_ext}"
+    model_stem = os.path.basename(model_root)
+    if path.endswith(("/", os.sep)) or os.path.isdir(path):
+        return os.path.join(path, f"{model_stem}.opt{model_ext}")
+    root, ext = os.path.splitext(path)
+    return f"{root}.{model_stem}{ext or model_ext}"
+
+
+def _create_session(model_path):
+    options = session_options_from_env()
+    opt_path = optimized_model_path(model_path)
+
+    # 已有比原模型新的优化结果时直接加载，跳过图优化
+    if opt_path and os.path.exists(opt_path) and os.path.getmtime(opt_path) >= os.path.getmtime(model_path):
+        try:
+            options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS["disable"]
+            session = onnxruntime.InferenceSession(opt_path, sess_options=options)
+            logging.info(f"加载已优化的ONNX模型: {opt_path}")
+            return session
+        except Exception as e:
+            logging.warning(f"加载已优化的ONNX模型失败，将重新优化: {e}")
+            options = session_options_from_env()
+
+    if opt_path:
+        options.optimized_model_filepath = opt_path
+        try:
+            session = onnxruntime.InferenceSession(model_path, sess_options=options)
+            logging.info(f"ONNX模型优化结果已保存: {opt_path}")
+            return session
+        except Exception as e:
+            logging.warning(f"保存优化后的ONNX模型失败: {e}")
+            options = session_options_from_env()
+
+    return onnxruntime.InferenceSession(model_path, sess_options=options)
+
+
+def get_session(model_path="captcha.onnx"):
+    """获取进程内共享的推理会话，同一模型只创建一次"""
+    key = os.path.abspath(model_path)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _create_session(model_path)
+            _sessions[key] = session
+        return session
+
+
+def quantized_model_path(model_path):
+    """INT8 模型路径，可通过 ONNX_QUANTIZED_MODEL_PATH 指定"""
+    path = os.getenv("ONNX_QUANTIZED_MODEL_PATH", "")
+    if path:
+        return path
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.int8{ext or '.onnx'}"
+
+
+def gate_record_path(quantized_path):
+    """量化模型精度校验结果的保存路径"""
+    return f"{quantized_path}.gate.json"
+
+
+def load_gate_record(quantized_path):
+    try:
+        with open(gate_record_path(quantized_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def resolve_model_path(model_path, precision="fp32"):
+    """按精度选择模型文件
+
+    precision 为 int8 时，只有量化模型存在、精度校验通过且晚于原模型生成才会使用，
+    否则回退到 FP32 模型。
+    """
+    if precision == "fp32":
+        return model_path
+    if precision != "int8":
+        raise ValueError(f"未知的模型精度: {precision}")
+
+    quantized_path = quantized_model_path(model_path)
+    if not os.path.exists(quantized_path):
+        logging.warning(f"INT8模型不存在: {quantized_path}，使用FP32模型")
+        return model_path
+    record = load_gate_record(quantized_path)
+    if not record or not record.get("passed"):
+        logging.warning(f"INT8模型未通过精度校验: {quantized_path}，使用FP32模型")
+        return model_path
+    if os.path.exists(model_path) and os.path.getmtime(model_path) > os.path.getmtime(quantized_path):
+        logging.warning(f"INT8模型早于原模型生成，请重新量化: {quantized_path}，使用FP32模型")
+        return model_path
+    logging.info(f"使用INT8模型: {quantized_path} (平均误差 {record.get('mean_error')} px)")
+    return quantized_path
 
 
 class ONNX:
-    def __init__(self,onnx_file_name="captcha.onnx"):
-        self.onnx_session = onnxruntime.InferenceSession(onnx_file_name)
+    def __init__(self,onnx_file_name="captcha.onnx",precision=None):
+        # precision: fp32 / int8，未指定时读取 ONNX_MODEL_PRECISION
+        precision = (precision or os.getenv("ONNX_MODEL_PRECISION", "fp32")).lower()
+        self.model_path = resolve_model_path(onnx_file_name, precision)
+        self.onnx_session = get_session(self.model_path)
 
     # sigmoid函数
     def sigmoid(self,x):
@@ -41,7 +193,8 @@ class ONNX:
 
     # dets:  array [x,6] 6个值分别为x1,y1,x2,y2,score,class
     # thresh: 阈值
-    def nms(self,dets, thresh):
+    # top_k: 保留到 top_k 个框后提前结束，None 表示不限制
+    def nms(self,dets, thresh, top_k=None):
         # dets:x1 y1 x2 y2 score class
         # x[:,n]就是取所有集合的第n个数据
         x1 = dets[:, 0]
@@ -54,7 +207,6 @@ class ONNX:
         # -------------------------------------------------------
         areas = (y2 - y1 + 1) * (x2 - x1 + 1)
         scores = dets[:, 4]
-        # print(scores)
         keep = []
         index = scores.argsort()[::-1]  # np.argsort()对某维度从小到大排序
         # [::-1] 从最后一个元素到第一个元素复制一遍。倒序从而从大到小排序
@@ -62,29 +214,37 @@ class ONNX:
         while index.size > 0:
             i = index[0]
             keep.append(i)
+            if top_k is not None and len(keep) >= top_k:
+                break
+            rest = index[1:]
             # -------------------------------------------------------
             #   计算相交面积
             #	1.相交
             #	2.不相交
             # -------------------------------------------------------
-            x11 = np.maximum(x1[i], x1[index[1:]])
-            y11 = np.maximum(y1[i], y1[index[1:]])
-            x22 = np.minimum(x2[i], x2[index[1:]])
-            y22 = np.minimum(y2[i], y2[index[1:]])
-
-            w = np.maximum(0, x22 - x11 + 1)
-            h = np.maximum(0, y22 - y11 + 1)
+            w = np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]) + 1
+            h = np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]) + 1
+            np.maximum(w, 0, out=w)
+            np.maximum(h, 0, out=h)
 
             overlaps = w * h
             # -------------------------------------------------------
             #   计算该框与其它框的IOU，去除掉重复的框，即IOU值大的框
             #	IOU小于thresh的框保留下来
             # -------------------------------------------------------
-            ious = overlaps / (areas[i] + areas[index[1:]] - overlaps)
-            idx = np.where(ious <= thresh)[0]
-            index = index[idx + 1]
+            ious = overlaps / (areas[i] + areas[rest] - overlaps)
+            index = rest[ious <= thresh]
         return keep
 
+    def batched_nms(self, dets, thresh, top_k=None):
+        """多类别一次性 NMS：按类别平移坐标，使不同类别的框互不相交"""
+        if len(dets) == 0:
+            return np.empty(0, dtype=np.int64)
+        coords = dets[:, :4]
+        span = coords.max() - coords.min() + 2
+        shifted = dets.copy()
+        shifted[:, :4] += (dets[:, 5] * span)[:, None]
+        return np.asarray(self.nms(shifted, thresh, top_k=top_k), dtype=np.int64)
 
     def draw(self,image, box_data):
         # -------------------------------------------------------
@@ -112,53 +272,33 @@ class ONNX:
         return image
 
     # 获取预测框
-    def get_boxes(self, prediction, confidence_threshold=0.7, nms_threshold=0.6):
+    def get_boxes(self, prediction, confidence_threshold=0.7, nms_threshold=0.6, top_k=None):
         # 过滤掉无用的框
         # -------------------------------------------------------
         #   删除为1的维度
         #	删除置信度小于conf_thres的BOX
         # -------------------------------------------------------
-        # for i in range(len(prediction)):
         feature_map = np.squeeze(prediction)# 删除数组形状中单维度条目(shape中为1的维度)
-        # […,4]：代表了取最里边一层的所有第4号元素，…代表了对:,:,:,等所有的的省略。此处生成：25200个第四号元素组成的数组
-        conf = feature_map[..., 4] > confidence_threshold  # 0 1 2 3 4 4是置信度，只要置信度 > conf_thres 的
-        box = feature_map[conf == True]  # 根据objectness score生成(n, 5+class_nm)，只留下符合要求的框
+        if feature_map.ndim == 1:
+            feature_map = feature_map[None, :]
+        # […,4]：代表了取最里边一层的所有第4号元素，此处只留下置信度 > conf_thres 的框
+        box = feature_map[feature_map[..., 4] > confidence_threshold]
+        if len(box) == 0:
+            return np.array([])
 
         # -------------------------------------------------------
-        #   通过argmax获取置信度最大的类别
-        # -------------------------------------------------------
-        cls_cinf = box[..., 5:]  # 左闭右开（5 6 7 8），就只剩下了每个grid cell中各类别的概率
-        cls = []
-        for i in range(len(cls_cinf)):
-            cls.append(int(np.argmax(cls_cinf[i])))  # 剩下的objecctness score比较大的grid cell，分别对应的预测类别列表
-        all_cls = list(set(cls))  # 去重，找出图中都有哪些类别
-        # set() 函数创建一个无序不重复元素集，可进行关系测试，删除重复数据，还可以计算交集、差集、并集等。
-        # -------------------------------------------------------
-        #   分别对每个类别进行过滤
-        #   1.将第6列元素替换为类别下标
-        #	2.xywh2xyxy 坐标转换
-        #	3.经过非极大抑制后输出的BOX下标
-        #	4.利用下标取出非极大抑制后的BOX
+        #   一次 argmax 得到每个框的类别，并写入第6列
+        #	xywh2xyxy 坐标转换后做一次多类别 NMS
         # -------------------------------------------------------
-        output = []
-        for i in range(len(all_cls)):
-            curr_cls = all_cls[i]
-            curr_cls_box = []
-            curr_out_box = []
-
-            for j in range(len(cls)):
-                if cls[j] == curr_cls:
-                    box[j][5] = curr_cls
-                    curr_cls_box.append(box[j][:6])  # 左闭右开，0 1 2 3 4 5
-
-            curr_cls_box = np.array(curr_cls_box)  # 0 1 2 3 4 5 分别是 x y w h score class
-            curr_cls_box = self.xywh2xyxy(curr_cls_box)  # 0 1 2 3 4 5 分别是 x1 y1 x2 y2 score class
-            curr_out_box = self.nms(curr_cls_box, nms_threshold)  # 获得nms后，剩下的类别在curr_cls_box中的下标
-
-            for k in curr_out_box:
-                output.append(curr_cls_box[k])
-        output = np.array(output)
-        return output
+        cls = np.argmax(box[:, 5:], axis=1)
+        dets = box[:, :6].copy()
+        dets[:, 5] = cls
+        dets = self.xywh2xyxy(dets)  # 0 1 2 3 4 5 分别是 x1 y1 x2 y2 score class
+        keep = self.batched_nms(dets, nms_threshold, top_k=top_k)
+
+        # 与逐类处理时的输出顺序保持一致：类别升序，类内按置信度降序
+        keep = keep[np.argsort(cls[keep], kind="stable")]
+        return dets[keep]
 
     def letterbox(self, img, new_shape=(640, 640), color=(114, 114, 114), auto=False, scaleFill=False, scaleup=True,
                     stride=32):
@@ -199,23 +339,70 @@ class ONNX:
         img = ImageOps.expand(img, border=(left, top, right, bottom), fill=0)##left,top,right,bottom
         return img, ratio, (dw, dh)
 
-    def _inference(self,image):
+    def _preprocess(self, image, out=None):
+        """把 PIL 图像写入 [3, 416, 416] 的 float32 张量
+
+        out 为预分配的缓冲区时直接写入，缩放后的 uint8 通道平面一次完成
+        类型转换和归一化，不再产生中间的 float32 副本。
+        """
         # org_img = cv2.resize(image, [416, 416]) # resize后的原图 (640, 640, 3)
         org_img = image.resize((416,416))
         # img = cv2.cvtColor(org_img, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
-        img = org_img.convert("RGB")
-        img = np.array(img).transpose(2, 0, 1)
-        img = img.astype(dtype=np.float32)  # onnx模型的类型是type: float32[ , , , ]
-        img /= 255.0
-        img = np.expand_dims(img, axis=0) # [3, 640, 640]扩展为[1, 3, 640, 640]
+        # RGBA 转 RGB 只是丢弃 alpha，直接按通道拆分即可，得到的平面已经是 CHW 排布
+        img = org_img if org_img.mode in ("RGB", "RGBA") else org_img.convert("RGB")
+        if out is None:
+            out = np.empty((3, 416, 416), dtype=np.float32)  # onnx模型的类型是type: float32[ , , , ]
+        for channel, band in enumerate(img.split()[:3]):
+            np.divide(np.asarray(band), np.float32(255.0), out=out[channel])
+        return out, org_img
+
+    def _input_buffer(self, batch_size):
+        """按需扩容并复用的 [N, 3, 416, 416] 输入缓冲区"""
+        buffer = getattr(self, "_buffer", None)
+        if buffer is None or len(buffer) < batch_size:
+            buffer = np.empty((batch_size, 3, 416, 416), dtype=np.float32)
+            self._buffer = buffer
+        return buffer[:batch_size]
+
+    def _inference(self,image):
+        img = self._input_buffer(1)  # [1, 3, 416, 416]
+        _, org_img = self._preprocess(image, out=img[0])
 
         inputs = {self.onnx_session.get_inputs()[0].name: img}
         prediction = self.onnx_session.run(None, inputs)[0]
         return prediction, org_img
 
+    def _inference_batch(self, images):
+        """将多张图片组成 [N, 3, 416, 416] 一次推理，返回 [N, ...] 的预测结果"""
+        batch = self._input_buffer(len(images))
+        for i, image in enumerate(images):
+            self._preprocess(image, out=batch[i])
+        model_input = self.onnx_session.get_inputs()[0]
+        # 模型的 batch 维度固定时按该大小分块推理
+        chunk = model_input.shape[0]
+        if not isinstance(chunk, int) or chunk <= 0:
+            chunk = len(batch)
+        predictions = [
+            self.onnx_session.run(None, {model_input.name: batch[i:i + chunk]})[0]
+            for i in range(0, len(batch), chunk)
+        ]
+        return np.concatenate(predictions, axis=0)
+
+    def _ranked_boxes(self, prediction, confidence_threshold=0.7, top_k=None):
+        """NMS 后按置信度从高到低排列的框"""
+        boxes = self.get_boxes(prediction=prediction, confidence_threshold=confidence_threshold, top_k=top_k)
+        if len(boxes) == 0:
+            return boxes
+        return boxes[np.argsort(-boxes[:, 4], kind="stable")]
+
+    @staticmethod
+    def _box_distance(box):
+        return int(box[:4].astype(np.int32)[0])
+
     def get_distance(self,image,draw=False):
         prediction, org_img = self._inference(image)
-        boxes = self.get_boxes(prediction=prediction)
+        # 只需要置信度最高的一个框，NMS 可以提前结束
+        boxes = self._ranked_boxes(prediction, top_k=1)
         if len(boxes) == 0:
             print('No gaps were detected.')
             return 0
@@ -226,7 +413,43 @@ class ONNX:
                 # cv2.imwrite('result.png', org_img)
                 org_img.save('result.png')
                 # cv2.waitKey(0)
-            return int(boxes[..., :4].astype(np.int32)[0][0])
+            return self._box_distance(boxes[0])
+
+    def get_candidates(self, image, confidence_threshold=0.3, max_candidates=None):
+        """返回按置信度从高到低排列的全部候选缺口
+
+        Args:
+            image: PIL 图像
+            confidence_threshold: 候选框的最低置信度，低于 get_distance 的 0.7，
+                便于首个答案失败后在同一张验证码上继续尝试
+            max_candidates: 最多返回的候选数量，None 表示不限制
+
+        Returns:
+            [(distance, score), ...]，没有候选时为空列表
+        """
+        prediction, _ = self._inference(image)
+        boxes = self._ranked_boxes(prediction, confidence_threshold=confidence_threshold, top_k=max_candidates)
+        return [(self._box_distance(box), float(box[4])) for box in boxes]
+
+    def get_distances(self, images):
+        """批量计算缺口距离
+
+        Args:
+            images: PIL 图像列表
+
+        Returns:
+            与输入一一对应的 (distance, score) 列表，未检测到缺口时为 (0, 0.0)
+        """
+        if not images:
+            return []
+        results = []
+        for prediction in self._inference_batch(images):
+            boxes = self._ranked_boxes(prediction[None], top_k=1)
+            if len(boxes) == 0:
+                results.append((0, 0.0))
+            else:
+                results.append((self._box_distance(boxes[0]), float(boxes[0][4])))
+        return results
 
 if __name__ == "__main__":
     onnx = ONNX()
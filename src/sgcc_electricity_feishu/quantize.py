@@ -0,0 +1,113 @@
+import os
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from .onnx import ONNX, gate_record_path, quantized_model_path
+from .captcha_bench import load_labelled_images, to_image_px
+
+
+def _load_quantization():
+    """onnxruntime.quantization 依赖 onnx 包，仅在量化时需要"""
+    try:
+        from onnxruntime import quantization
+    except ImportError as e:
+        raise RuntimeError("模型量化需要安装 onnx: pip install 'sgcc-electricity-feishu[quantize]'") from e
+    return quantization
+
+
+class CaptchaCalibrationReader:
+    """静态量化的校准数据，按模型输入格式逐张提供验证码背景图"""
+
+    def __init__(self, images_dir, input_name, limit=100):
+        paths = sorted(Path(images_dir).glob("*.png"))[:limit]
+        if not paths:
+            raise ValueError(f"{images_dir} 下没有可用于校准的 png 图片")
+        preprocessor = ONNX.__new__(ONNX)
+        self._inputs = iter([
+            {input_name: preprocessor._preprocess(Image.open(path))[0][None]}
+            for path in paths
+        ])
+
+    def get_next(self):
+        return next(self._inputs, None)
+
+
+def quantize_model(model_path, output=None, mode="dynamic", calibration_dir=None):
+    """把 FP32 模型量化为 INT8
+
+    Args:
+        model_path: FP32 模型路径
+        output: 输出路径，默认与 ONNX_MODEL_PRECISION=int8 时加载的路径一致
+        mode: dynamic（仅量化权重）或 static（权重与激活，需要校准图片）
+        calibration_dir: static 模式下的校准图片目录
+
+    Returns:
+        量化后的模型路径
+    """
+    quantization = _load_quantization()
+    output = output or quantized_model_path(model_path)
+    if mode == "dynamic":
+        quantization.quantize_dynamic(model_path, output, weight_type=quantization.QuantType.QUInt8)
+    elif mode == "static":
+        if not calibration_dir:
+            raise ValueError("static 量化需要提供校准图片目录")
+        input_name = ONNX(model_path, precision="fp32").onnx_session.get_inputs()[0].name
+        quantization.quantize_static(
+            model_path,
+            output,
+            CaptchaCalibrationReader(calibration_dir, input_name),
+            quant_format=quantization.QuantFormat.QDQ,
+            activation_type=quantization.QuantType.QUInt8,
+            weight_type=quantization.QuantType.QInt8,
+        )
+    else:
+        raise ValueError(f"未知的量化方式: {mode}")
+    logging.info(f"量化模型已保存: {output}")
+    return output
+
+
+def evaluate_quantized(model_path, quantized_path, corpus_dir, tolerance):
+    """在标注语料上校验量化模型的距离误差
+
+    有标注的图片与标注比较，没有标注的图片以 FP32 模型的结果作为参照，误差统一按原始图片像素计算。
+    平均误差不超过 tolerance 时视为通过，结果写入量化模型旁的 .gate.json。
+    """
+    samples = load_labelled_images(corpus_dir)
+    if not samples:
+        raise ValueError(f"{corpus_dir} 下没有 png 图片")
+    fp32 = ONNX(model_path, precision="fp32")
+    # 直接按路径加载量化模型，不经过精度校验的选择逻辑
+    int8 = ONNX(quantized_path, precision="fp32")
+
+    errors = []
+    disagreements = 0
+    for name, label in samples:
+        image = Image.open(Path(corpus_dir) / name).convert("RGB")
+        fp32_distance = fp32.get_distance(image)
+        int8_distance = int8.get_distance(image)
+        reference = label if label is not None else to_image_px(fp32_distance, image.width)
+        errors.append(abs(to_image_px(int8_distance, image.width) - reference))
+        if int8_distance != fp32_distance:
+            disagreements += 1
+
+    errors = np.array(errors)
+    record = {
+        "source": os.path.abspath(model_path),
+        "quantized": os.path.abspath(quantized_path),
+        "created_at": datetime.now().isoformat(),
+        "images": len(samples),
+        "labelled": sum(1 for _, label in samples if label is not None),
+        "mean_error": float(errors.mean()),
+        "max_error": float(errors.max()),
+        "disagreements": disagreements,
+        "tolerance": tolerance,
+        "passed": bool(errors.mean() <= tolerance),
+    }
+    with open(gate_record_path(quantized_path), "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2, ensure_ascii=False)
+    return record
@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import logging
+import threading
+from urllib.parse import urlparse
+
+from .const import LOGIN_URL, ELECTRIC_USAGE_URL, DAILY_USAGE_API_URL, REQUEST_BLOCKING_STATS_FILE
+
+
+def _extension_patterns(*extensions):
+    """按扩展名屏蔽的规则；通配符需匹配整个 URL，带查询参数（如 x.woff2?v=3）的地址另加一条"""
+    return [pattern for ext in extensions for pattern in (f"*.{ext}", f"*.{ext}?*")]
+
+
+# 按资源类型分组的屏蔽规则（Network.setBlockedURLs 的通配符格式）
+# png 不在其中；但验证码的背景和滑块也是图片，image 只在确认验证码不受影响时手动开启
+RESOURCE_TYPE_PATTERNS = {
+    "image": _extension_patterns("jpg", "jpeg", "gif", "webp", "svg", "ico", "bmp"),
+    "font": _extension_patterns("woff", "woff2", "ttf", "otf", "eot"),
+    "media": _extension_patterns("mp4", "webm", "mp3", "m3u8"),
+    "analytics": [
+        "*hm.baidu.com*", "*google-analytics.com*", "*googletagmanager.com*",
+        "*cnzz.com*", "*growingio.com*", "*sensorsdata*",
+    ],
+}
+# 默认只屏蔽字体和统计脚本，不影响验证码和页面数据
+DEFAULT_BLOCKED_TYPES = "font,analytics"
+
+# 验证码画布和用电数据表依赖的请求样例，命中其中任何一个的规则都会被丢弃；
+# 只是对自定义规则的粗略检查，运行时仍会对照 performance 日志检查实际被拦截的请求
+PROTECTED_URLS = (
+    LOGIN_URL,
+    ELECTRIC_USAGE_URL,
+    "https://www.95598.cn/osgweb/js/app.js",
+    "https://www.95598.cn/osgweb/js/chunk-vendors.js",
+    "https://www.95598.cn/osgweb/css/app.css",
+    DAILY_USAGE_API_URL,
+    "https://www.95598.cn/osgweb/img/slide-verify.png",
+)
+# 运行时被拦截时需要告警的请求
+PROTECTED_PATTERN = re.compile(r"/api/|\.js(\?|$)|\.css(\?|$)|\.png(\?|$)|(?i:captcha|verify)")
+
+
+def _wildcard_regex(pattern):
+    return re.compile(".*".join(re.escape(part) for part in pattern.split("*")) + "$")
+
+
+def blocked_url_patterns():
+    """根据 REQUEST_BLOCKING（资源类型，off 关闭）和 REQUEST_BLOCKING_EXTRA_PATTERNS 生成屏蔽规则"""
+    types = os.getenv("REQUEST_BLOCKING", DEFAULT_BLOCKED_TYPES).lower()
+    if types in ("", "off", "none", "false"):
+        return []
+    patterns = []
+    for resource_type in types.split(","):
+        resource_type = resource_type.strip()
+        if resource_type not in RESOURCE_TYPE_PATTERNS:
+            raise ValueError(f"未知的 REQUEST_BLOCKING 资源类型: {resource_type}")
+        patterns.extend(RESOURCE_TYPE_PATTERNS[resource_type])
+    extra = os.getenv("REQUEST_BLOCKING_EXTRA_PATTERNS", "")
+    patterns.extend(p.strip() for p in extra.split(",") if p.strip())
+
+    safe_patterns = []
+    for pattern in patterns:
+        regex = _wildcard_regex(pattern)
+        protected = [url for url in PROTECTED_URLS if regex.match(url)]
+        if protected:
+            logging.warning(f"屏蔽规则 {pattern} 会拦截必要请求 {protected[0]}，已忽略")
+            continue
+        safe_patterns.append(pattern)
+    return safe_patterns
+
+
+def apply_request_blocking(driver, patterns):
+    """通过 CDP 在浏览器中启用请求屏蔽"""
+    if not patterns:
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    logging.info(f"已启用 {len(patterns)} 条请求屏蔽规则")
+
+
+NAVIGATION_TIMING_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+return nav ? (nav.loadEventEnd || nav.duration) : null;
+"""
+
+
+def navigation_metrics(driver):
+    """从 performance 日志统计最近一次页面加载的传输字节数、请求数和被拦截的请求"""
+    urls = {}
+    transferred = 0
+    requests = 0
+    blocked = []
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        params = message.get("params", {})
+        method = message.get("method")
+        if method == "Network.requestWillBeSent":
+            urls[params.get("requestId")] = params.get("request", {}).get("url", "")
+        elif method == "Network.loadingFinished":
+            requests += 1
+            transferred += params.get("encodedDataLength", 0)
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            blocked.append(urls.get(params.get("requestId"), ""))
+    return {
+        "bytes": transferred,
+        "requests": requests,
+        "blocked": blocked,
+        "load_ms": driver.execute_script(NAVIGATION_TIMING_JS),
+    }
+
+
+class BlockingStats:
+    """按页面分别记录屏蔽开启/关闭时的平均传输字节数和加载耗时，用于估算节省量"""
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, path=REQUEST_BLOCKING_STATS_FILE):
+        """进程内同一文件只对应一个实例，多账号并发时统计不会互相覆盖"""
+        if not path:
+            return cls(path)
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(path)
+            return cls._shared[key]
+
+    def __init__(self, path=REQUEST_BLOCKING_STATS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pages = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self._pages = json.load(f)
+            except (json.JSONDecodeError, ValueError) as e:
+                logging.warning(f"请求屏蔽统计文件损坏，将重新建立: {e}")
+
+    def record(self, url, blocking, metrics):
+        """记录一次页面加载，两种模式都有样本时返回 (节省字节数, 节省毫秒数)"""
+        page = urlparse(url).path or "/"
+        mode = "blocked" if blocking else "full"
+        with self._lock:
+            sample = self._pages.setdefault(page, {}).setdefault(mode, {"count": 0, "bytes": 0.0, "load_ms": 0.0})
+            sample["count"] += 1
+            sample["bytes"] += (metrics["bytes"] - sample["bytes"]) / sample["count"]
+            if metrics.get("load_ms") is not None:
+                sample["load_ms"] += (metrics["load_ms"] - sample["load_ms"]) / sample["count"]
+            self._save()
+            samples = self._pages[page]
+            if "blocked" not in samples or "full" not in samples:
+                return None
+            return (
+                samples["full"]["bytes"] - samples["blocked"]["bytes"],
+                samples["full"]["load_ms"] - samples["blocked"]["load_ms"],
+            )
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._pages, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.error(f"保存请求屏蔽统计失败: {e}")
@@ -0,0 +1,70 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+
+# 未配置 SESSION_AUTH_COOKIES 时视为认证 cookie 的名称（不区分大小写）
+DEFAULT_AUTH_COOKIES = ("token", "access_token", "refresh_token", "session", "jsessionid")
+
+
+def compute_expiration(cookies, auth_cookie_names=None, margin=timedelta(minutes=30),
+                       default_lifetime=timedelta(days=1), min_lifetime=timedelta(minutes=15), now=None):
+    """根据实际拿到的 cookie 计算会话过期时间
+
+    只看认证 cookie（auth_cookie_names 为空时使用 DEFAULT_AUTH_COOKIES），取其中最早的过期时间
+    减去安全余量；统计类 cookie 的有效期与会话无关，不参与计算。
+    min_lifetime 内就会过期的 cookie 视为临时 cookie 忽略。
+    没有符合条件的 cookie 时退回 now + default_lifetime。
+
+    Returns:
+        带时区 (UTC) 的 datetime
+    """
+    now = now or datetime.now(timezone.utc)
+    names = {name.lower() for name in (auth_cookie_names or DEFAULT_AUTH_COOKIES)}
+    expiries = [
+        datetime.fromtimestamp(cookie["expiry"], timezone.utc) for cookie in cookies
+        if "expiry" in cookie and str(cookie.get("name", "")).lower() in names
+    ]
+    expiries = [expiry for expiry in expiries if expiry > now + min_lifetime]
+    if not expiries:
+        logging.info("认证cookie没有可用的过期时间，使用默认会话时长")
+        return now + default_lifetime
+    earliest = min(expiries)
+    # 有效期短于安全余量时不再扣除余量
+    return earliest - margin if earliest - margin > now else earliest
+
+
+def parse_expiration(value):
+    """解析保存的过期时间，旧版本写入的无时区时间按本地时间处理"""
+    if not value:
+        return None
+    try:
+        expiration = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        logging.warning("登录信息过期时间格式错误")
+        return None
+    if expiration.tzinfo is None:
+        expiration = expiration.astimezone()
+    return expiration
+
+
+def refresh_time(expiration, next_run, lead=timedelta(hours=1), now=None):
+    """计算为了让 next_run 的任务不必重新登录，应当何时提前刷新会话
+
+    会话在 next_run 之后仍然有效时返回 None；否则在 next_run 前 lead 刷新，
+    若该时间已过则立即刷新。
+    """
+    now = now or datetime.now(timezone.utc)
+    if expiration is not None and expiration > next_run:
+        return None
+    return max(now, next_run - lead)
+
+
+def load_saved_expiration(path):
+    """直接读取登录信息文件中的过期时间，无需创建 LoginHelper"""
+    import json
+
+    try:
+        with open(path, "r") as f:
+            return parse_expiration(json.load(f).get("expiration_time"))
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        return None
@@ -0,0 +1,123 @@
+import re
+import time
+import logging
+from urllib.parse import urlparse
+
+import requests
+
+from .const import SESSION_PROBE_URL
+
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+)
+# 会话失效时请求会被重定向到登录页
+DEFAULT_INVALID_PATTERN = r"osgweb/login"
+# 接口返回 JSON 中表示成功的 code
+DEFAULT_SUCCESS_CODES = ("00000",)
+
+
+def _domain_matches(host, domain):
+    domain = domain.lstrip(".").lower()
+    host = host.lower()
+    return host == domain or host.endswith("." + domain)
+
+
+def cookie_header(cookies, url, now=None):
+    """按域名、路径和过期时间筛选 Selenium 格式的 cookie，拼成 Cookie 请求头"""
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+    path = parsed.path or "/"
+    now = time.time() if now is None else now
+    pairs = []
+    for cookie in cookies:
+        if not _domain_matches(host, cookie.get("domain", host)):
+            continue
+        if not path.startswith(cookie.get("path", "/")):
+            continue
+        if cookie.get("secure") and parsed.scheme != "https":
+            continue
+        if "expiry" in cookie and cookie["expiry"] <= now:
+            continue
+        pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+
+def probe_session(cookies, url=SESSION_PROBE_URL, invalid_pattern=DEFAULT_INVALID_PATTERN,
+                  invalid_body_pattern=None, valid_body_pattern=None, success_codes=DEFAULT_SUCCESS_CODES,
+                  auth_error_codes=(), method="POST", timeout=10):
+    """不启动浏览器，用已保存的 cookie 直接请求需要登录的接口判断会话是否仍然有效
+
+    只有接口明确返回成功时才判定有效：响应正文命中 valid_body_pattern，
+    或（未指定 valid_body_pattern 时）JSON 的 code 在 success_codes 中。
+    只有明确的认证失败才判定失效：401/403、重定向到登录页、正文命中 invalid_body_pattern
+    或 JSON 的 code 在 auth_error_codes 中。参数错误等其他 code、单页应用的 HTML 页面都视为无法判断。
+
+    Args:
+        cookies: Selenium 格式的 cookie 列表
+        url: 探测地址，需要是未登录时会重定向、拒绝访问或返回错误 code 的接口
+        invalid_pattern: 重定向地址命中该正则时视为会话失效
+        invalid_body_pattern: 响应正文命中该正则时视为会话失效
+        valid_body_pattern: 响应正文命中该正则时视为会话有效，用于不返回 JSON code 的接口
+        success_codes: JSON 响应中表示成功的 code
+        auth_error_codes: JSON 响应中表示未登录或登录已过期的 code
+
+    Returns:
+        True: 会话有效；False: 会话已失效；
+        None: 网络错误、响应无法识别等无法判断的情况，由调用方决定是否继续尝试恢复会话
+    """
+    header = cookie_header(cookies, url)
+    if not header:
+        logging.info("没有可用于探测的cookie")
+        return False
+
+    start = time.perf_counter()
+    try:
+        response = requests.request(
+            method,
+            url,
+            headers={"Cookie": header, "User-Agent": USER_AGENT},
+            json={} if method.upper() == "POST" else None,
+            timeout=timeout,
+            allow_redirects=True,
+        )
+    except requests.RequestException as e:
+        logging.warning(f"会话探测请求失败: {e}")
+        return None
+    elapsed = time.perf_counter() - start
+
+    pattern = re.compile(invalid_pattern) if invalid_pattern else None
+    redirected_to_login = any(
+        pattern and pattern.search(r.headers.get("Location", "")) for r in response.history
+    ) or bool(pattern and pattern.search(response.url))
+    if response.status_code in (401, 403) or redirected_to_login:
+        valid = False
+    elif response.status_code >= 400:
+        logging.warning(f"会话探测返回状态码 {response.status_code}，无法判断")
+        return None
+    elif invalid_body_pattern and re.search(invalid_body_pattern, response.text):
+        valid = False
+    elif valid_body_pattern:
+        if not re.search(valid_body_pattern, response.text):
+            logging.warning("会话探测响应未命中有效标志，无法判断")
+            return None
+        valid = True
+    else:
+        try:
+            payload = response.json()
+        except ValueError:
+            logging.warning(f"会话探测地址 {url} 返回的不是 JSON（可能是单页应用页面），无法判断")
+            return None
+        code = payload.get("code") if isinstance(payload, dict) else None
+        if code is None:
+            logging.warning("会话探测响应中没有 code 字段，无法判断")
+            return None
+        if str(code) in auth_error_codes:
+            valid = False
+        elif str(code) in success_codes:
+            valid = True
+        else:
+            logging.warning(f"会话探测返回未知的 code {code}，无法判断")
+            return None
+    logging.info(f"会话探测 {url}: {'有效' if valid else '已失效'} (HTTP {response.status_code}, {elapsed:.3f}s)")
+    return valid
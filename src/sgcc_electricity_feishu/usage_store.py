@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from .const import USAGE_DB_FILE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_usage (
+    meter_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    reading REAL,
+    high_num REAL,
+    low_num REAL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (meter_id, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_daily_usage_date ON daily_usage (date);
+CREATE TABLE IF NOT EXISTS fetch_log (
+    day TEXT NOT NULL,
+    meter_id TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    fetched_at TEXT,
+    PRIMARY KEY (day, meter_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TEXT NOT NULL
+);
+"""
+
+# 同一 (户号, 日期) 再次写入时覆盖旧值；但不会用尚未出账的全零数据覆盖已出账的数据
+UPSERT_SQL = """
+INSERT INTO daily_usage (meter_id, date, reading, high_num, low_num, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (meter_id, date) DO UPDATE SET
+    reading = excluded.reading,
+    high_num = excluded.high_num,
+    low_num = excluded.low_num,
+    updated_at = excluded.updated_at
+WHERE (excluded.reading, excluded.high_num, excluded.low_num)
+        IS NOT (daily_usage.reading, daily_usage.high_num, daily_usage.low_num)
+    AND (COALESCE(excluded.reading, 0) != 0 OR COALESCE(excluded.high_num, 0) != 0
+        OR COALESCE(excluded.low_num, 0) != 0
+        OR (COALESCE(daily_usage.reading, 0) = 0 AND COALESCE(daily_usage.high_num, 0) = 0
+            AND COALESCE(daily_usage.low_num, 0) = 0))
+"""
+
+_CACHE_FILE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.json$")
+_STATUS_FILE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.status\.json$")
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class UsageStore:
+    """按 (户号, 日期) 存储日用电量的本地 SQLite 库
+
+    主键 (meter_id, date) 同时作为按户号查询的索引，另建日期索引用于跨户号的日期范围查询。
+    写入为 upsert，重复抓取同一天只保留一行；fetch_log 记录每天各户号的抓取结果和失败次数。
+    返回的行与抓取结果格式相同：{date, reading, highNum, lowNum}，数值为 float。
+    """
+
+    def __init__(self, path=USAGE_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv("USAGE_DB_FILE", USAGE_DB_FILE))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def upsert(self, meter_id, rows):
+        """写入一个户号的数据，返回新增或变化的行数"""
+        now = _now()
+        params = [
+            (meter_id, row["date"], _to_float(row.get("reading")),
+             _to_float(row.get("highNum")), _to_float(row.get("lowNum")), now)
+            for row in rows if row.get("date")
+        ]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(UPSERT_SQL, params)
+            return self._conn.total_changes - before
+
+    def rows(self, meter_id, start=None, end=None):
+        """户号在 [start, end] 日期范围内的数据，按日期从新到旧排列"""
+        return self.query([meter_id], start, end).get(meter_id, [])
+
+    def query(self, meter_ids=None, start=None, end=None):
+        """按户号和日期范围查询，返回 {户号: [{date, reading, highNum, lowNum}]}"""
+        conditions, params = [], []
+        if meter_ids is not None:
+            conditions.append(f"meter_id IN ({','.join('?' * len(meter_ids))})")
+            params.extend(meter_ids)
+        if start:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end:
+            conditions.append("date <= ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT meter_id, date, reading, high_num, low_num FROM daily_usage {where} "
+                "ORDER BY meter_id, date DESC",
+                params,
+            )
+            result = {}
+            for meter_id, date, reading, high_num, low_num in cursor:
+                result.setdefault(meter_id, []).append(
+                    {"date": date, "reading": reading, "highNum": high_num, "lowNum": low_num}
+                )
+        return result
+
+    def meters(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT meter_id FROM daily_usage ORDER BY meter_id")]
+
+    def record_fetch(self, day, meter_id):
+        """记录户号当天已抓取成功"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO fetch_log (day, meter_id, fetched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (day, meter_id) DO UPDATE SET fetched_at = excluded.fetched_at",
+                (day, meter_id, _now()),
+            )
+
+    def record_failure(self, day, meter_id):
+        """户号当天的失败次数加一，返回累计失败次数"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO fetch_log (day, meter_id, attempts) VALUES (?, ?, 1) "
+                "ON CONFLICT (day, meter_id) DO UPDATE SET attempts = attempts + 1",
+                (day, meter_id),
+            )
+            return self._conn.execute(
+                "SELECT attempts FROM fetch_log WHERE day = ? AND meter_id = ?", (day, meter_id)
+            ).fetchone()[0]
+
+    def fetched_meters(self, day):
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                "SELECT meter_id FROM fetch_log WHERE day = ? AND fetched_at IS NOT NULL", (day,)
+            )}
+
+    def failed_attempts(self, day):
+        """当天尚未成功的户号及失败次数"""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT meter_id, attempts FROM fetch_log WHERE day = ? AND fetched_at IS NULL", (day,)
+            ))
+
+    def migrate_json_cache(self, cache_dir):
+        """导入旧的按天 JSON 缓存（<日期>.json 和 <日期>.status.json），已导入的文件会跳过
+
+        Returns:
+            导入的行数
+        """
+        if not cache_dir or not os.path.isdir(cache_dir):
+            return 0
+        with self._lock:
+            applied = {row[0] for row in self._conn.execute("SELECT name FROM migrations")}
+        imported = 0
+        # 按日期从旧到新导入，同一天的数据以较新的缓存为准
+        for path in sorted(Path(cache_dir).iterdir()):
+            name = f"json_cache:{path.name}"
+            cache_match = _CACHE_FILE.match(path.name)
+            status_match = _STATUS_FILE.match(path.name)
+            if name in applied or not (cache_match or status_match):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f) if path.stat().st_size else {}
+            except (json.JSONDecodeError, ValueError) as e:
+                logging.warning(f"跳过损坏的缓存文件 {path}: {e}")
+                continue
+            if cache_match:
+                for meter_id, rows in data.items():
+                    imported += self.upsert(meter_id, rows)
+                    self.record_fetch(cache_match.group(1), meter_id)
+            else:
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO fetch_log (day, meter_id, attempts) VALUES (?, ?, ?) "
+                        "ON CONFLICT (day, meter_id) DO UPDATE SET attempts = MAX(attempts, excluded.attempts)",
+                        [(status_match.group(1), meter_id, entry.get("attempts", 0)) for meter_id, entry in data.items()],
+                    )
+            with self._lock, self._conn:
+                self._conn.execute("INSERT INTO migrations (name, applied_at) VALUES (?, ?)", (name, _now()))
+        if imported:
+            logging.info(f"从 {cache_dir} 导入 {imported} 行用电数据")
+        return imported
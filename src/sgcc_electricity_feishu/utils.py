@@ -1,52 +1,102 @@
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
 import json
 import os
-from lark_oapi.api.bitable.v1 import AppTableRecord
-from .login import LoginHelper
-from .feishu_bitable import FeishuBitableHelper
 from pathlib import Path
 
-def get_sgcc_data_with_cache(cache_dir="sgcc_cache"):
+if TYPE_CHECKING:
+    from lark_oapi.api.bitable.v1 import AppTableRecord
+    from .feishu_bitable import FeishuBitableHelper
+
+def get_sgcc_data_with_cache(cache_dir="sgcc_cache", full_refresh=False, store=None):
     """
     获取国家电网数据，支持缓存功能
     
     Args:
-        sgcc_helper: LoginHelper 实例
-        cache_dir: 缓存目录名
+        cache_dir: 旧的按天 JSON 缓存目录，首次运行时导入本地用电库
+        full_refresh: 忽略缓存和水位线，重新抓取表格中的全部数据（也可设置 FULL_REFRESH=true）
+        store: UsageStore 实例，为空时按 USAGE_DB_FILE 打开
         
     Returns:
         国家电网数据字典
     """
-    # 确保缓存目录存在
-    os.makedirs(cache_dir, exist_ok=True)
-    
-    # 生成缓存文件名 (基于当天日期)
+    return dict(iter_sgcc_data_with_cache(cache_dir, full_refresh, store))
+
+def iter_sgcc_data_with_cache(cache_dir="sgcc_cache", full_refresh=False, store=None):
+    """
+    逐个户号产出国家电网数据 (户号, 数据列表)，参数同 get_sgcc_data_with_cache
+
+    抓取结果按 (户号, 日期) 写入本地用电库，产出的是库中该户号的全部历史数据。
+    当天已抓取过的户号直接从库中读取，只重新抓取缺失或失败的户号；
+    每个户号当天最多尝试 METER_RETRY_BUDGET 次（默认 3）。
+    """
+    from functools import partial
+    from .accounts import load_accounts, account_user_ids, iter_account, iter_all_accounts
+    from .const import WATERMARK_FILE
+    from .usage_store import UsageStore
+    from .watermark import WatermarkStore
+
     today = datetime.now().strftime("%Y-%m-%d")
-    cache_file = os.path.join(cache_dir, f"{today}.json")
-    
-    # 如果缓存文件存在且非空，则直接读取
-    if os.path.exists(cache_file) and os.path.getsize(cache_file) > 0:
-        print(f"从缓存文件 {cache_file} 读取国家电网数据")
-        with open(cache_file, "r", encoding="utf-8") as f:
-            return json.load(f)
-    
-    # 否则从API获取数据并保存到缓存
-    print("从API获取国家电网数据...")
-    sgcc_helper = LoginHelper()
-    sgcc_data = sgcc_helper.fetch_data()
-    
-    # 保存到缓存文件
-    with open(cache_file, "w", encoding="utf-8") as f:
-        json.dump(sgcc_data, f, ensure_ascii=False, indent=2)
-    
-    return sgcc_data
+    full_refresh = full_refresh or os.getenv("FULL_REFRESH", "false").lower() == "true"
+    retry_budget = int(os.getenv("METER_RETRY_BUDGET", 3))
+
+    own_store = store is None
+    store = store or UsageStore.from_env()
+    try:
+        store.migrate_json_cache(cache_dir)
+        fetched = set() if full_refresh else store.fetched_meters(today)
+        attempts = {} if full_refresh else store.failed_attempts(today)
+
+        # 只抓取当天还没有抓取成功、且未用完重试次数的户号
+        accounts = []
+        requested = set()
+        for account in load_accounts():
+            pending = []
+            for meter_id in account_user_ids(account):
+                if meter_id in fetched:
+                    print(f"从本地用电库读取户号 {meter_id} 的数据")
+                    yield meter_id, store.rows(meter_id)
+                    continue
+                if attempts.get(meter_id, 0) >= retry_budget:
+                    print(f"户号 {meter_id} 今天已失败 {attempts[meter_id]} 次，跳过")
+                    continue
+                pending.append(meter_id)
+            if pending:
+                accounts.append(dict(account, pending=pending))
+                requested.update(pending)
+        if not accounts:
+            return
+
+        print(f"从API获取国家电网数据: {sorted(requested)}")
+        # 增量抓取：只读取各户号水位线之后的日期
+        watermarks = None if full_refresh else WatermarkStore(os.getenv("WATERMARK_FILE", WATERMARK_FILE)).snapshot()
+        # 多个账号并发抓取，每个账号使用独立的浏览器和会话文件；每个户号抓到后立即写入用电库
+        obtained = set()
+        for meter_id, rows in iter_all_accounts(accounts, iterate=partial(iter_account, watermarks=watermarks)):
+            store.upsert(meter_id, rows)
+            store.record_fetch(today, meter_id)
+            obtained.add(meter_id)
+            yield meter_id, store.rows(meter_id)
+
+        # 记录本次仍未获取到的户号，下次运行时重试
+        for meter_id in sorted(requested - obtained):
+            failures = store.record_failure(today, meter_id)
+            print(f"户号 {meter_id} 获取失败，今天已尝试 {failures}/{retry_budget} 次")
+    finally:
+        if own_store:
+            store.close()
+
+# 电表号映射
+METER_MAPPING = {
+    '充电桩': '3309936803599',
+    '家用': '3309936495378'
+}
 
 def convert_timestamp_to_date(timestamp: int) -> str:
     """将飞书的时间戳(毫秒)转换为YYYY-MM-DD格式的日期字符串"""
     return datetime.fromtimestamp(timestamp/1000).strftime('%Y-%m-%d')
 
-def fill_missing_data(feishu_records: List[AppTableRecord], sgcc_data: Dict) -> tuple[List[Dict], int]:
+def fill_missing_data(feishu_records: List["AppTableRecord"], sgcc_data: Dict) -> tuple[List[Dict], int]:
     """
     填补飞书数据中的缺失用电数据
     
@@ -57,12 +107,6 @@ def fill_missing_data(feishu_records: List[AppTableRecord], sgcc_data: Dict) ->
     Returns:
         填补后的记录列表(字典格式)
     """
-    # 电表号映射
-    METER_MAPPING = {
-        '充电桩': '3309936803599',
-        '家用': '3309936495378'
-    }
-    
     # 预处理国家电网数据
     sgcc_records = {}
     for meter_type, meter_id in METER_MAPPING.items():
@@ -120,7 +164,7 @@ def fill_missing_data(feishu_records: List[AppTableRecord], sgcc_data: Dict) ->
 
 
 
-def update_filled_records_to_feishu(filled_records: List[Dict], feishu_helper: FeishuBitableHelper):
+def update_filled_records_to_feishu(filled_records: List[Dict], feishu_helper: "FeishuBitableHelper"):
     """
     将填补后的数据更新回飞书表格
     
@@ -157,6 +201,58 @@ def update_filled_records_to_feishu(filled_records: List[Dict], feishu_helper: F
     print(f"\n总共更新了 {updated_count} 条记录")
 
 
+def index_feishu_records(feishu_records: List["AppTableRecord"]) -> Dict[str, "AppTableRecord"]:
+    """按日期索引飞书记录，每次同步只需读取和索引一次，供各户号的 sync_meter_to_feishu 共用"""
+    records_by_date = {}
+    for record in feishu_records:
+        if "日期" in record.fields:
+            records_by_date[convert_timestamp_to_date(record.fields["日期"])] = record
+    return records_by_date
+
+
+def sync_meter_to_feishu(records_by_date: Dict[str, "AppTableRecord"], meter_id: str, rows: List[Dict], feishu_helper: "FeishuBitableHelper") -> int:
+    """
+    用单个户号的数据填补飞书记录，并把有变化的记录一次批量写回
+
+    只查看该户号数据涉及的日期；records_by_date 中的记录会被原地修改，依次对每个户号调用即可逐步完成全部填补。
+
+    Args:
+        records_by_date: index_feishu_records 返回的 {日期: 飞书记录}
+        meter_id: 户号
+        rows: 该户号的用电数据
+        feishu_helper: FeishuBitableHelper 实例
+
+    Returns:
+        填补的字段数
+    """
+    meter_type = next((name for name, mapped_id in METER_MAPPING.items() if mapped_id == meter_id), None)
+    if meter_type is None:
+        return 0
+    updates = []
+    filled_count = 0
+    for row in rows:
+        record = records_by_date.get(row.get("date"))
+        if record is None:
+            continue
+        values = {
+            f"{meter_type}峰电度数": float(row["highNum"]) if row.get("highNum") else 0.0,
+            f"{meter_type}谷电度数": float(row["lowNum"]) if row.get("lowNum") else 0.0,
+        }
+        # 与 fill_missing_data 相同，只填补缺失或为 0 的字段
+        changed = {
+            field: value for field, value in values.items()
+            if record.fields.get(field, 0) in (None, 0) and value != 0
+        }
+        if changed:
+            record.fields.update(changed)
+            updates.append((record.record_id, changed))
+            filled_count += len(changed)
+    if updates:
+        feishu_helper.batch_update_records(updates)
+        print(f"户号 {meter_id} 填补了 {filled_count} 个字段，批量更新 {len(updates)} 条记录")
+    return filled_count
+
+
 def save_to_json(data: List[Dict], filename: str, output_dir: str = "output"):
     """
     将数据保存为JSON文件
@@ -0,0 +1,238 @@
+import time
+import logging
+from contextlib import contextmanager
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.wait import WebDriverWait
+
+# 验证码画布的内容签名：画布未绘制（中心区域全透明）时返回 null，
+# 否则对 dataURL 抽样计算一个简单哈希，用于判断验证码是否已经刷新
+CAPTCHA_SIGNATURE_JS = """
+const canvas = document.getElementById("slideVerify")?.childNodes[0];
+if (!canvas || !canvas.width || !canvas.height) return null;
+const ctx = canvas.getContext("2d");
+const pixels = ctx.getImageData(0, 0, canvas.width, canvas.height).data;
+let opaque = false;
+for (let i = 3; i < pixels.length; i += 4 * 97) {
+    if (pixels[i] !== 0) { opaque = true; break; }
+}
+if (!opaque) return null;
+const data = canvas.toDataURL("image/png");
+let hash = 0;
+for (let i = 0; i < data.length; i += 7) {
+    hash = (hash * 31 + data.charCodeAt(i)) | 0;
+}
+return data.length + ":" + hash;
+"""
+
+# 用 MutationObserver 等待页面判断函数成立：DOM 每次变化时重新判断，成立后立即回调；
+# input.value 等属性变化不会触发 MutationObserver，因此另外每 250ms 兜底检查一次
+MUTATION_WAIT_JS = """
+const done = arguments[arguments.length - 1];
+const check = new Function("args", arguments[0]);
+const args = arguments[1];
+const evaluate = () => { try { return !!check(args); } catch (e) { return false; } };
+if (evaluate()) { done(true); return; }
+let finished = false;
+const finish = (value) => {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearInterval(interval);
+    clearTimeout(timer);
+    done(value);
+};
+const observer = new MutationObserver(() => { if (evaluate()) finish(true); });
+observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true, attributes: true});
+const interval = setInterval(() => { if (evaluate()) finish(true); }, 250);
+const timer = setTimeout(() => finish(evaluate()), arguments[2]);
+"""
+
+
+def _script_condition(script, *args):
+    def condition(driver):
+        try:
+            return driver.execute_script(script, *args)
+        except WebDriverException:
+            return False
+    return condition
+
+
+def loading_mask_gone():
+    """页面上没有可见的 el-loading-mask"""
+    return _script_condition(
+        "return [...document.querySelectorAll('.el-loading-mask')]"
+        ".every(e => e.offsetParent === null || getComputedStyle(e).display === 'none');"
+    )
+
+
+def elements_visible(css_selector, count=1):
+    """至少有 count 个匹配 css_selector 的元素可见"""
+    return _script_condition(
+        "return [...document.querySelectorAll(arguments[0])]"
+        ".filter(e => e.offsetParent !== null).length >= arguments[1];",
+        css_selector, count,
+    )
+
+
+def xpath_present(xpath):
+    """页面上存在匹配 xpath 的元素，用脚本查找，不受隐式等待影响"""
+    return _script_condition(
+        "return !!document.evaluate(arguments[0], document, null,"
+        " XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;",
+        xpath,
+    )
+
+
+def url_changed(url):
+    """当前地址不再包含 url"""
+    return lambda driver: url not in driver.current_url
+
+
+def error_tip_visible():
+    """登录页的错误提示出现"""
+    return _script_condition(
+        "const tip = document.querySelector('.errmsg-tip span');"
+        "return !!(tip && tip.offsetParent !== null && tip.innerText.trim());"
+    )
+
+
+def error_tip_text(driver):
+    """登录页当前可见的错误提示文字，没有时返回空字符串"""
+    try:
+        return driver.execute_script(
+            "const tip = document.querySelector('.errmsg-tip span');"
+            "return tip && tip.offsetParent !== null ? tip.innerText.trim() : '';"
+        ) or ""
+    except WebDriverException:
+        return ""
+
+
+def error_tip_changed(previous_text=""):
+    """出现了与 previous_text 不同的错误提示，滑动前就已显示的旧提示不算"""
+    def condition(driver):
+        text = error_tip_text(driver)
+        return bool(text) and text != previous_text
+    return condition
+
+
+def captcha_signature(driver):
+    try:
+        return driver.execute_script(CAPTCHA_SIGNATURE_JS)
+    except WebDriverException:
+        return None
+
+
+def captcha_rendered(previous_signature=None):
+    """验证码画布已绘制，且与 previous_signature 不同（即已刷新）"""
+    def condition(driver):
+        signature = captcha_signature(driver)
+        return signature is not None and signature != previous_signature
+    return condition
+
+
+def slider_reset():
+    """滑块已回到起点"""
+    return _script_condition(
+        "const item = document.querySelector('.slide-verify-slider-mask-item');"
+        "return !!item && ['', '0px'].includes(item.style.left);"
+    )
+
+
+@contextmanager
+def script_timeout(driver, seconds):
+    """临时修改异步脚本的超时时间，结束后恢复原值"""
+    try:
+        previous = driver.timeouts.script
+    except Exception:
+        previous = None
+    driver.set_script_timeout(seconds)
+    try:
+        yield
+    finally:
+        if previous is not None:
+            try:
+                driver.set_script_timeout(previous)
+            except Exception as e:
+                logging.debug(f"恢复脚本超时失败: {e}")
+
+
+class PageWaiter:
+    """按页面条件等待，条件满足立即返回，超时上限沿用原先的固定等待时间
+
+    每次等待的实际耗时会记录日志并保存在 timings 中。
+    传入 LatencyModel 时按步骤记录耗时，并由历史耗时推导超时上限。
+    """
+
+    def __init__(self, driver, poll_frequency=0.1, model=None):
+        self.driver = driver
+        self.poll_frequency = poll_frequency
+        self.model = model
+        self.timings = []
+
+    def limit(self, description, default):
+        """步骤的等待上限，有 LatencyModel 时由历史耗时推导"""
+        return self.model.timeout(description, default) if self.model else default
+
+    def until(self, description, timeout, *conditions):
+        """等待任一条件满足并返回条件的结果，超时抛出 TimeoutException"""
+        condition = conditions[0] if len(conditions) == 1 else EC.any_of(*conditions)
+        timeout = self.limit(description, timeout)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = WebDriverWait(self.driver, timeout, poll_frequency=self.poll_frequency).until(condition)
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            satisfied = result is not None
+            self.timings.append((description, elapsed, satisfied))
+            if self.model:
+                # 超时也记录，下次自动放宽上限
+                self.model.observe(description, elapsed)
+            self._log(description, elapsed, satisfied, timeout)
+
+    def wait(self, description, timeout, *conditions):
+        """等待任一条件满足，返回是否在 timeout 秒内满足"""
+        try:
+            self.until(description, timeout, *conditions)
+            return True
+        except TimeoutException:
+            return False
+
+    def wait_dom(self, description, timeout, predicate_js, args=None, fallback=None):
+        """在页面中用 MutationObserver 等待 predicate_js 成立
+
+        Args:
+            predicate_js: 以 args 为参数的 JS 函数体，返回是否满足
+            fallback: 浏览器不支持异步脚本时改用轮询的 Selenium 条件
+        """
+        limit = self.limit(description, timeout)
+        start = time.perf_counter()
+        try:
+            with script_timeout(self.driver, limit + 5):
+                satisfied = bool(self.driver.execute_async_script(
+                    MUTATION_WAIT_JS, predicate_js, args or {}, int(limit * 1000)
+                ))
+        except TimeoutException:
+            # 脚本超时说明已经等满上限，不再用轮询重新等一遍
+            satisfied = False
+        except (WebDriverException, AttributeError) as e:
+            if fallback is None:
+                raise
+            logging.debug(f"MutationObserver 等待不可用，改为轮询: {e}")
+            return self.wait(description, timeout, fallback)
+        elapsed = time.perf_counter() - start
+        self.timings.append((description, elapsed, satisfied))
+        if self.model:
+            self.model.observe(description, elapsed)
+        self._log(description, elapsed, satisfied, limit)
+        return satisfied
+
+    @staticmethod
+    def _log(description, elapsed, satisfied, timeout):
+        if satisfied:
+            logging.info(f"等待{description}: {elapsed:.2f}s (上限 {timeout:.1f}s)")
+        else:
+            logging.info(f"等待{description}超时: {elapsed:.2f}s")
@@ -0,0 +1,110 @@
+import os
+import json
+import logging
+import threading
+
+from .const import WATERMARK_FILE
+
+
+def _number(row, key):
+    try:
+        return float(row.get(key))
+    except (TypeError, ValueError):
+        return None
+
+
+def has_split(row):
+    """该日已给出峰谷分项"""
+    high, low = _number(row, "highNum"), _number(row, "lowNum")
+    return high is not None and low is not None and high + low != 0
+
+
+def is_confirmed(row, split_expected=True):
+    """该日数据已出账
+
+    网站先出总电量、后出峰谷分项，抓取时缺失的分项会填为 0；
+    只有总电量时水位线若推进到该日，之后的增量抓取就不会再取回补齐的峰谷电量。
+    从未给出过峰谷分项的户号（没有分时电价）分项始终为 0，总电量非零即视为已出账。
+    """
+    if has_split(row):
+        return True
+    if split_expected:
+        return False
+    return bool(_number(row, "reading"))
+
+
+def rows_after(rows, watermark):
+    """只保留日期晚于水位线的行"""
+    if not watermark:
+        return list(rows)
+    return [row for row in rows if row.get("date", "") > watermark]
+
+
+class WatermarkStore:
+    """每个户号已确认同步的最新日期（YYYY-MM-DD），增量抓取时跳过不晚于该日期的行
+
+    同时记录给出过峰谷分项的户号，这些户号要等分项出账后才推进水位线。
+    """
+
+    def __init__(self, path=WATERMARK_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._watermarks = {}
+        self._split_meters = set()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, ValueError) as e:
+                logging.warning(f"水位线文件损坏，将全量抓取: {e}")
+                data = {}
+            if "watermarks" in data:
+                self._watermarks = data["watermarks"]
+                self._split_meters = set(data.get("split_meters", []))
+            elif data:
+                # 旧格式只有 {户号: 日期}，不知道户号是否有峰谷分项，全量抓取一次重新判断
+                logging.info("水位线文件为旧格式，本次全量抓取")
+
+    def get(self, meter_id):
+        return self._watermarks.get(meter_id)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._watermarks)
+
+    def advance(self, data, until=None):
+        """按抓取结果推进水位线，只推进到已出账的日期，不会回退
+
+        Args:
+            data: {户号: [{date, reading, highNum, lowNum}]}
+            until: 不超过该日期，如飞书表格中已有记录的最新日期，避免跳过尚未建行的日期
+        """
+        changed = {}
+        with self._lock:
+            for meter_id, rows in data.items():
+                if any(has_split(row) for row in rows):
+                    self._split_meters.add(meter_id)
+                split_expected = meter_id in self._split_meters
+                dates = [
+                    row["date"] for row in rows
+                    if row.get("date") and is_confirmed(row, split_expected) and (until is None or row["date"] <= until)
+                ]
+                if dates and max(dates) > self._watermarks.get(meter_id, ""):
+                    self._watermarks[meter_id] = changed[meter_id] = max(dates)
+        if changed:
+            self.save()
+            logging.info(f"更新水位线: {changed}")
+        return changed
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with self._lock:
+                data = {"watermarks": dict(self._watermarks), "split_meters": sorted(self._split_meters)}
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.error(f"保存水位线失败: {e}")
@@ -0,0 +1,67 @@
+import json
+import threading
+
+import pytest
+
+from sgcc_electricity_feishu.accounts import fetch_all_accounts, iter_all_accounts, load_accounts, login_info_file_for
+
+
+def test_load_accounts_from_file(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps([
+        {"username": "a@example.com", "password": "x", "user_id": "1,2"},
+        {"username": "b", "password": "y", "user_id": ["3"]},
+    ]))
+    accounts = load_accounts(str(path))
+    assert accounts[0]["user_id"] == ["1", "2"]
+    assert accounts[0]["login_info_file"] == login_info_file_for("a@example.com")
+    assert accounts[1]["user_id"] == ["3"]
+    assert accounts[0]["login_info_file"] != accounts[1]["login_info_file"]
+
+
+def test_load_accounts_requires_credentials(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps([{"username": "a"}]))
+    with pytest.raises(ValueError):
+        load_accounts(str(path))
+    # 多账号时不能回退到 .env 中的 USER_ID
+    path.write_text(json.dumps([{"username": "a", "password": "x"}]))
+    with pytest.raises(ValueError):
+        load_accounts(str(path))
+
+
+def test_fetch_all_accounts_runs_concurrently_and_merges():
+    accounts = [{"username": str(i)} for i in range(3)]
+    # 三个账号都到达屏障才能继续，串行执行时屏障超时，账号全部失败
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fetch(account):
+        barrier.wait()
+        if account["username"] == "2":
+            raise RuntimeError("login failed")
+        return {f"meter{account['username']}": [{"date": "2024-01-01"}]}
+
+    result = fetch_all_accounts(accounts, max_workers=3, fetch=fetch)
+    assert set(result) == {"meter0", "meter1"}
+
+
+def test_iter_all_accounts_yields_each_meter_while_scraping_continues():
+    finished = []
+    consumed_m1 = threading.Event()
+    scraping_m2 = threading.Event()
+
+    def iterate(account):
+        yield "m1", []
+        # 消费者拿到 m1 之前已经开始抓取 m2，不必等消费者处理完
+        scraping_m2.set()
+        assert consumed_m1.wait(5)
+        yield "m2", []
+        finished.append(account["username"])
+
+    items = iter_all_accounts([{"username": "a"}], iterate=iterate)
+    assert next(items)[0] == "m1"
+    assert scraping_m2.wait(5)
+    assert not finished
+    consumed_m1.set()
+    assert next(items)[0] == "m2"
+    assert list(items) == [] and finished == ["a"]
@@ -0,0 +1,163 @@
+import threading
+
+import pytest
+from sgcc_electricity_feishu.browser_pool import BrowserPool
+
+
+class _FakeDriver:
+    def __init__(self, profile_dir):
+        self.profile_dir = profile_dir
+        self.alive = True
+        self.cdp_calls = []
+        self.cleared_origins = []
+        self.current_url = "https://www.95598.cn/osgweb/electricityCharge"
+        self.on_script = None
+
+    def execute_script(self, script):
+        if self.on_script:
+            self.on_script()
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return 1
+
+    def execute_cdp_cmd(self, cmd, params):
+        if cmd == "Storage.clearDataForOrigin":
+            # 与 Chrome 一致，只接受具体的 origin
+            if not params["origin"].startswith(("http://", "https://")):
+                raise RuntimeError("Invalid origin")
+            self.cleared_origins.append(params["origin"])
+        self.cdp_calls.append(cmd)
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.alive = False
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = BrowserPool(_FakeDriver, size=2, profile_root=str(tmp_path))
+    yield pool
+    pool.close()
+
+
+def test_reuses_warm_browser(pool):
+    driver, browser = pool.acquire()
+    pool.release(browser)
+    assert "Network.clearBrowserCookies" in driver.cdp_calls
+    again, _ = pool.acquire()
+    assert again is driver
+    metrics = pool.metrics()
+    assert metrics["launches"] == 1
+    assert metrics["hits"] == 1
+    assert metrics["hit_rate"] == 0.5
+
+
+def test_isolated_profiles(pool):
+    first, _ = pool.acquire()
+    second, _ = pool.acquire()
+    assert first.profile_dir != second.profile_dir
+
+
+def test_unhealthy_browser_is_recycled(pool):
+    driver, browser = pool.acquire()
+    pool.release(browser)
+    driver.alive = False
+    replacement, _ = pool.acquire()
+    assert replacement is not driver
+    assert pool.metrics()["recycled"] == 1
+
+
+def test_expired_browser_is_recycled(tmp_path):
+    pool = BrowserPool(_FakeDriver, size=1, max_age=0, profile_root=str(tmp_path))
+    driver, browser = pool.acquire()
+    pool.release(browser)
+    replacement, _ = pool.acquire()
+    assert replacement is not driver
+    pool.close()
+
+
+def test_acquire_blocks_until_release(tmp_path):
+    pool = BrowserPool(_FakeDriver, size=1, profile_root=str(tmp_path))
+    driver, browser = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    threading.Timer(0.05, pool.release, args=(browser,)).start()
+    again, _ = pool.acquire(timeout=2)
+    assert again is driver
+    pool.close()
+
+
+def test_reset_clears_concrete_origins(pool):
+    driver, browser = pool.acquire()
+    driver.current_url = "https://sub.95598.cn/page"
+    pool.release(browser)
+    assert pool.metrics()["recycled"] == 0
+    assert driver.cleared_origins == ["https://www.95598.cn", "https://95598.cn", "https://sub.95598.cn"]
+    assert "Network.clearBrowserCache" in driver.cdp_calls
+
+
+def test_factory_chosen_per_acquire_and_health_check_outside_lock(tmp_path):
+    pool = BrowserPool(size=1, profile_root=str(tmp_path))
+    launched = []
+
+    def factory(profile_dir):
+        launched.append(profile_dir)
+        return _FakeDriver(profile_dir)
+
+    driver, browser = pool.acquire(factory=factory)
+    assert launched == [driver.profile_dir]
+    pool.release(browser)
+
+    lock_free = []
+
+    def try_lock():
+        if pool._condition.acquire(timeout=1):
+            pool._condition.release()
+            lock_free.append(True)
+
+    def check_lock():
+        # 健康检查期间其他线程可以拿到锁
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+
+    driver.on_script = check_lock
+    again, _ = pool.acquire(factory=factory)
+    assert again is driver
+    assert lock_free == [True]
+    pool.close()
+
+
+def test_warm_launches_ahead_and_replaces_expired(tmp_path):
+    pool = BrowserPool(_FakeDriver, size=2, max_age=3600, profile_root=str(tmp_path))
+    assert pool.warm() == 2
+    assert pool.metrics()["idle"] == 2
+    # 预热后的借出都命中空闲实例
+    first, first_browser = pool.acquire()
+    second, second_browser = pool.acquire()
+    assert pool.metrics()["hits"] == 2 and pool.metrics()["launches"] == 2
+    pool.release(first_browser)
+    pool.release(second_browser)
+
+    # 空闲一天后再预热：过期的实例被回收并重新启动
+    first_browser.created_at -= 7200
+    assert pool.warm(1) == 0
+    assert pool.metrics()["recycled"] == 1 and pool.metrics()["idle"] == 1
+    assert pool.warm(2) == 1
+    assert pool.metrics()["idle"] == 2 and pool.metrics()["in_use"] == 0
+    pool.close()
+
+
+def test_warm_respects_size_with_browsers_in_use(pool):
+    _, browser = pool.acquire()
+    assert pool.warm(5) == 1
+    assert (pool.metrics()["idle"], pool.metrics()["in_use"]) == (1, 1)
+    pool.release(browser)
+
+
+def test_default_max_age_outlives_daily_schedule():
+    from sgcc_electricity_feishu.browser_pool import DEFAULT_MAX_AGE
+
+    assert DEFAULT_MAX_AGE > 24 * 3600
@@ -0,0 +1,55 @@
+import json
+from PIL import Image
+from sgcc_electricity_feishu import captcha_bench
+from sgcc_electricity_feishu.captcha_bench import load_labelled_images, run_captcha_bench
+
+
+class _FakeOnnx:
+    """把图像左上角像素的红色分量当作模型 416 空间下识别出的距离"""
+
+    def get_distance(self, image):
+        return image.getpixel((0, 0))[0]
+
+
+def _write_image(path, value, width=310):
+    Image.new("RGB", (width, 155), (value, 0, 0)).save(path)
+
+
+def test_load_labelled_images(tmp_path):
+    _write_image(tmp_path / "bg_001_x120.png", 0)
+    _write_image(tmp_path / "bg_002.png", 0)
+    _write_image(tmp_path / "bg_003.png", 0)
+    (tmp_path / "labels.json").write_text(json.dumps({"bg_003.png": 88}))
+    assert load_labelled_images(tmp_path) == [
+        ("bg_001_x120.png", 120),
+        ("bg_002.png", None),
+        ("bg_003.png", 88),
+    ]
+
+
+def test_run_captcha_bench(tmp_path):
+    # 图片宽 208，是模型空间的一半：模型距离 100 对应图片上的 50 像素
+    _write_image(tmp_path / "a_x50.png", 100, width=208)
+    _write_image(tmp_path / "b_x50.png", 120, width=208)
+    _write_image(tmp_path / "c.png", 50, width=208)
+    result = run_captcha_bench(tmp_path, _FakeOnnx(), tolerance=5)
+    assert result["images"] == 3
+    assert result["labelled"] == 2
+    assert result["error_px"] == {"mean": 5.0, "p95": 9.5, "max": 10.0}
+    assert result["accuracy"] == 0.5
+    assert result["details"][0]["distance"] == 100
+    assert result["details"][0]["distance_px"] == 50.0
+    assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+    assert result["loop_rss_delta_mb"] >= 0
+    json.dumps(result)
+
+
+def test_max_rss_units(monkeypatch):
+    class _Usage:
+        ru_maxrss = 200 * 1024 * 1024
+
+    monkeypatch.setattr(captcha_bench.resource, "getrusage", lambda who: _Usage)
+    monkeypatch.setattr(captcha_bench.sys, "platform", "darwin")
+    assert captcha_bench._max_rss_mb() == 200
+    monkeypatch.setattr(captcha_bench.sys, "platform", "linux")
+    assert captcha_bench._max_rss_mb() == 200 * 1024
@@ -0,0 +1,61 @@
+from PIL import Image
+from sgcc_electricity_feishu.captcha_cache import CaptchaCache, image_fingerprint
+
+
+def test_lookup_and_persistence(tmp_path):
+    path = tmp_path / "captcha_cache.json"
+    cache = CaptchaCache(str(path), max_size=10)
+    assert cache.lookup("a") is None
+    cache.record("a", 120, accepted=True)
+    assert cache.lookup("a") == 120
+
+    reloaded = CaptchaCache(str(path), max_size=10)
+    assert reloaded.lookup("a") == 120
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_rejected_distances_are_down_ranked(tmp_path):
+    cache = CaptchaCache(str(tmp_path / "cache.json"))
+    cache.record("a", 80, accepted=False)
+    assert cache.lookup("a") is None
+    assert cache.rank("a", [80, 150, 200]) == [150, 200, 80]
+    assert cache.rank("b", [80, 150]) == [80, 150]
+
+
+def test_lru_eviction(tmp_path):
+    cache = CaptchaCache(str(tmp_path / "cache.json"), max_size=2)
+    cache.record("a", 1, accepted=True)
+    cache.record("b", 2, accepted=True)
+    cache.lookup("a")  # a 变为最近使用
+    cache.record("c", 3, accepted=True)
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_image_fingerprint():
+    image = Image.new("RGB", (310, 155), (10, 20, 30))
+    assert image_fingerprint(image) == image_fingerprint(image.copy())
+    image.putpixel((5, 5), (0, 0, 0))
+    assert image_fingerprint(image) != image_fingerprint(Image.new("RGB", (310, 155), (10, 20, 30)))
+
+
+def test_shared_instance_keeps_records_from_all_threads(tmp_path):
+    import threading
+
+    path = str(tmp_path / "shared.json")
+    cache = CaptchaCache.shared(path)
+    assert CaptchaCache.shared(path) is cache
+
+    def record(worker):
+        for i in range(20):
+            CaptchaCache.shared(path).record(f"{worker}-{i}", i, True)
+
+    threads = [threading.Thread(target=record, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 每个线程的记录都保存在文件中
+    assert len(CaptchaCache(path)._entries) == 80
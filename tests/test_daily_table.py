@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from sgcc_electricity_feishu.daily_table import DailyTableParser, parse_daily_table
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _parse(name):
+    parser = DailyTableParser()
+    parser.feed((FIXTURES / name).read_text(encoding="utf-8"))
+    parser.close()
+    return parser
+
+
+def test_parse_expanded_table():
+    parser = _parse("daily_table_expanded.html")
+    assert parser.rows == [
+        {"date": "2024-05-07", "reading": "18.52", "highNum": "12.21", "lowNum": "6.31"},
+        {"date": "2024-05-06", "reading": "21.07", "highNum": "13.17", "lowNum": "7.9"},
+        {"date": "2024-05-05", "reading": "15.6", "highNum": "11.2", "lowNum": "4.4"},
+    ]
+    assert not parser.missing_detail
+
+
+def test_rows_without_detail_are_reported():
+    parser = _parse("daily_table_accordion.html")
+    assert [row["highNum"] for row in parser.rows] == ["0", "13.17", "0"]
+    assert parser.missing_detail == {"2024-05-07", "2024-05-05"}
+
+
+def test_tolerates_unclosed_tags_and_entities():
+    html = (
+        '<tbody><tr class="el-table__row"><td><div class="cell">2024-01-01</td><td><div>1&#46;5</div></td><td></td>'
+        '<tr><td><div class="drop-box-left"><p><span class="num"> 0.5 </span><p><span class="num">0.2</span>'
+        '<p><span class="num">1</span></div></td></tr></tbody>'
+    )
+    assert parse_daily_table(html) == [{"date": "2024-01-01", "reading": "1.5", "highNum": "1", "lowNum": "0.5"}]
+
+
+def test_ignores_comments_and_scripts():
+    assert parse_daily_table("<tbody></tbody>") == []
+    html = '<tbody><!-- <tr class="el-table__row"> --><script>"<tr class=\'el-table__row\'>"</script></tbody>'
+    assert parse_daily_table(html) == []
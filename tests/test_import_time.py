@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+from sgcc_electricity_feishu.import_profile import profile_import
+
+# sgcc_electricity_feishu.main 的导入耗时上限（毫秒），CI 机器较慢时可通过环境变量放宽
+IMPORT_BUDGET_MS = float(os.getenv("SEF_IMPORT_BUDGET_MS", 500))
+HEAVY_MODULES = ["selenium", "onnxruntime", "numpy", "PIL", "lark_oapi"]
+
+
+def test_main_does_not_import_heavy_dependencies():
+    code = (
+        "import sys, sgcc_electricity_feishu.main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_main_import_time_budget():
+    total_us, slowest = profile_import("sgcc_electricity_feishu.main")
+    assert total_us / 1000 < IMPORT_BUDGET_MS, f"导入耗时超出预算: {slowest}"
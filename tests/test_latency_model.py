@@ -0,0 +1,50 @@
+from sgcc_electricity_feishu.latency_model import LatencyModel, percentile
+from sgcc_electricity_feishu.waits import PageWaiter
+
+
+def test_percentile():
+    assert percentile([1, 2, 3, 4, 5], 50) == 3
+    assert percentile([1, 2], 95) == 1.95
+    assert percentile([], 95) is None
+
+
+def test_timeout_follows_observed_latency(tmp_path):
+    model = LatencyModel(str(tmp_path / "timings.json"), min_samples=3)
+    assert model.timeout("表格", 2) == 2
+    for seconds in (0.4, 0.5, 0.6):
+        model.observe("表格", seconds)
+    assert 0.85 < model.timeout("表格", 2) < 0.9
+    # 慢的时候放宽，但不超过默认值的 max_scale 倍
+    for _ in range(10):
+        model.observe("表格", 30)
+    assert model.timeout("表格", 2) == 4
+
+
+def test_model_persists_rolling_window(tmp_path):
+    path = str(tmp_path / "timings.json")
+    model = LatencyModel(path, window=3)
+    for seconds in (1, 2, 3, 4):
+        model.observe("切换用户", seconds)
+    model.save()
+    reloaded = LatencyModel(path, window=3, min_samples=1)
+    assert reloaded.percentile("切换用户", 0) == 2
+
+
+def test_page_waiter_records_into_model(tmp_path):
+    model = LatencyModel(str(tmp_path / "timings.json"), min_samples=1)
+    waiter = PageWaiter(object(), poll_frequency=0.01, model=model)
+    assert waiter.wait("页面就绪", 5, lambda driver: True)
+    assert model.percentile("页面就绪") < 0.5
+
+
+def test_from_env_shares_one_model_per_file(monkeypatch, tmp_path):
+    monkeypatch.setenv("WAIT_TIMINGS_FILE", str(tmp_path / "timings.json"))
+    first = LatencyModel.from_env()
+    second = LatencyModel.from_env()
+    assert first is second
+    # 两个账号线程记录的样本都会保存
+    first.observe("切换用户", 1.0)
+    second.observe("登录", 2.0)
+    second.save()
+    reloaded = LatencyModel(str(tmp_path / "timings.json"), min_samples=1)
+    assert reloaded.percentile("切换用户") == 1.0 and reloaded.percentile("登录") == 2.0
@@ -0,0 +1,164 @@
+import time
+
+import pytest
+from sgcc_electricity_feishu.login import LoginHelper
+
+
+class _RecordingDriver:
+    def __init__(self, cdp_supported=True):
+        self.cdp_supported = cdp_supported
+        self.cdp_calls = []
+        self.scripts = []
+        self.added_cookies = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        if not self.cdp_supported:
+            raise RuntimeError("CDP not supported")
+        self.cdp_calls.append((cmd, params))
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+
+    def add_cookie(self, cookie):
+        self.added_cookies.append(cookie)
+
+
+@pytest.fixture
+def helper():
+    helper = LoginHelper.__new__(LoginHelper)
+    helper.driver = _RecordingDriver()
+    return helper
+
+
+COOKIES = [
+    {"name": "token", "value": "a'b\"c", "domain": ".95598.cn", "path": "/", "secure": True,
+     "httpOnly": True, "expiry": 1893456000.0, "sameSite": "Lax"},
+    {"name": "sid", "value": "1"},
+]
+
+
+def test_restore_cookies_in_one_cdp_call(helper):
+    helper._restore_cookies(COOKIES)
+    assert len(helper.driver.cdp_calls) == 1
+    cmd, params = helper.driver.cdp_calls[0]
+    assert cmd == "Network.setCookies"
+    assert params["cookies"][0] == {
+        "name": "token", "value": "a'b\"c", "domain": ".95598.cn", "path": "/",
+        "secure": True, "httpOnly": True, "expires": 1893456000, "sameSite": "Lax",
+    }
+    assert params["cookies"][1]["domain"] == "www.95598.cn"
+
+
+def test_restore_cookies_falls_back_without_cdp(helper):
+    helper.driver = _RecordingDriver(cdp_supported=False)
+    helper._restore_cookies(COOKIES)
+    assert [c["name"] for c in helper.driver.added_cookies] == ["token", "sid"]
+
+
+def test_restore_storage_passes_values_as_arguments(helper):
+    local = {"user": "{\"name\": \"O'Brien\"}"}
+    session = {"k": "v"}
+    helper._restore_storage(local, session)
+    assert len(helper.driver.scripts) == 1
+    script, args = helper.driver.scripts[0]
+    assert args == (local, session)
+    assert "O'Brien" not in script
+
+
+class _ActionsDriver:
+    """记录发送给 chromedriver 的命令"""
+
+    def __init__(self):
+        self.commands = []
+
+    def find_element(self, by, value):
+        from selenium.webdriver.remote.webelement import WebElement
+        return WebElement(self, "slider")
+
+    def execute(self, command, params=None):
+        self.commands.append((command, params))
+        return {"value": None}
+
+
+def test_slide_trajectory_profile():
+    import random
+    from sgcc_electricity_feishu.login import slide_trajectory
+
+    track = slide_trajectory(200, random.Random(1))
+    *moves, rebound = track
+    assert sum(dx for dx, _, _ in moves) == 200
+    assert -3 <= rebound[0] <= -1
+    # 加速段步子大、停顿短，末段步子小、停顿长
+    assert all(8 <= dx <= 16 and 5 <= ms <= 20 for dx, _, ms in moves[:3])
+    assert all(dx <= 4 and ms >= 20 for dx, _, ms in moves[-3:])
+
+
+def test_sliding_track_sends_one_actions_sequence():
+    helper = LoginHelper.__new__(LoginHelper)
+    helper.retry_wait_time = 1
+    helper.driver = _ActionsDriver()
+    assert helper._sliding_track(120) is True
+
+    assert len(helper.driver.commands) == 1
+    command, params = helper.driver.commands[0]
+    assert command == "actions"
+    (pointer,) = params["actions"]
+    actions = pointer["actions"]
+    assert actions[0]["origin"] == {"element-6066-11e4-a52e-4f735466cecf": "slider"}
+    assert actions[1]["type"] == "pointerDown" and actions[-1]["type"] == "pointerUp"
+    moves = [a for a in actions[2:] if a["type"] == "pointerMove"]
+    assert sum(a["x"] for a in moves[:-1]) == 120
+
+
+class _ResumeDriver(_RecordingDriver):
+    """打开电费页后，会话有效时渲染户号选择框，失效时 0.1s 后跳回登录页"""
+
+    def __init__(self, session_valid):
+        super().__init__()
+        self.session_valid = session_valid
+        self.url = "about:blank"
+        self.opened_at = None
+
+    def get(self, url):
+        self.url = url
+        self.opened_at = time.monotonic()
+
+    @property
+    def current_url(self):
+        if not self.session_valid and "electricityCharge" in self.url and time.monotonic() - self.opened_at > 0.1:
+            return "https://www.95598.cn/osgweb/login"
+        return self.url
+
+    def execute_script(self, script, *args):
+        if "document.evaluate" in script:
+            return self.session_valid and "electricityCharge" in self.url
+        return super().execute_script(script, *args)
+
+
+@pytest.mark.parametrize("session_valid", [True, False])
+def test_resume_session_waits_for_page_instead_of_sleeping(session_valid, tmp_path):
+    from sgcc_electricity_feishu.latency_model import LatencyModel
+
+    helper = LoginHelper.__new__(LoginHelper)
+    helper.login_info = {"cookies": COOKIES, "localStorage": {}, "sessionStorage": {}}
+    helper.blocking_stats = None
+    helper.retry_wait_time = 10
+    helper.latency_model = LatencyModel(str(tmp_path / "wait_timings.json"))
+    helper.driver = _ResumeDriver(session_valid)
+    start = time.monotonic()
+    assert helper.resume_session() is session_valid
+    assert time.monotonic() - start < 1
+    assert [step for step, _, _ in helper.waiter.timings] == ["恢复会话后电费页加载"]
+
+
+def test_implicit_wait_derived_from_observed_latency(tmp_path):
+    from sgcc_electricity_feishu.latency_model import LatencyModel
+
+    helper = LoginHelper.__new__(LoginHelper)
+    helper.driver_wait_time = 60
+    helper.latency_model = None
+    assert helper._implicit_wait_time() == 60
+    helper.latency_model = LatencyModel(str(tmp_path / "wait_timings.json"))
+    for _ in range(5):
+        helper.latency_model.observe("元素出现", 10)
+    assert helper._implicit_wait_time() == 15
@@ -0,0 +1,329 @@
+import json
+import base64
+from pathlib import Path
+
+import pytest
+from selenium.webdriver.remote.webelement import WebElement
+from sgcc_electricity_feishu import electricity_data
+from sgcc_electricity_feishu.electricity_data import ElectricityDataFetcher
+from sgcc_electricity_feishu.network_capture import NetworkCapture, parse_daily_usage
+
+FIXTURES = Path(__file__).parent / "fixtures"
+# 日用电量接口 c24/f01 的响应，以及点击“日用电量”标签后 driver.get_log("performance") 的返回
+DAILY_USAGE_BODY = (FIXTURES / "daily_usage_c24_f01.json").read_text(encoding="utf-8")
+DAILY_USAGE = json.loads(DAILY_USAGE_BODY)
+PERFORMANCE_LOG = json.loads((FIXTURES / "performance_log_daily_usage.json").read_text(encoding="utf-8"))
+DAILY_USAGE_REQUEST_ID = "31580.102"
+RESPONSE_BODIES = {
+    "31580.101": '{"code": "00000", "message": "成功", "data": {"list": []}}',
+    DAILY_USAGE_REQUEST_ID: DAILY_USAGE_BODY,
+}
+
+
+class _Element(WebElement):
+    def __init__(self, key):
+        self.key = key
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def get_attribute(self, name):
+        # 用户选择框显示当前户号
+        return "001"
+
+
+class _FakePageDriver:
+    """点击“日用电量”标签时回放录制的 performance 日志；capture_usage=False 时页面没有请求日用电量接口"""
+
+    def __init__(self, capture_usage=True, dom_rows=None):
+        self.capture_usage = capture_usage
+        self.dom_rows = dom_rows or []
+        self.dom_scrapes = 0
+        self._log = []
+        self._bodies = {}
+        # Chrome 对未声明文本类型的响应按 base64 返回响应体
+        self.base64_bodies = False
+
+    def find_element(self, by, key):
+        return _Element(key)
+
+    def execute_script(self, script, *args):
+        if args and getattr(args[0], "key", None) == '//*[@id="tab-second"]':
+            self._xhr()
+        elif "querySelectorAll('tr')" in script:
+            self.dom_scrapes += 1
+            return self.dom_rows
+
+    def _xhr(self):
+        for entry in PERFORMANCE_LOG:
+            request_id = json.loads(entry["message"])["message"]["params"]["requestId"]
+            if request_id == DAILY_USAGE_REQUEST_ID and not self.capture_usage:
+                continue
+            self._log.append(entry)
+            if request_id in RESPONSE_BODIES:
+                self._bodies[request_id] = RESPONSE_BODIES[request_id]
+
+    def get_log(self, log_type):
+        entries, self._log = self._log, []
+        return entries
+
+    def execute_cdp_cmd(self, cmd, params):
+        assert cmd == "Network.getResponseBody"
+        if params["requestId"] not in self._bodies:
+            # 统计请求返回的是 gif
+            return {"body": "R0lGODlhAQABAAAAACw=", "base64Encoded": True}
+        body = self._bodies[params["requestId"]]
+        if self.base64_bodies:
+            return {"body": base64.b64encode(body.encode()).decode(), "base64Encoded": True}
+        return {"body": body, "base64Encoded": False}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch, tmp_path):
+    monkeypatch.setattr(electricity_data.time, "sleep", lambda seconds: None)
+    monkeypatch.setenv("WAIT_TIMINGS_FILE", str(tmp_path / "wait_timings.json"))
+
+
+def _fetcher(driver):
+    fetcher = ElectricityDataFetcher(driver, user_ids=["001"])
+    fetcher.capture_timeout = 0.05
+    return fetcher
+
+
+def test_parse_recorded_daily_usage_response():
+    rows = parse_daily_usage(DAILY_USAGE)
+    assert len(rows) == 7
+    assert rows[0] == {"date": "2024-05-07", "reading": "18.52", "highNum": "12.21", "lowNum": "6.31"}
+    # 尚未出账的日期字段为空
+    assert rows[-1] == {"date": "2024-05-01", "reading": "", "highNum": "0", "lowNum": "0"}
+    assert parse_daily_usage({"code": "00000", "data": "encrypted"}) is None
+    assert parse_daily_usage(json.loads(RESPONSE_BODIES["31580.101"])) is None
+
+
+def test_pattern_matches_only_daily_usage_endpoint():
+    pattern = NetworkCapture(driver=None).url_pattern
+    urls = [json.loads(entry["message"])["message"]["params"]["response"]["url"]
+            for entry in PERFORMANCE_LOG if "Network.responseReceived" in entry["message"]]
+    # 同一页面还会请求相邻的 c24/f02 接口和带 daily 参数的统计请求
+    assert [url for url in urls if pattern.search(url)] == ["https://www.95598.cn/api/osg-web0004/member/c24/f01"]
+    assert pattern.search("https://www.95598.cn/api/osg-web0004/member/c24/f01?_t=1715101200")
+    assert not pattern.search("https://www.95598.cn/api/osg-web0004/member/c24/f012")
+
+
+def test_daily_usage_read_from_xhr():
+    driver = _FakePageDriver()
+    data = _fetcher(driver).get_daily_electricity_data()
+    assert data == {"001": parse_daily_usage(DAILY_USAGE)}
+    assert data["001"][0]["date"] == "2024-05-07"
+    assert driver.dom_scrapes == 0
+
+
+def test_daily_usage_read_from_base64_encoded_body():
+    driver = _FakePageDriver()
+    driver.base64_bodies = True
+    data = _fetcher(driver).get_daily_electricity_data()
+    assert data == {"001": parse_daily_usage(DAILY_USAGE)}
+    assert driver.dom_scrapes == 0
+    assert base64.b64decode(driver.execute_cdp_cmd(
+        "Network.getResponseBody", {"requestId": DAILY_USAGE_REQUEST_ID})["body"]).decode() == DAILY_USAGE_BODY
+
+
+def test_falls_back_to_dom_when_response_not_found():
+    dom_rows = [{"date": "2024-01-01", "reading": "10", "highNum": "6", "lowNum": "4"}]
+    driver = _FakePageDriver(capture_usage=False, dom_rows=dom_rows)
+    data = _fetcher(driver).get_daily_electricity_data()
+    assert data == {"001": dom_rows}
+    assert driver.dom_scrapes == 1
+
+
+def test_incremental_scrape_skips_rows_at_or_before_watermark():
+    driver = _FakePageDriver()
+    fetcher = _fetcher(driver)
+    fetcher.watermarks = {"001": "2024-05-05"}
+    data = fetcher.get_daily_electricity_data()
+    assert [row["date"] for row in data["001"]] == ["2024-05-07", "2024-05-06"]
+
+
+class _BulkTableDriver(_FakePageDriver):
+    """支持异步脚本，一次返回展开后的表格 HTML"""
+
+    def __init__(self, html):
+        super().__init__(capture_usage=False)
+        self.html = html
+        self.async_calls = []
+        self.timeouts = type("Timeouts", (), {"script": 30})()
+        self.script_timeouts = []
+
+    def set_script_timeout(self, seconds):
+        self.script_timeouts.append(seconds)
+        self.timeouts.script = seconds
+
+    def execute_async_script(self, script, *args):
+        self.async_calls.append(args)
+        return self.html if "drop-box-left" in script else True
+
+
+def test_bulk_table_parse_in_one_script():
+    html = (FIXTURES / "daily_table_expanded.html").read_text(encoding="utf-8")
+    driver = _BulkTableDriver(html)
+    fetcher = _fetcher(driver)
+    fetcher.watermarks = {"001": "2024-05-05"}
+    data = fetcher.get_daily_electricity_data()
+    assert [row["date"] for row in data["001"]] == ["2024-05-07", "2024-05-06"]
+    assert data["001"][0]["highNum"] == "12.21"
+    assert driver.dom_scrapes == 0
+    # 展开表格后异步脚本超时恢复为原值
+    bulk = driver.script_timeouts.index(fetcher.DRIVER_IMPLICITY_WAIT_TIME + 5)
+    assert driver.script_timeouts[bulk + 1] == driver.script_timeouts[bulk - 1]
+
+
+def test_accordion_table_falls_back_to_rows_once():
+    dom_rows = [{"date": "2024-01-01", "reading": "10", "highNum": "6", "lowNum": "4"}]
+    driver = _BulkTableDriver("accordion")
+    driver.dom_rows = dom_rows
+    fetcher = _fetcher(driver)
+    assert fetcher.get_daily_electricity_data() == {"001": dom_rows}
+    assert driver.dom_scrapes == 1
+    assert fetcher.dom_mode == "rows"
+
+
+class _FlakyMenuDriver(_FakePageDriver):
+    """第一次切换到指定户号时失败"""
+
+    def __init__(self, flaky_user_id):
+        super().__init__()
+        self.flaky_user_id = flaky_user_id
+        self.selected = []
+        self.refreshes = 0
+
+    def execute_script(self, script, *args):
+        if args and args[0] in ("001", "002"):
+            self.selected.append(args[0])
+            if args[0] == self.flaky_user_id and self.selected.count(args[0]) == 1:
+                raise RuntimeError("菜单项不可点击")
+            return True
+        return super().execute_script(script, *args)
+
+    def find_element(self, by, key):
+        element = _Element(key)
+        # 用户选择框显示最后切换到的户号
+        element.get_attribute = lambda name: self.selected[-1] if self.selected else ""
+        return element
+
+    def refresh(self):
+        self.refreshes += 1
+
+
+def test_failed_meter_retried_in_same_session():
+    driver = _FlakyMenuDriver(flaky_user_id="001")
+    fetcher = ElectricityDataFetcher(driver, user_ids=["001", "002"])
+    fetcher.capture_timeout = 0.05
+    data = fetcher.get_daily_electricity_data()
+    assert set(data) == {"001", "002"}
+    assert driver.selected == ["001", "002", "001"]
+    assert driver.refreshes == 1
+    assert fetcher.failed == {}
+
+
+def test_only_pending_meters_scraped():
+    driver = _FlakyMenuDriver(flaky_user_id=None)
+    fetcher = ElectricityDataFetcher(driver, user_ids=["001", "002"], pending_user_ids=["002"])
+    fetcher.capture_timeout = 0.05
+    assert list(fetcher.get_daily_electricity_data()) == ["002"]
+    assert driver.selected == ["002"]
+
+
+class _ShortWaits:
+    """把所有等待上限缩短，避免测试等满默认超时"""
+
+    def timeout(self, step, default):
+        return 0.2
+
+    def observe(self, step, seconds):
+        pass
+
+    def save(self):
+        pass
+
+
+def test_meter_fails_when_selected_user_never_changes():
+    # 用户选择框一直显示 001，切换到 002 没有生效
+    driver = _FakePageDriver()
+    fetcher = ElectricityDataFetcher(driver, user_ids=["002"], latency_model=_ShortWaits())
+    fetcher.capture_timeout = 0.05
+    assert fetcher.get_daily_electricity_data() == {}
+    assert "002" in fetcher.failed
+    # 没有点击“日用电量”，也没有抓取上一个户号的表格
+    assert driver._bodies == {}
+    assert driver.dom_scrapes == 0
+
+
+# 在 node 中用最小的 DOM 替身运行 EXPAND_ALL_ROWS_JS：点击展开图标 100ms 后该行展开，
+# accordion 为 true 时展开一行会收起其他行
+_EXPAND_HARNESS = """
+const [dates, watermark, accordion, timeoutMs] = JSON.parse(process.argv[1]);
+const rows = dates.map((date) => {
+    const tr = {
+        date, classes: new Set(), nextElementSibling: {querySelector: () => null},
+        classList: {contains: (name) => tr.classes.has(name)},
+        querySelector(selector) {
+            if (selector.startsWith('td:nth-child(1)')) return {innerText: date};
+            return {click: () => setTimeout(() => {
+                if (accordion) rows.forEach(collapse);
+                tr.classes.add('expanded');
+                tr.nextElementSibling = {querySelector: () => ({})};
+            }, 100)};
+        },
+    };
+    return tr;
+});
+const collapse = (tr) => { tr.classes.delete('expanded'); tr.nextElementSibling = {querySelector: () => null}; };
+const tbody = {
+    querySelectorAll: () => rows,
+    get outerHTML() { return JSON.stringify(rows.map((tr) => [tr.date, tr.classes.has('expanded')])); },
+};
+global.document = {querySelector: () => tbody};
+const start = Date.now();
+const done = (result) => console.log(JSON.stringify({result, elapsed: Date.now() - start}));
+(function () { SCRIPT }).apply(null, ['tbody', watermark, timeoutMs, done]);
+"""
+
+
+def _run_expand_js(dates, watermark="", accordion=False, timeout_ms=3000):
+    import shutil
+    import subprocess
+
+    if not shutil.which("node"):
+        pytest.skip("需要 node 运行展开表格的脚本")
+    harness = _EXPAND_HARNESS.replace("SCRIPT", electricity_data.EXPAND_ALL_ROWS_JS)
+    args = json.dumps([dates, watermark, accordion, timeout_ms])
+    output = subprocess.run(["node", "-e", harness, args], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def test_expand_script_single_new_row_does_not_wait_for_timeout():
+    # 每天增量抓取时水位线之后通常只剩一行
+    run = _run_expand_js(["2024-05-07", "2024-05-06", "2024-05-05"], watermark="2024-05-06")
+    assert json.loads(run["result"]) == [["2024-05-07", True], ["2024-05-06", False], ["2024-05-05", False]]
+    assert run["elapsed"] < 1000
+
+
+def test_expand_script_layouts():
+    run = _run_expand_js(["2024-05-07", "2024-05-06", "2024-05-05"])
+    assert all(expanded for _, expanded in json.loads(run["result"]))
+    assert run["elapsed"] < 1000
+    assert _run_expand_js(["2024-05-07", "2024-05-06", "2024-05-05"], accordion=True)["result"] == "accordion"
+
+
+def test_bulk_table_single_row_after_watermark():
+    html = (FIXTURES / "daily_table_expanded.html").read_text(encoding="utf-8")
+    driver = _BulkTableDriver(html)
+    fetcher = _fetcher(driver)
+    fetcher.watermarks = {"001": "2024-05-06"}
+    data = fetcher.get_daily_electricity_data()
+    assert [row["date"] for row in data["001"]] == ["2024-05-07"]
+    assert driver.dom_scrapes == 0
+    assert driver.async_calls[-1][1] == "2024-05-06"
@@ -0,0 +1,245 @@
+import numpy as np
+import pytest
+from sgcc_electricity_feishu.onnx import ONNX
+
+
+def _reference_get_boxes(onnx, prediction, confidence_threshold=0.7, nms_threshold=0.6):
+    """逐框循环的原始实现，用于对比向量化版本的输出"""
+    feature_map = np.squeeze(prediction)
+    box = feature_map[feature_map[..., 4] > confidence_threshold]
+    cls = [int(np.argmax(c)) for c in box[..., 5:]]
+    output = []
+    for curr_cls in sorted(set(cls)):
+        curr_cls_box = []
+        for j in range(len(cls)):
+            if cls[j] == curr_cls:
+                box[j][5] = curr_cls
+                curr_cls_box.append(box[j][:6])
+        curr_cls_box = onnx.xywh2xyxy(np.array(curr_cls_box))
+        for k in onnx.nms(curr_cls_box, nms_threshold):
+            output.append(curr_cls_box[k])
+    return np.array(output)
+
+
+def _fake_prediction(rng, num_boxes=10647, num_classes=1, positives=40):
+    prediction = np.zeros((1, num_boxes, 5 + num_classes), dtype=np.float32)
+    prediction[0, :, 0:2] = rng.uniform(0, 416, size=(num_boxes, 2))
+    prediction[0, :, 2:4] = rng.uniform(10, 80, size=(num_boxes, 2))
+    prediction[0, :, 4] = rng.uniform(0, 0.5, size=num_boxes)
+    prediction[0, :, 5:] = rng.uniform(0, 1, size=(num_boxes, num_classes))
+    hits = rng.choice(num_boxes, size=positives, replace=False)
+    prediction[0, hits, 4] = rng.uniform(0.7, 1.0, size=positives)
+    # 在同一位置附近堆叠若干框，保证 NMS 有实际的抑制
+    prediction[0, hits[: positives // 2], 0:2] = rng.normal(200, 5, size=(positives // 2, 2))
+    return prediction
+
+
+@pytest.fixture
+def onnx():
+    # 后处理不依赖推理会话，跳过模型加载
+    return ONNX.__new__(ONNX)
+
+
+@pytest.mark.parametrize("num_classes", [1, 3])
+@pytest.mark.parametrize("seed", range(5))
+def test_get_boxes_matches_reference(onnx, seed, num_classes):
+    prediction = _fake_prediction(np.random.default_rng(seed), num_classes=num_classes)
+    expected = _reference_get_boxes(onnx, prediction.copy())
+    actual = onnx.get_boxes(prediction)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_get_boxes_without_detections(onnx):
+    prediction = np.zeros((1, 100, 6), dtype=np.float32)
+    assert len(onnx.get_boxes(prediction)) == 0
+
+
+def test_get_boxes_top_k(onnx):
+    prediction = _fake_prediction(np.random.default_rng(0))
+    full = onnx.get_boxes(prediction)
+    top = onnx.get_boxes(prediction, top_k=1)
+    np.testing.assert_array_equal(top, full[:1])
+
+
+def test_session_options_from_env(monkeypatch):
+    import onnxruntime
+    from sgcc_electricity_feishu.onnx import session_options_from_env
+
+    monkeypatch.setenv("ONNX_INTRA_OP_THREADS", "2")
+    monkeypatch.setenv("ONNX_INTER_OP_THREADS", "1")
+    monkeypatch.setenv("ONNX_GRAPH_OPTIMIZATION_LEVEL", "basic")
+    monkeypatch.setenv("ONNX_EXECUTION_MODE", "parallel")
+    options = session_options_from_env()
+    assert options.intra_op_num_threads == 2
+    assert options.inter_op_num_threads == 1
+    assert options.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    assert options.execution_mode == onnxruntime.ExecutionMode.ORT_PARALLEL
+
+    monkeypatch.setenv("ONNX_GRAPH_OPTIMIZATION_LEVEL", "fastest")
+    with pytest.raises(ValueError):
+        session_options_from_env()
+
+
+def test_optimized_model_path(monkeypatch):
+    from sgcc_electricity_feishu.onnx import optimized_model_path
+
+    monkeypatch.delenv("ONNX_OPTIMIZED_MODEL_PATH", raising=False)
+    assert optimized_model_path("models/captcha.onnx") == "models/captcha.opt.onnx"
+    monkeypatch.setenv("ONNX_OPTIMIZED_MODEL_PATH", "/data/opt.onnx")
+    assert optimized_model_path("captcha.onnx") == "/data/opt.captcha.onnx"
+    assert optimized_model_path("captcha.int8.onnx") == "/data/opt.captcha.int8.onnx"
+    monkeypatch.setenv("ONNX_OPTIMIZED_MODEL_PATH", "/data/")
+    assert optimized_model_path("models/captcha.int8.onnx") == "/data/captcha.int8.opt.onnx"
+    monkeypatch.setenv("ONNX_OPTIMIZED_MODEL_PATH", "none")
+    assert optimized_model_path("captcha.onnx") is None
+
+
+def _scale_model(path, weight):
+    """Y = X * weight 的最小模型"""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper
+
+    graph = helper.make_graph(
+        [helper.make_node("Mul", ["X", "W"], ["Y"])], "scale",
+        [helper.make_tensor_value_info("X", TensorProto.FLOAT, [1, 4])],
+        [helper.make_tensor_value_info("Y", TensorProto.FLOAT, [1, 4])],
+        [helper.make_tensor("W", TensorProto.FLOAT, [1], [weight])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+
+
+def test_shared_optimized_path_keeps_models_apart(monkeypatch, tmp_path):
+    from sgcc_electricity_feishu import onnx as onnx_module
+
+    _scale_model(tmp_path / "captcha.onnx", 1.0)
+    _scale_model(tmp_path / "captcha.int8.onnx", 2.0)
+    monkeypatch.setenv("ONNX_OPTIMIZED_MODEL_PATH", str(tmp_path / "captcha.opt.onnx"))
+    x = np.full((1, 4), 4, dtype=np.float32)
+
+    for _ in range(2):
+        # 第二轮从已保存的优化结果加载
+        monkeypatch.setattr(onnx_module, "_sessions", {})
+        fp32 = onnx_module.get_session(str(tmp_path / "captcha.onnx"))
+        int8 = onnx_module.get_session(str(tmp_path / "captcha.int8.onnx"))
+        np.testing.assert_array_equal(fp32.run(None, {"X": x})[0], [[4, 4, 4, 4]])
+        np.testing.assert_array_equal(int8.run(None, {"X": x})[0], [[8, 8, 8, 8]])
+
+
+class _FakeInput:
+    def __init__(self, shape):
+        self.name = "images"
+        self.shape = shape
+
+
+class _FakeSession:
+    """按输入图像的平均亮度生成一个缺口框的假推理会话"""
+
+    def __init__(self, batch_dim="N"):
+        self.batch_dim = batch_dim
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        return [_FakeInput([self.batch_dim, 3, 416, 416])]
+
+    def run(self, output_names, inputs):
+        batch = inputs["images"]
+        self.batch_sizes.append(len(batch))
+        prediction = np.zeros((len(batch), 50, 6), dtype=np.float32)
+        for n, img in enumerate(batch):
+            brightness = float(img.mean())
+            if brightness > 0.1:
+                prediction[n, 0] = [brightness * 400, 100, 40, 40, 0.9, 1.0]
+        return [prediction]
+
+
+def _gray_image(value):
+    from PIL import Image
+    return Image.new("RGB", (260, 160), (value, value, value))
+
+
+@pytest.mark.parametrize("batch_dim", ["N", 2])
+def test_get_distances_matches_get_distance(onnx, batch_dim):
+    onnx.onnx_session = _FakeSession(batch_dim)
+    images = [_gray_image(v) for v in (0, 60, 120, 200, 250)]
+    results = onnx.get_distances(images)
+    assert [distance for distance, _ in results] == [onnx.get_distance(image) for image in images]
+    assert results[0] == (0, 0.0)
+    assert all(score == pytest.approx(0.9) for _, score in results[1:])
+
+
+def test_get_distances_chunks_fixed_batch(onnx):
+    onnx.onnx_session = _FakeSession(batch_dim=2)
+    onnx.get_distances([_gray_image(100)] * 5)
+    assert onnx.onnx_session.batch_sizes == [2, 2, 1]
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L", "P"])
+def test_preprocess_matches_legacy_pipeline(onnx, mode):
+    from PIL import Image
+    rng = np.random.default_rng(1)
+    image = Image.fromarray(rng.integers(0, 255, (155, 310, 4), dtype=np.uint8), "RGBA").convert(mode)
+
+    legacy = np.array(image.resize((416, 416)).convert("RGB")).transpose(2, 0, 1).astype(np.float32)
+    legacy /= 255.0
+
+    out = np.full((3, 416, 416), np.nan, dtype=np.float32)
+    tensor, _ = onnx._preprocess(image, out=out)
+    assert tensor is out
+    np.testing.assert_array_equal(tensor, legacy)
+
+
+class _FixedSession(_FakeSession):
+    def __init__(self, prediction):
+        super().__init__()
+        self.prediction = prediction
+
+    def run(self, output_names, inputs):
+        return [self.prediction]
+
+
+def test_get_candidates_ranked_by_score(onnx):
+    prediction = np.zeros((1, 50, 6), dtype=np.float32)
+    prediction[0, 0] = [100, 100, 40, 40, 0.75, 1.0]
+    prediction[0, 1] = [300, 100, 40, 40, 0.95, 1.0]
+    prediction[0, 2] = [200, 100, 40, 40, 0.40, 1.0]
+    prediction[0, 3] = [302, 101, 40, 40, 0.90, 1.0]  # 与最高分框重叠，被 NMS 抑制
+    onnx.onnx_session = _FixedSession(prediction)
+    image = _gray_image(100)
+
+    assert [d for d, _ in onnx.get_candidates(image)] == [280, 80, 180]
+    assert [d for d, _ in onnx.get_candidates(image, max_candidates=2)] == [280, 80]
+    assert [d for d, _ in onnx.get_candidates(image, confidence_threshold=0.7)] == [280, 80]
+    assert onnx.get_distance(image) == 280
+
+
+def test_resolve_model_path_requires_passed_gate(tmp_path, monkeypatch):
+    import json
+    import os
+    from sgcc_electricity_feishu.onnx import resolve_model_path, gate_record_path
+
+    monkeypatch.delenv("ONNX_QUANTIZED_MODEL_PATH", raising=False)
+    model = tmp_path / "captcha.onnx"
+    quantized = tmp_path / "captcha.int8.onnx"
+    model.write_bytes(b"fp32")
+
+    assert resolve_model_path(str(model), "fp32") == str(model)
+    assert resolve_model_path(str(model), "int8") == str(model)
+
+    quantized.write_bytes(b"int8")
+    gate = gate_record_path(str(quantized))
+    with open(gate, "w") as f:
+        json.dump({"passed": False}, f)
+    assert resolve_model_path(str(model), "int8") == str(model)
+
+    with open(gate, "w") as f:
+        json.dump({"passed": True, "mean_error": 0.5}, f)
+    assert resolve_model_path(str(model), "int8") == str(quantized)
+
+    # 原模型更新后量化模型视为过期
+    os.utime(model, (quantized.stat().st_mtime + 10,) * 2)
+    assert resolve_model_path(str(model), "int8") == str(model)
+
+    with pytest.raises(ValueError):
+        resolve_model_path(str(model), "fp16")
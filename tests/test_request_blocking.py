@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from sgcc_electricity_feishu.request_blocking import (
+    BlockingStats, _wildcard_regex, blocked_url_patterns, navigation_metrics,
+)
+
+
+def test_default_patterns_keep_captcha_and_data_requests(monkeypatch):
+    monkeypatch.delenv("REQUEST_BLOCKING", raising=False)
+    monkeypatch.setenv("REQUEST_BLOCKING_EXTRA_PATTERNS", "*ads.example.com*,*.png,*/api/*")
+    patterns = blocked_url_patterns()
+    assert "*.woff2" in patterns and "*hm.baidu.com*" in patterns
+    assert "*ads.example.com*" in patterns
+    assert "*.png" not in patterns and "*/api/*" not in patterns
+    # 图片默认不屏蔽，验证码依赖图片
+    assert "*.jpg" not in patterns and "*.svg" not in patterns
+
+
+def test_image_blocking_is_opt_in(monkeypatch):
+    monkeypatch.delenv("REQUEST_BLOCKING_EXTRA_PATTERNS", raising=False)
+    monkeypatch.setenv("REQUEST_BLOCKING", "image,font")
+    assert "*.jpg" in blocked_url_patterns()
+
+
+def test_font_patterns_match_query_stringed_urls(monkeypatch):
+    monkeypatch.delenv("REQUEST_BLOCKING", raising=False)
+    monkeypatch.delenv("REQUEST_BLOCKING_EXTRA_PATTERNS", raising=False)
+    regexes = [_wildcard_regex(pattern) for pattern in blocked_url_patterns()]
+
+    def blocked(url):
+        return any(regex.match(url) for regex in regexes)
+
+    assert blocked("https://www.95598.cn/osgweb/fonts/element-icons.woff2?v=3")
+    assert blocked("https://www.95598.cn/osgweb/fonts/iconfont.ttf?t=1715101200#iefix")
+    assert blocked("https://www.95598.cn/osgweb/fonts/iconfont.woff")
+    assert not blocked("https://www.95598.cn/osgweb/js/app.js?v=3")
+    assert not blocked("https://www.95598.cn/osgweb/fonts.woffle/app.js")
+
+
+def test_blocking_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("REQUEST_BLOCKING", "off")
+    assert blocked_url_patterns() == []
+    monkeypatch.setenv("REQUEST_BLOCKING", "video")
+    with pytest.raises(ValueError):
+        blocked_url_patterns()
+
+
+class _LogDriver:
+    def __init__(self, events):
+        self.events = events
+
+    def get_log(self, log_type):
+        return [{"message": json.dumps({"message": {"method": m, "params": p}})} for m, p in self.events]
+
+    def execute_script(self, script):
+        return 420.0
+
+
+def test_navigation_metrics_and_savings(tmp_path):
+    driver = _LogDriver([
+        ("Network.requestWillBeSent", {"requestId": "1", "request": {"url": "https://x/a.js"}}),
+        ("Network.loadingFinished", {"requestId": "1", "encodedDataLength": 2048}),
+        ("Network.requestWillBeSent", {"requestId": "2", "request": {"url": "https://x/b.jpg"}}),
+        ("Network.loadingFailed", {"requestId": "2", "blockedReason": "inspector"}),
+    ])
+    metrics = navigation_metrics(driver)
+    assert metrics == {"bytes": 2048, "requests": 1, "blocked": ["https://x/b.jpg"], "load_ms": 420.0}
+
+    stats = BlockingStats(str(tmp_path / "stats.json"))
+    assert stats.record("https://x/page", True, metrics) is None
+    saved = stats.record("https://x/page", False, {"bytes": 10240, "load_ms": 900.0})
+    assert saved == (8192, 480.0)
+    # 重新加载后保留历史样本
+    assert BlockingStats(str(tmp_path / "stats.json")).record("https://x/page", True, metrics) == (8192, 480.0)
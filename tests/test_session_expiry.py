@@ -0,0 +1,67 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from sgcc_electricity_feishu.session_expiry import (
+    compute_expiration, load_saved_expiration, parse_expiration, refresh_time,
+)
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _ts(dt):
+    return dt.timestamp()
+
+
+def test_expiration_uses_earliest_auth_cookie():
+    cookies = [
+        {"name": "token", "value": "1", "expiry": _ts(NOW + timedelta(hours=6))},
+        {"name": "refresh", "value": "2", "expiry": _ts(NOW + timedelta(days=7))},
+        {"name": "tracking", "value": "3", "expiry": _ts(NOW + timedelta(minutes=10))},
+        {"name": "session", "value": "4"},
+    ]
+    margin = timedelta(minutes=30)
+    assert compute_expiration(cookies, ["token", "refresh"], margin=margin, now=NOW) == NOW + timedelta(hours=5, minutes=30)
+    # 未指定认证 cookie 时使用默认名称，统计 cookie 不影响会话有效期
+    assert compute_expiration(cookies, None, margin=margin, now=NOW) == NOW + timedelta(hours=5, minutes=30)
+
+
+def test_expiration_ignores_short_lived_cookies():
+    cookies = [
+        {"name": "token", "value": "1", "expiry": _ts(NOW + timedelta(minutes=5))},
+        {"name": "_ga", "value": "2", "expiry": _ts(NOW + timedelta(minutes=1))},
+    ]
+    lifetime = timedelta(days=1)
+    assert compute_expiration(cookies, None, now=NOW, default_lifetime=lifetime) == NOW + lifetime
+    # 有效期短于安全余量时不扣除余量
+    cookies = [{"name": "token", "value": "1", "expiry": _ts(NOW + timedelta(minutes=20))}]
+    assert compute_expiration(cookies, None, margin=timedelta(minutes=30), now=NOW) == NOW + timedelta(minutes=20)
+
+
+def test_expiration_defaults_without_expiry():
+    cookies = [{"name": "session", "value": "1"}]
+    assert compute_expiration(cookies, now=NOW, default_lifetime=timedelta(days=1)) == NOW + timedelta(days=1)
+
+
+def test_parse_expiration():
+    assert parse_expiration("2026-01-01T12:00:00+00:00") == NOW
+    assert parse_expiration("2026-01-01T12:00:00Z") == NOW
+    legacy = parse_expiration("2026-01-01 20:00:00.123456")
+    assert legacy.tzinfo is not None
+    assert parse_expiration("bad") is None
+    assert parse_expiration(None) is None
+
+
+def test_refresh_time():
+    next_run = NOW + timedelta(hours=6)
+    lead = timedelta(hours=1)
+    assert refresh_time(NOW + timedelta(days=1), next_run, lead, now=NOW) is None
+    assert refresh_time(NOW + timedelta(hours=2), next_run, lead, now=NOW) == NOW + timedelta(hours=5)
+    assert refresh_time(None, next_run, lead, now=NOW) == NOW + timedelta(hours=5)
+    assert refresh_time(NOW, NOW + timedelta(minutes=10), lead, now=NOW) == NOW
+
+
+def test_load_saved_expiration(tmp_path):
+    path = tmp_path / "login_info.json"
+    assert load_saved_expiration(str(path)) is None
+    path.write_text(json.dumps({"expiration_time": NOW.isoformat()}))
+    assert load_saved_expiration(str(path)) == NOW
@@ -0,0 +1,111 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from sgcc_electricity_feishu.session_probe import cookie_header, probe_session
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """模拟 95598：页面是单页应用外壳，无论是否登录都返回 200；接口按 token 返回 JSON code"""
+
+    def do_GET(self):
+        if self.path.startswith("/osgweb"):
+            self._reply(200, "<div id='app'></div>")
+        elif self.path.startswith("/down"):
+            self._reply(503, "maintenance")
+        else:
+            self._redirect_to_login()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        good = "token=good" in self.headers.get("Cookie", "")
+        if self.path.startswith("/api/member"):
+            self._reply(200, '{"code": "00000", "data": {}}' if good else '{"code": "10002", "message": "NOT_LOGIN"}')
+        elif self.path.startswith("/api/usage"):
+            # 业务接口缺少参数时返回参数错误，与会话是否有效无关
+            self._reply(200, '{"code": "10001", "message": "参数错误"}' if good else '{"code": "10002", "message": "NOT_LOGIN"}')
+        elif self.path.startswith("/api/text"):
+            self._reply(200, "ok" if good else "NOT_LOGIN")
+        elif self.path.startswith("/api/guarded"):
+            if good:
+                self._reply(200, '{"code": "00000"}')
+            else:
+                self._redirect_to_login()
+        else:
+            self._reply(404, "not found")
+
+    def _redirect_to_login(self):
+        self.send_response(302)
+        self.send_header("Location", "/osgweb/login")
+        self.end_headers()
+
+    def _reply(self, status, body):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = HTTPServer(("127.0.0.1", 0), _StandInHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def _cookies(token):
+    return [{"name": "token", "value": token, "domain": "127.0.0.1", "path": "/"}]
+
+
+def test_probe_valid_session(server):
+    assert probe_session(_cookies("good"), url=f"{server}/api/member") is True
+
+
+def test_probe_expired_session(server):
+    assert probe_session(_cookies("stale"), url=f"{server}/api/member", auth_error_codes=("10002",)) is False
+    assert probe_session(_cookies("stale"), url=f"{server}/api/guarded") is False
+
+
+def test_probe_unknown_code_is_inconclusive(server):
+    url = f"{server}/api/usage"
+    assert probe_session(_cookies("good"), url=url, auth_error_codes=("10002",)) is None
+    assert probe_session(_cookies("stale"), url=url, auth_error_codes=("10002",)) is False
+    # 没有配置认证失败 code 时不把任何 code 当作失效
+    assert probe_session(_cookies("stale"), url=f"{server}/api/member") is None
+
+
+def test_probe_spa_shell_is_inconclusive(server):
+    # 单页应用页面登录与否都返回同样的 200 外壳，不能据此判断会话有效
+    url = f"{server}/osgweb/electricityCharge"
+    assert probe_session(_cookies("good"), url=url, method="GET") is None
+    assert probe_session(_cookies("stale"), url=url, method="GET") is None
+
+
+def test_probe_body_patterns(server):
+    url = f"{server}/api/text"
+    assert probe_session(_cookies("good"), url=url, valid_body_pattern="^ok$") is True
+    assert probe_session(_cookies("stale"), url=url, valid_body_pattern="^ok$") is None
+    assert probe_session(_cookies("stale"), url=url, invalid_body_pattern="NOT_LOGIN") is False
+    assert probe_session(_cookies("good"), url=f"{server}/api/member", invalid_body_pattern="NOT_LOGIN") is True
+
+
+def test_probe_inconclusive(server):
+    assert probe_session(_cookies("good"), url=f"{server}/down", method="GET") is None
+    assert probe_session(_cookies("good"), url="http://127.0.0.1:1/api/member", timeout=1) is None
+
+
+def test_cookie_header_filters_domain_path_and_expiry():
+    cookies = [
+        {"name": "a", "value": "1", "domain": ".95598.cn", "path": "/"},
+        {"name": "b", "value": "2", "domain": "example.com", "path": "/"},
+        {"name": "c", "value": "3", "domain": "www.95598.cn", "path": "/api"},
+        {"name": "d", "value": "4", "domain": "www.95598.cn", "path": "/", "expiry": 100},
+        {"name": "e", "value": "5", "domain": "www.95598.cn", "path": "/", "expiry": 10 ** 10},
+    ]
+    assert cookie_header(cookies, "https://www.95598.cn/osgweb/electricityCharge", now=1000) == "a=1; e=5"
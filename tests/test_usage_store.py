@@ -0,0 +1,61 @@
+import json
+
+from sgcc_electricity_feishu.usage_store import UsageStore
+
+
+def _row(date, reading="10", high="6", low="4"):
+    return {"date": date, "reading": reading, "highNum": high, "lowNum": low}
+
+
+def test_upsert_deduplicates_and_keeps_confirmed_values(tmp_path):
+    store = UsageStore(str(tmp_path / "usage.db"))
+    assert store.upsert("A", [_row("2024-01-01"), _row("2024-01-02", "0", "0", "0")]) == 2
+    # 重复写入相同的数据不产生变化
+    assert store.upsert("A", [_row("2024-01-01")]) == 0
+    # 出账后的数据覆盖全零行，全零数据不会覆盖已出账的行
+    assert store.upsert("A", [_row("2024-01-02", "12", "8.1", "4.4"), _row("2024-01-01", "0", "0", "0")]) == 1
+    assert store.rows("A") == [
+        {"date": "2024-01-02", "reading": 12.0, "highNum": 8.1, "lowNum": 4.4},
+        {"date": "2024-01-01", "reading": 10.0, "highNum": 6.0, "lowNum": 4.0},
+    ]
+    store.close()
+
+
+def test_range_query_across_meters():
+    store = UsageStore(":memory:")
+    for day in range(1, 6):
+        store.upsert("A", [_row(f"2024-01-0{day}")])
+        store.upsert("B", [_row(f"2024-01-0{day}")])
+    result = store.query(start="2024-01-02", end="2024-01-03")
+    assert {meter: [row["date"] for row in rows] for meter, rows in result.items()} == {
+        "A": ["2024-01-03", "2024-01-02"],
+        "B": ["2024-01-03", "2024-01-02"],
+    }
+    assert [row["date"] for row in store.rows("B", start="2024-01-05")] == ["2024-01-05"]
+    assert store.meters() == ["A", "B"]
+
+
+def test_fetch_log_tracks_success_and_failures():
+    store = UsageStore(":memory:")
+    store.record_fetch("2024-01-02", "A")
+    assert store.record_failure("2024-01-02", "B") == 1
+    assert store.record_failure("2024-01-02", "B") == 2
+    assert store.fetched_meters("2024-01-02") == {"A"}
+    assert store.failed_attempts("2024-01-02") == {"B": 2}
+
+
+def test_migrate_json_cache_once(tmp_path):
+    cache_dir = tmp_path / "sgcc_cache"
+    cache_dir.mkdir()
+    (cache_dir / "2024-01-02.json").write_text(json.dumps({"A": [_row("2024-01-01", "9")]}))
+    (cache_dir / "2024-01-03.json").write_text(json.dumps({"A": [_row("2024-01-01"), _row("2024-01-02")]}))
+    (cache_dir / "2024-01-03.status.json").write_text(json.dumps({"B": {"attempts": 2}}))
+    (cache_dir / "notes.json").write_text("{}")
+
+    store = UsageStore(":memory:")
+    assert store.migrate_json_cache(str(cache_dir)) == 3
+    # 同一天以较新的缓存为准
+    assert [(row["date"], row["reading"]) for row in store.rows("A")] == [("2024-01-02", 10.0), ("2024-01-01", 10.0)]
+    assert store.fetched_meters("2024-01-03") == {"A"}
+    assert store.failed_attempts("2024-01-03") == {"B": 2}
+    assert store.migrate_json_cache(str(cache_dir)) == 0
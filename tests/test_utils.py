@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from sgcc_electricity_feishu.utils import index_feishu_records, sync_meter_to_feishu
+
+
+class _Record:
+    def __init__(self, record_id, date, **fields):
+        self.record_id = record_id
+        self.fields = {"日期": datetime.strptime(date, "%Y-%m-%d").timestamp() * 1000, **fields}
+
+
+class _FeishuHelper:
+    def __init__(self):
+        self.batches = []
+
+    def batch_update_records(self, updates):
+        self.batches.append(list(updates))
+
+
+def test_sync_meter_writes_only_changed_records():
+    records = index_feishu_records([
+        _Record("r1", "2024-01-02"),
+        _Record("r2", "2024-01-01", 家用峰电度数=5.0, 家用谷电度数=2.0),
+    ])
+    helper = _FeishuHelper()
+    rows = [
+        {"date": "2024-01-02", "reading": "12", "highNum": "8.1", "lowNum": "4.4"},
+        {"date": "2024-01-01", "reading": "7", "highNum": "5", "lowNum": "2"},
+    ]
+    assert sync_meter_to_feishu(records, "3309936495378", rows, helper) == 2
+    assert helper.batches == [[("r1", {"家用峰电度数": 8.1, "家用谷电度数": 4.4})]]
+
+    # 第二个户号只写回它填补的记录
+    helper.batches.clear()
+    charger_rows = [{"date": "2024-01-01", "reading": "3", "highNum": "1", "lowNum": "2"}]
+    assert sync_meter_to_feishu(records, "3309936803599", charger_rows, helper) == 2
+    assert helper.batches == [[("r2", {"充电桩峰电度数": 1.0, "充电桩谷电度数": 2.0})]]
+
+
+def test_sync_meter_batches_one_call_per_meter():
+    records = index_feishu_records([_Record(f"r{day}", f"2024-01-{day:02d}") for day in range(1, 31)])
+    helper = _FeishuHelper()
+    rows = [{"date": f"2024-01-{day:02d}", "reading": "3", "highNum": "2", "lowNum": "1"} for day in range(1, 31)]
+    assert sync_meter_to_feishu(records, "3309936495378", rows, helper) == 60
+    assert len(helper.batches) == 1 and len(helper.batches[0]) == 30
+    # 没有变化时不调用飞书接口
+    assert sync_meter_to_feishu(records, "3309936495378", rows, helper) == 0
+    assert len(helper.batches) == 1
+
+
+def test_cache_rescrapes_only_missing_meters_within_budget(monkeypatch, tmp_path):
+    from sgcc_electricity_feishu import accounts
+    from sgcc_electricity_feishu.usage_store import UsageStore
+    from sgcc_electricity_feishu.utils import get_sgcc_data_with_cache
+
+    requests = []
+    row = {"date": "2024-01-01", "reading": "10", "highNum": "6", "lowNum": "4"}
+
+    def iter_all_accounts(account_list, iterate=None):
+        requests.append([account["pending"] for account in account_list])
+        # 户号 B 始终失败
+        if "A" in account_list[0]["pending"]:
+            yield "A", [row]
+
+    account = {"username": "u", "password": "p", "user_id": ["A", "B"], "login_info_file": "x"}
+    monkeypatch.setattr(accounts, "load_accounts", lambda: [account])
+    monkeypatch.setattr(accounts, "iter_all_accounts", iter_all_accounts)
+    monkeypatch.setenv("METER_RETRY_BUDGET", "2")
+    monkeypatch.setenv("WATERMARK_FILE", str(tmp_path / "watermarks.json"))
+    monkeypatch.delenv("FULL_REFRESH", raising=False)
+
+    store = UsageStore(str(tmp_path / "usage.db"))
+    cache_dir = str(tmp_path / "cache")
+    expected = {"A": [{"date": "2024-01-01", "reading": 10.0, "highNum": 6.0, "lowNum": 4.0}]}
+    for _ in range(3):
+        assert get_sgcc_data_with_cache(cache_dir, store=store) == expected
+    # 第一次抓取全部，之后只重试 B，用完重试次数后不再抓取
+    assert requests == [[["A", "B"]], [["B"]]]
+    store.close()
@@ -0,0 +1,125 @@
+from sgcc_electricity_feishu.waits import PageWaiter, error_tip_changed, url_changed
+
+
+class _FakeDriver:
+    """current_url 在第 n 次读取后变化的假驱动"""
+
+    def __init__(self, change_after):
+        self.reads = 0
+        self.change_after = change_after
+
+    @property
+    def current_url(self):
+        self.reads += 1
+        return "https://www.95598.cn/osgweb/login" if self.reads <= self.change_after else "https://www.95598.cn/osgweb/home"
+
+
+def test_wait_returns_as_soon_as_condition_holds():
+    waiter = PageWaiter(_FakeDriver(change_after=2), poll_frequency=0.01)
+    assert waiter.wait("跳转", 5, url_changed("/osgweb/login"))
+    description, elapsed, satisfied = waiter.timings[0]
+    assert description == "跳转" and satisfied
+    assert elapsed < 1
+
+
+def test_wait_times_out_without_raising():
+    waiter = PageWaiter(_FakeDriver(change_after=10 ** 6), poll_frequency=0.01)
+    assert not waiter.wait("跳转", 0.05, url_changed("/osgweb/login"))
+    assert waiter.timings[0][2] is False
+
+
+def test_until_returns_condition_value_and_uses_model_limit(tmp_path):
+    import pytest
+    from selenium.common.exceptions import TimeoutException
+    from sgcc_electricity_feishu.latency_model import LatencyModel
+
+    model = LatencyModel(str(tmp_path / "wait_timings.json"))
+    for _ in range(5):
+        model.observe("元素出现", 0.01)
+    waiter = PageWaiter(_FakeDriver(change_after=10 ** 6), poll_frequency=0.01, model=model)
+    assert waiter.until("元素出现", 5, lambda driver: "element") == "element"
+    # 历史耗时很短，上限收紧到默认值的 0.2 倍
+    assert waiter.limit("元素出现", 5) == 1.0
+    with pytest.raises(TimeoutException):
+        waiter.until("元素出现", 0.1, lambda driver: False)
+    assert [satisfied for _, _, satisfied in waiter.timings] == [True, False]
+
+
+def test_wait_any_of_conditions():
+    waiter = PageWaiter(_FakeDriver(change_after=10 ** 6), poll_frequency=0.01)
+    assert waiter.wait("任一条件", 1, url_changed("/osgweb/login"), lambda driver: True)
+
+
+class _AsyncScriptDriver:
+    """记录异步脚本调用，返回预设结果"""
+
+    def __init__(self, result=True, supported=True, script_timeout_error=False):
+        self.result = result
+        self.supported = supported
+        self.script_timeout_error = script_timeout_error
+        self.calls = []
+        self.script_timeout = None
+        self.timeouts = type("Timeouts", (), {"script": 30})()
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+        self.timeouts.script = seconds
+
+    def execute_async_script(self, script, *args):
+        if not self.supported:
+            from selenium.common.exceptions import WebDriverException
+            raise WebDriverException("async scripts unsupported")
+        self.calls.append(args)
+        if self.script_timeout_error:
+            from selenium.common.exceptions import TimeoutException
+            raise TimeoutException("script timeout")
+        return self.result
+
+
+def test_wait_dom_runs_mutation_observer_script():
+    driver = _AsyncScriptDriver()
+    waiter = PageWaiter(driver)
+    assert waiter.wait_dom("表格", 2, "return args.ok;", {"ok": True})
+    predicate, args, timeout_ms = driver.calls[0]
+    assert predicate == "return args.ok;" and args == {"ok": True} and timeout_ms == 2000
+    assert driver.script_timeout > 2
+    # 等待结束后恢复原来的脚本超时
+    assert driver.timeouts.script == 30
+    assert waiter.timings[0][0] == "表格" and waiter.timings[0][2]
+
+
+def test_wait_dom_reports_timeout():
+    waiter = PageWaiter(_AsyncScriptDriver(result=False))
+    assert not waiter.wait_dom("表格", 1, "return false;")
+    assert waiter.timings[0][2] is False
+
+
+def test_wait_dom_falls_back_to_polling():
+    waiter = PageWaiter(_AsyncScriptDriver(supported=False), poll_frequency=0.01)
+    assert waiter.wait_dom("表格", 1, "return true;", fallback=lambda driver: True)
+    assert len(waiter.timings) == 1
+
+
+def test_wait_dom_script_timeout_is_not_retried_by_polling():
+    polled = []
+    waiter = PageWaiter(_AsyncScriptDriver(script_timeout_error=True), poll_frequency=0.01)
+    assert not waiter.wait_dom("表格", 1, "return true;", fallback=lambda driver: polled.append(1))
+    assert polled == []
+    assert waiter.timings[0][2] is False
+
+
+class _TipDriver:
+    def __init__(self, tip):
+        self.tip = tip
+
+    def execute_script(self, script, *args):
+        return self.tip
+
+
+def test_error_tip_changed_ignores_previous_tip():
+    driver = _TipDriver("验证失败")
+    condition = error_tip_changed("验证失败")
+    assert not condition(driver)
+    driver.tip = "请重新验证"
+    assert condition(driver)
+    assert not error_tip_changed("")(_TipDriver(""))
@@ -0,0 +1,60 @@
+import json
+
+from sgcc_electricity_feishu.watermark import WatermarkStore, is_confirmed, rows_after
+
+ROWS = [
+    {"date": "2024-01-03", "reading": "", "highNum": "0", "lowNum": "0"},
+    {"date": "2024-01-02", "reading": "12.5", "highNum": "8.1", "lowNum": "4.4"},
+    {"date": "2024-01-01", "reading": "10", "highNum": "6", "lowNum": "4"},
+]
+
+
+def test_rows_after():
+    assert [row["date"] for row in rows_after(ROWS, "2024-01-01")] == ["2024-01-03", "2024-01-02"]
+    assert rows_after(ROWS, None) == ROWS
+
+
+def test_advance_only_to_confirmed_dates(tmp_path):
+    path = str(tmp_path / "watermarks.json")
+    store = WatermarkStore(path)
+    assert not is_confirmed(ROWS[0])
+    assert store.advance({"m1": ROWS}) == {"m1": "2024-01-02"}
+    # 不回退，且受 until 限制
+    assert store.advance({"m1": ROWS[2:]}) == {}
+    assert store.advance({"m2": ROWS}, until="2024-01-01") == {"m2": "2024-01-01"}
+    assert WatermarkStore(path).snapshot() == {"m1": "2024-01-02", "m2": "2024-01-01"}
+
+
+def test_reading_without_split_is_not_confirmed(tmp_path):
+    # 总电量已出、峰谷分项尚未给出的日期不推进水位线，下次抓取还能取回分项
+    rows = [{"date": "2024-01-04", "reading": "11.2", "highNum": "0", "lowNum": "0"}] + ROWS
+    assert not is_confirmed(rows[0])
+    assert not is_confirmed({"date": "2024-01-04", "reading": "11.2", "highNum": "7.3", "lowNum": ""})
+    assert is_confirmed({"date": "2024-01-04", "reading": "11.2", "highNum": "7.3", "lowNum": "0"})
+    store = WatermarkStore(str(tmp_path / "watermarks.json"))
+    assert store.advance({"m1": rows}) == {"m1": "2024-01-02"}
+
+
+def test_meter_without_split_advances_on_reading(tmp_path):
+    # 没有分时电价的户号峰谷分项始终为 0
+    rows = [
+        {"date": "2024-01-02", "reading": "", "highNum": "0", "lowNum": "0"},
+        {"date": "2024-01-01", "reading": "9.6", "highNum": "0", "lowNum": "0"},
+    ]
+    assert is_confirmed(rows[1], split_expected=False)
+    assert not is_confirmed(rows[0], split_expected=False)
+    path = str(tmp_path / "watermarks.json")
+    assert WatermarkStore(path).advance({"flat": rows, "tou": ROWS}) == {"flat": "2024-01-01", "tou": "2024-01-02"}
+    # 增量抓取只剩新的一天时，仍按户号是否给出过分项判断
+    store = WatermarkStore(path)
+    new_day = [{"date": "2024-01-05", "reading": "8.8", "highNum": "0", "lowNum": "0"}]
+    assert store.advance({"flat": new_day, "tou": new_day}) == {"flat": "2024-01-05"}
+
+
+def test_legacy_watermark_file_triggers_full_scrape(tmp_path):
+    path = tmp_path / "watermarks.json"
+    path.write_text(json.dumps({"m1": "2024-01-02"}))
+    store = WatermarkStore(str(path))
+    assert store.snapshot() == {}
+    assert store.advance({"m1": ROWS}) == {"m1": "2024-01-02"}
+    assert json.loads(path.read_text()) == {"watermarks": {"m1": "2024-01-02"}, "split_meters": ["m1"]}